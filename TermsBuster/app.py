@@ -1,15 +1,24 @@
 
 import streamlit as st
-from PIL import Image
-import pdfplumber
-import pytesseract  
 import time
+import contextlib
 import pandas as pd
 
 from modules.exporter import generate_pdf_report, generate_image_report
-from modules.summarizer import summarize_text
-from modules.risk_analyzer import cached_analyze_policy
-from modules.ai_explainer import generate_ai_friendly_explanation
+from modules.ingest import ExtractionFailed, UploadRejected
+from modules.ocr_reader import extract_text_from_upload
+from modules.summarizer import SUMMARY_PRESETS, DEFAULT_PRESET, summarize_with_details
+from modules.risk_analyzer import (
+    discover_risk_profiles, DEFAULT_PROFILE_NAME, document_sentence_hits, matcher_fingerprint,
+)
+from modules.pipeline import (
+    run_analysis, streamlit_thread_initializer,
+    SUMMARY_FALLBACK, EXPLANATION_FALLBACK, RISK_FALLBACK,
+)
+from modules.policy_index import open_index, index_analysis, text_hash
+from modules.corpus_idf import learn_policy
+from modules.near_duplicate import find_near_duplicate, register_document
+from modules.match_table import iter_keyword_matches, keyword_hits, keyword_count
 
 if "show_matches" not in st.session_state:
     st.session_state["show_matches"] = False
@@ -207,30 +216,129 @@ def navbar(active_page="Home"):
     """, unsafe_allow_html=True)
 
 # --- Text Extraction ---
-def extract_text(file):
+def extract_text(file, headings=None):
     if not file:
         return ""
-    file.seek(0)
-    if file.type == "application/pdf":
-        try:
-            with pdfplumber.open(file) as pdf:
-                pages = [p.extract_text() or "" for p in pdf.pages]
-            return "\n".join(pages)
-        except:
-            return "PDF extraction failed."
-    if file.type.startswith("image/"):
-        try:
-            img = Image.open(file)
-            text = pytesseract.image_to_string(img)
-        except:
-            return "Image extraction failed."
-        return text if text.strip() else "No text detected in the image."
-    if file.type == "text/plain":
-        try:
-            return file.read().decode("utf-8")
-        except:
-            return "TXT extraction failed."
-    return ""
+    return extract_text_from_upload(file, file.type, headings)
+
+# --- Profiling (opt-in with ?profile=1) ---
+def profiling_requested():
+    """`?profile=1` in the URL profiles the next analysis / export."""
+    return st.query_params.get("profile", "") in ("1", "true", "yes")
+
+def new_profile_capture(name):
+    if not profiling_requested():
+        return None
+    from modules.profiler import ProfileCapture
+    return ProfileCapture(name)
+
+def render_profile_capture(capture):
+    info = capture.summary()
+    with st.expander(f"⏱️ Profile: {info['wall_seconds']} s, peak memory {info['peak_memory_mb']} MB", expanded=False):
+        st.dataframe(pd.DataFrame(capture.top_functions()), hide_index=True, use_container_width=True)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("📥 pstats (.prof)", data=capture.pstats_bytes(),
+                               file_name=f"{capture.name}.prof", mime="application/octet-stream")
+        with col2:
+            st.download_button("📥 speedscope (.json)", data=capture.speedscope_json(),
+                               file_name=f"{capture.name}.speedscope.json", mime="application/json")
+
+# --- Result Views ---
+TEXT_PREVIEW_CHARS = 4000
+SENTENCES_PER_PAGE = 25
+LEVEL_ORDER = ["very_high_risk", "high_risk", "moderate_risk", "low_risk", "minimal_risk"]
+
+@st.fragment
+def render_text_preview(label, text, key):
+    """Read-only text box; long texts show a preview until expanded (reruns only this block)."""
+    if len(text) <= TEXT_PREVIEW_CHARS:
+        st.text_area(label, text, height=200, disabled=True, key=f"{key}_area")
+        return
+    show_all = st.toggle(f"Show full text ({len(text):,} characters)", key=f"{key}_full")
+    shown = text if show_all else text[:TEXT_PREVIEW_CHARS] + " …"
+    st.text_area(label, shown, height=200, disabled=True, key=f"{key}_area_{show_all}")
+
+@st.fragment
+def render_matches_view(matches):
+    """
+    Filterable, paged list of matched sentences. Only the current page is
+    materialized and sent to the browser, whatever the number of matches.
+    """
+    entries = [e for e in iter_keyword_matches(matches) if e["count"]]
+    if not entries:
+        st.info("No keyword matches with sentences were found in this policy.")
+        return
+
+    levels = sorted({e["level"] for e in entries}, key=lambda l: LEVEL_ORDER.index(l) if l in LEVEL_ORDER else 99)
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        chosen_levels = st.multiselect(
+            "Risk levels", levels, default=levels, key="matches_levels",
+            format_func=lambda l: l.replace("_", " ").title(),
+        )
+    with col2:
+        keyword_filter = st.text_input("Keyword contains", key="matches_keyword").strip().lower()
+    entries = [
+        e for e in entries
+        if e["level"] in chosen_levels and (not keyword_filter or keyword_filter in e["keyword"].lower())
+    ]
+    total = sum(e["count"] for e in entries)
+    if not total:
+        st.caption("No matches for these filters.")
+        return
+
+    pages = (total - 1) // SENTENCES_PER_PAGE + 1
+    # a new filter starts again at page 1
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1,
+                           key=f"matches_page_{hash((tuple(chosen_levels), keyword_filter))}")
+    first, last = (page - 1) * SENTENCES_PER_PAGE, page * SENTENCES_PER_PAGE
+    st.caption(f"Showing {first + 1}–{min(last, total)} of {total} matched sentences in {len(entries)} keywords")
+
+    # walk the keyword rows, slicing only the hits that fall on this page
+    lines, offset = [], 0
+    for entry in entries:
+        lo, hi = max(first - offset, 0), min(last - offset, entry["count"])
+        if lo < hi:
+            lines.append(f"**{entry['keyword']}** *(Risk: {entry['level'].replace('_', ' ').title()})*")
+            # one bullet per sentence: line breaks inside it would end the list item
+            lines.extend(f"- {' '.join(sentence.split())}" for sentence, _, _ in keyword_hits(matches, entry, lo, hi))
+        offset += entry["count"]
+        if offset >= last:
+            break
+    st.markdown("\n".join(lines))
+
+SECTION_SUMMARY_MIN_CHARS = 400   # shorter sections are quicker to read than to summarize
+SECTION_PREVIEW_CHARS = 1500
+SECTION_ICONS = {"Very High Risk": "🔴", "High Risk": "🟠", "Moderate Risk": "🟡", "Low Risk": "🟢", "Minimal Risk": "🟢"}
+
+@st.fragment
+def render_sections_view(text, sections, profile, preset):
+    """
+    Section list with keyword risk scores (already computed). A section's AI
+    summary is generated only when asked for, then kept for the session.
+    """
+    summaries = st.session_state.setdefault("section_summaries", {})
+    for i, section in enumerate(sections):
+        risk = section["profiles"].get(profile, {})
+        body = text[section["body_start"]:section["end"]].strip()
+        worst = risk.get("Worst Keyword Level", "Unknown")
+        label = (f"{'↳ ' * (section['level'] - 1)}{SECTION_ICONS.get(worst, '⚪')} "
+                 f"{section['title']} · worst keyword: {worst} ({risk.get('Total Score', 0)})")
+        with st.expander(label, expanded=False):
+            if risk.get("Keywords"):
+                st.caption("Risk keywords: " + ", ".join(risk["Keywords"]))
+            key = (preset, text_hash(body))
+            if key in summaries:
+                st.markdown(f"**Summary:** {summaries[key]}")
+            elif len(body) >= SECTION_SUMMARY_MIN_CHARS and st.button("📝 Summarize this section", key=f"section_summary_{i}"):
+                with st.spinner("Summarizing section..."):
+                    try:
+                        summaries[key] = summarize_with_details(body, preset)["summary"]
+                    except Exception:
+                        summaries[key] = SUMMARY_FALLBACK
+                st.markdown(f"**Summary:** {summaries[key]}")
+            st.text(body if len(body) <= SECTION_PREVIEW_CHARS else body[:SECTION_PREVIEW_CHARS] + " …")
 
 # --- Dynamic Advice ---
 def dynamic_user_advice(risklevel, totalscore):
@@ -259,46 +367,105 @@ def home_page():
     uploaded = st.file_uploader("📁 Upload Privacy Policy (PDF/Image/Text)", type=["pdf", "png", "jpg", "jpeg", "txt"], key="file_upload_1")
 
     text = ""
+    heading_hints = []
     extraction_shown = False
     if uploaded:
-        text = extract_text(uploaded)
         extraction_shown = True
-        if text:
-            st.subheader("✏️ Extracted Text")
-            st.text_area("Extracted Content", text, height=200, disabled=True)
+        try:
+            text = extract_text(uploaded, heading_hints)
+        except UploadRejected as e:
+            st.error(f"Upload rejected: {e}")
+        except ExtractionFailed as e:
+            st.error(str(e))
         else:
-            st.error("No text found! If this is a scanned PDF, OCR is not applied automatically. Try converting PDF pages to images and upload as PNG/JPEG.")
+            if text:
+                st.subheader("✏️ Extracted Text")
+                render_text_preview("Extracted Content", text, key="extracted")
+            else:
+                st.error("No text found! If this is a scanned PDF, OCR is not applied automatically. Try converting PDF pages to images and upload as PNG/JPEG.")
     elif text_query.strip():
         text = text_query.strip()
 
+    vendor = st.text_input("🏢 Vendor / service name (optional)", placeholder="e.g. Example Corp")
+
+    available_profiles = discover_risk_profiles()
+    selected_profiles = [DEFAULT_PROFILE_NAME]
+    if len(available_profiles) > 1:
+        selected_profiles = st.multiselect(
+            "⚖️ Risk profiles", list(available_profiles), default=[DEFAULT_PROFILE_NAME],
+            help="Every selected profile is scored in the same pass over the document."
+        ) or [DEFAULT_PROFILE_NAME]
+
+    preset = st.selectbox(
+        "⚙️ Summary mode", list(SUMMARY_PRESETS), index=list(SUMMARY_PRESETS).index(DEFAULT_PRESET),
+        help="fast = greedy decoding, balanced = 2 beams, quality = 4 beams. Summary length scales with the policy."
+    )
+
     analyze_clicked = st.button("🔍 Analyze with AI")
 
     if analyze_clicked and text:
         if not extraction_shown:
             st.subheader("✏️ Extracted Text")
-            st.text_area("Extracted Content", text, height=200, disabled=True)
+            render_text_preview("Extracted Content", text, key="extracted")
 
         with st.spinner("AI is analyzing the policy..."):
             start_time = time.time()
 
-            # Summary
+            # Near-duplicate lookup: boilerplate policies reuse an earlier summary
+            # and its keyword scan; only the sentences that changed are scanned
+            selected_paths = {name: available_profiles[name] for name in selected_profiles}
+            neighbour = None
             try:
-                st.info("AI is analyzing the policy... please wait ⏳")
-                summary = summarize_text(text)
+                conn = open_index()
+                try:
+                    neighbour = find_near_duplicate(conn, text, fingerprint=matcher_fingerprint(selected_paths))
+                finally:
+                    conn.close()
             except Exception:
-                summary = "⚠️ Could not generate summary. Using placeholder."
-
-            # Explanation
-            try:
-                explanation_md = generate_ai_friendly_explanation(summary)
-            except Exception:
-                explanation_md = "- Could not generate explanation. Using placeholder."
+                neighbour = None
+
+            # Summary, explanation and risk scoring run as one stage graph:
+            # scoring of the extracted text overlaps with summarization
+            if neighbour:
+                summarize_fn = lambda _text: {"summary": neighbour["summary"], "preset": "reused", "decode_steps": 0}
+                st.caption(
+                    f"♻️ Reused the summary of a previously analyzed policy "
+                    f"({neighbour['similarity']:.0%} similar); "
+                    + (f"only the {len(neighbour['changed_sentences'])} changed sentences were scanned for risk keywords."
+                       if neighbour["sentence_hits"] is not None else
+                       f"{len(neighbour['changed_sentences'])} sentences differ.")
+                )
+            else:
+                summarize_fn = None
+                st.info("AI is analyzing the policy... please wait ⏳")
 
-            # Risk analysis
+            capture = new_profile_capture("analysis")
+            initializer = streamlit_thread_initializer()
             try:
-                result = cached_analyze_policy(text, summary, "data/risk_analyzer_MASTER_FINAL.json")
+                with capture or contextlib.nullcontext():
+                    analysis = run_analysis(
+                        text, selected_paths, summarize_fn=summarize_fn, preset=preset,
+                        initializer=capture.wrap_initializer(initializer) if capture else initializer,
+                        heading_hints=heading_hints,
+                        known_sentence_hits=neighbour["sentence_hits"] if neighbour else None,
+                    )
             except Exception:
-                result = {"Total Score": 5, "Risk Level": "Moderate Risk", "Confidence": 80, "Matches": {}}
+                analysis = {
+                    "summary": SUMMARY_FALLBACK,
+                    "summary_info": {"preset": None, "decode_steps": 0},
+                    "summary_failed": True,
+                    "explanation": EXPLANATION_FALLBACK,
+                    "profiles": {name: dict(RISK_FALLBACK) for name in selected_paths},
+                    "sections": [],
+                    "degraded": {},
+                }
+            summary = analysis["summary"]
+            summary_failed = analysis["summary_failed"]
+            summary_info = analysis["summary_info"]
+            explanation_md = analysis["explanation"]
+            profile_results = analysis["profiles"]
+            degraded = analysis["degraded"]
+            result = profile_results[selected_profiles[0]]
 
             risklevel = result.get("Risk Level", "Unknown")
             confidence = result.get("Confidence", 50)
@@ -312,6 +479,9 @@ def home_page():
             st.session_state["confidence"] = confidence
             st.session_state["total_score"] = totalscore
             st.session_state["matches"] = matches
+            st.session_state["profile_results"] = profile_results
+            st.session_state["summary_info"] = summary_info
+            st.session_state["degraded"] = degraded
 
             # --- also persist latest analysis to disk for Download page ---
             import json
@@ -325,11 +495,28 @@ def home_page():
                 "confidence": confidence,
                 "total_score": totalscore,
                 "matches": matches,          # ← ADD THIS
+                "summary_info": summary_info,
+                "degraded": degraded,
             }
             ANALYSIS_PATH.parent.mkdir(parents=True, exist_ok=True)
             with ANALYSIS_PATH.open("w", encoding="utf-8") as f:
                 json.dump(latest, f)
 
+            # --- add to the cross-policy index for later search ---
+            try:
+                conn = open_index()
+                try:
+                    for profile_name, profile_result in (profile_results or {selected_profiles[0]: result}).items():
+                        index_analysis(conn, vendor, text, summary, profile_result, profile=profile_name,
+                                       timings=analysis.get("timings"))
+                    learn_policy(text)
+                    if not summary_failed and not neighbour and "summarize" not in degraded:
+                        register_document(conn, text, summary, document_sentence_hits(text, selected_paths))
+                finally:
+                    conn.close()
+            except Exception:
+                pass
+
 
             # Also push key scores into URL (for cross-session fallback)
             st.query_params.update({
@@ -342,27 +529,57 @@ def home_page():
             # --- OUTPUT SECTION ---
             st.markdown("---")
             st.markdown('<div class="risk-banner">⚠️ We found some privacy risks in this policy. Please check the details below.</div>', unsafe_allow_html=True)
+            if degraded:
+                skipped = {
+                    "summarize": "the summary lists key sentences instead of an AI summary",
+                    "textrank": "key phrases were skipped",
+                    "tfidf": "keyword density used the first part of the policy",
+                }
+                reason = "the server is busy" if "load" in degraded.values() else "the analysis ran out of time"
+                st.warning(
+                    f"⚡ Quick analysis ({reason}): "
+                    + "; ".join(skipped[s] for s in skipped if s in degraded)
+                    + ". Analyze again later for the full result."
+                )
 
             st.subheader("📋 What's This Policy Really About?")
             st.markdown(f'<div class="summary-card">{summary}</div>', unsafe_allow_html=True)
+            if summary_info.get("preset") and summary_info["preset"] not in ("reused", "extractive"):
+                st.caption(
+                    f"Summary mode: {summary_info['preset']} · {summary_info.get('decode_steps', 0)} decode steps"
+                    f" · {summary_info.get('input_tokens', 0)} input tokens"
+                )
 
             st.subheader("✨ Policy In Simple Terms")
             st.markdown(explanation_md)
 
             st.subheader("🛡️ How Safe Is Your Data?")
             risk_rows = []
-            for key_level, label in [
-                ("very_high_risk", "Very High"),
-                ("high_risk", "High"),
-                ("moderate_risk", "Moderate"),
-                ("low_risk", "Low")
-            ]:
-                level_data = matches.get(key_level, {})
-                for kw, detail in level_data.items():
+            level_labels = {
+                "very_high_risk": "Very High",
+                "high_risk": "High",
+                "moderate_risk": "Moderate",
+                "low_risk": "Low",
+            }
+            for entry in iter_keyword_matches(matches):
+                if entry["level"] in level_labels:
                     risk_rows.append(
-                        {"Risk Level": label, "Keyword": kw, "Score": detail.get("score_each", 0)}
+                        {"Risk Level": level_labels[entry["level"]], "Keyword": entry["keyword"], "Score": entry["score_each"]}
                     )
 
+            if len(profile_results) > 1:
+                st.markdown("**Scores by risk profile**")
+                st.dataframe(pd.DataFrame([
+                    {
+                        "Profile": name,
+                        "Risk Level": res.get("Risk Level", "Unknown"),
+                        "Total Score": res.get("Total Score", 0),
+                        "Confidence": res.get("Confidence", 0),
+                        "Keywords Matched": keyword_count(res.get("Matches", {})),
+                    }
+                    for name, res in profile_results.items()
+                ]), use_container_width=True, hide_index=True)
+
             # if risk_rows:
             #     df = pd.DataFrame(risk_rows)
             #     st.dataframe(df, use_container_width=True, hide_index=True)
@@ -408,23 +625,19 @@ def home_page():
 
             elapsed = round(time.time() - start_time, 2)
             st.success(f"✅ Analysis completed in {elapsed} seconds.")
+            if capture:
+                render_profile_capture(capture)
 
             # Matching keywords & sentences (dropdown only)
             st.subheader("📄 Matching Keywords & Sentences")
             with st.expander("Click to view matched keywords and real policy sentences", expanded=False):
-                found = False
-                for level_key, level_data in matches.items():
-                    if not level_data:
-                        continue
-                    for kw, detail in level_data.items():
-                        sentences_list = detail.get("sentences", [])
-                        if sentences_list:
-                            st.markdown(f"**{kw}** *(Risk: {level_key.replace('_', ' ').title()})*")
-                            for sent in sentences_list:
-                                st.markdown(f"- {sent.strip()}")
-                            found = True
-                if not found:
-                    st.info("No keyword matches with sentences were found in this policy.")
+                render_matches_view(matches)
+
+            if len(analysis["sections"]) > 1:
+                st.subheader("🧭 Policy Sections")
+                st.caption(f"{len(analysis['sections'])} sections, scored with the {selected_profiles[0]} profile. "
+                           "Open a section to read it or summarize just that part.")
+                render_sections_view(text, analysis["sections"], selected_profiles[0], preset)
 
     st.markdown("<br><hr>", unsafe_allow_html=True)
     st.markdown('<small style="display:block; text-align:center; color:#6b7280;">Made with ❤️ by TermsBuster • Powered by AI</small>', unsafe_allow_html=True)
@@ -526,21 +739,28 @@ def download_page():
     st.write("")
     st.write("")
 
+    capture = new_profile_capture("export")
+    with capture or contextlib.nullcontext():
+        pdf_report = generate_pdf_report(policy_text, matches, summary, risk_level, confidence, total_score)
+        image_report = generate_image_report(policy_text, matches, summary, risk_level, confidence, total_score)
+
     spacer, col1, col2, spacer2 = st.columns([2, 2, 2, 2])
     with col1:
         st.download_button(
             "📥 Download PDF",
-            data=generate_pdf_report(policy_text, matches, summary, risk_level, confidence, total_score),
+            data=pdf_report,
             file_name="TermsBuster_Report.pdf",
             mime="application/pdf"
     )
     with col2:
         st.download_button(
         "🖼️ Download Image",
-        data=generate_image_report(policy_text, matches, summary, risk_level, confidence, total_score),
+        data=image_report,
         file_name="TermsBuster_Report.png",
         mime="image/png"
     )
+    if capture:
+        render_profile_capture(capture)
 
 # --- Navigation with query params ---
 query_params = st.query_params
@@ -1,5 +1,7 @@
 import re
 
+from modules.sentence_cache import SENTENCE_CACHE
+
 # General keyword replacement dictionary for common privacy terms to simple phrases
 KEYWORD_REPLACEMENTS = {
     r"\bdata breaches?\b": "when your data gets exposed or stolen",
@@ -38,6 +40,18 @@ def clean_and_replace(text: str) -> str:
         text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
     return text
 
+SENTENCE_BREAK_RE = re.compile(r'(\.\s+)')
+
+def clean_and_replace_sentences(text: str) -> str:
+    """
+    Same result as clean_and_replace(text), computed sentence by sentence
+    through the shared sentence cache (no replacement pattern spans a '. ' break).
+    """
+    parts = SENTENCE_BREAK_RE.split(text)
+    for i in range(0, len(parts), 2):
+        parts[i] = SENTENCE_CACHE.get_or_compute("explain", parts[i], lambda p=parts[i]: clean_and_replace(p))
+    return "".join(parts)
+
 def extract_templates(text: str) -> list:
     """
     Matches known patterns and returns corresponding friendly sentences.
@@ -54,8 +68,8 @@ def split_into_sentences(text: str) -> list:
     """
     # Split on period followed by space or line end
     sentences = re.split(r'\.\s+', text.strip())
-    # Clean sentences
-    sentences = [s.strip() for s in sentences if s]
+    # Clean sentences (collapse line breaks so each stays one markdown bullet)
+    sentences = [" ".join(s.split()) for s in sentences if s]
     return sentences
 
 def generate_ai_friendly_explanation(policy_text: str) -> str:
@@ -66,7 +80,7 @@ def generate_ai_friendly_explanation(policy_text: str) -> str:
     """
 
     # Step 1: Clean and replace jargon keywords with simple phrases
-    cleaned_text = clean_and_replace(policy_text)
+    cleaned_text = clean_and_replace_sentences(policy_text)
 
     # Step 2: Extract matched template explanations based on policy content
     template_explanations = extract_templates(cleaned_text)
@@ -0,0 +1,131 @@
+# columnar_export.py
+"""
+Bulk export of the policy index to columnar files for dataframes.
+
+    python -m modules.policy_index export --out exports/ [--format parquet|csv] [--since-days 30]
+
+Writes one file per dataset, streamed from SQLite in batches so the corpus
+never sits in memory:
+
+    policies        one row per (vendor, profile, text) analysis: scores and level
+    keyword_counts  one row per matched keyword and policy
+    sentence_risk   one row per matched sentence, with the keyword's score
+    timings         one row per analysis stage (seconds)
+
+Parquet (zstd) when pyarrow is installed, gzipped CSV otherwise. All
+datasets join on `policy_id`, e.g. `pd.read_parquet("exports/policies.parquet")`.
+"""
+import csv
+import gzip
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+BATCH_ROWS = 50_000   # rows fetched from SQLite per step (= one Parquet row group)
+
+DATASETS = {
+    "policies": (
+        [("policy_id", "int"), ("vendor", "str"), ("profile", "str"), ("text_hash", "str"),
+         ("analyzed_at", "float"), ("total_score", "int"), ("risk_level", "str"),
+         ("confidence", "int"), ("tfidf_density", "float")],
+        "SELECT p.id, p.vendor, p.profile, p.text_hash, p.analyzed_at, p.total_score, p.risk_level, "
+        "p.confidence, p.tfidf_density FROM policies p {where} ORDER BY p.id",
+    ),
+    "keyword_counts": (
+        [("policy_id", "int"), ("keyword", "str"), ("level", "str"), ("score_each", "int"),
+         ("count", "int"), ("total_score", "int")],
+        "SELECT h.policy_id, h.keyword, h.level, h.score_each, h.count, h.total_score "
+        "FROM keyword_hits h JOIN policies p ON p.id = h.policy_id {where} ORDER BY h.policy_id",
+    ),
+    "sentence_risk": (
+        [("policy_id", "int"), ("keyword", "str"), ("level", "str"), ("score_each", "int"),
+         ("start_offset", "int"), ("sentence", "str")],
+        "SELECT s.policy_id, s.keyword, s.level, h.score_each, s.start_offset, s.sentence "
+        "FROM sentence_hits s JOIN policies p ON p.id = s.policy_id "
+        "LEFT JOIN keyword_hits h ON h.policy_id = s.policy_id AND h.keyword = s.keyword AND h.level = s.level "
+        "{where} ORDER BY s.policy_id, s.id",
+    ),
+    "timings": (
+        [("policy_id", "int"), ("stage", "str"), ("seconds", "float")],
+        "SELECT t.policy_id, t.stage, t.seconds FROM policy_timings t JOIN policies p ON p.id = t.policy_id "
+        "{where} ORDER BY t.policy_id",
+    ),
+}
+
+# ------------------------------
+# Streaming writers
+# ------------------------------
+class ColumnarWriter:
+    """Append row batches to one Parquet or gzipped CSV file; `close()` publishes it."""
+
+    def __init__(self, path_stem: Path, columns: List[Tuple[str, str]], fmt: str = "auto"):
+        if fmt == "auto":
+            fmt = "parquet" if pq is not None else "csv"
+        if fmt == "parquet" and pq is None:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow); use --format csv")
+        self.fmt = fmt
+        self.columns = columns
+        self.path = Path(f"{path_stem}.parquet" if fmt == "parquet" else f"{path_stem}.csv.gz")
+        self._part = self.path.with_name(self.path.name + ".part")  # readers never see half a file
+        self.rows = 0
+
+        if fmt == "parquet":
+            arrow_types = {"int": pa.int64(), "float": pa.float64(), "str": pa.string()}
+            self._schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+            self._writer = pq.ParquetWriter(str(self._part), self._schema, compression="zstd")
+        else:
+            self._file = gzip.open(self._part, "wt", encoding="utf-8", newline="")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow([name for name, _ in columns])
+
+    def write(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        if self.fmt == "parquet":
+            arrays = [list(col) for col in zip(*rows)]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self._schema))
+        else:
+            self._writer.writerows(rows)
+        self.rows += len(rows)
+
+    def close(self) -> Path:
+        if self.fmt == "parquet":
+            self._writer.close()
+        else:
+            self._file.close()
+        os.replace(self._part, self.path)
+        return self.path
+
+# ------------------------------
+# Export
+# ------------------------------
+def export_index(conn: sqlite3.Connection, out_dir: str, fmt: str = "auto", since: Optional[float] = None,
+                 batch_rows: int = BATCH_ROWS) -> Dict[str, Dict]:
+    """Export every dataset; returns {dataset: {"path": ..., "rows": ...}}."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    where, params = ("WHERE p.analyzed_at >= ?", (since,)) if since else ("", ())
+
+    written = {}
+    for name, (columns, sql) in DATASETS.items():
+        writer = ColumnarWriter(out / name, columns, fmt)
+        try:
+            cursor = conn.execute(sql.format(where=where), params)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                writer.write([tuple(r) for r in rows])
+        except BaseException:
+            writer.close()
+            os.remove(writer.path)
+            raise
+        written[name] = {"path": str(writer.close()), "rows": writer.rows}
+    return written
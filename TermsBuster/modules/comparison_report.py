@@ -0,0 +1,268 @@
+# comparison_report.py
+"""
+Multi-policy comparison report (PDF) over the policy index.
+
+    python -m modules.policy_index report --out reports/q3.pdf --since-days 90 [--profile GDPR]
+
+Contents: a ranked table of every vendor (latest analysis per vendor and
+profile), one risk breakdown per vendor, and one appendix of matched clauses
+per vendor.
+
+Built for hundreds of vendors: every section is its own small PDF rendered
+by a worker process straight from SQLite, so no process ever holds more than
+one vendor's story. The parts are then concatenated into the output file,
+which appears only once complete. pdfium has no streaming writer, so the
+concatenation holds every page until it is saved (a few KB per page); the
+page count is capped by MAX_REPORT_PAGES, checked before concatenating.
+"""
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from modules.exporter import get_risk_color
+
+LEVELS = ["very_high_risk", "high_risk", "moderate_risk", "low_risk", "minimal_risk"]
+TABLE_CHUNK_ROWS = 40      # rows per reportlab Table in the ranked list (large tables lay out slowly)
+TOP_KEYWORDS = 15          # keywords listed in a vendor breakdown
+MAX_CLAUSES = 20           # matched sentences per keyword in an appendix (None = all)
+# pages in one report; the merged document is held in memory (~5 KB per page) until saved
+MAX_REPORT_PAGES = int(os.environ.get("TERMSBUSTER_REPORT_MAX_PAGES", 20_000))
+
+HEADER_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#158cff")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 8),
+    ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#9ca3af")),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f3f4f6")]),
+    ("VALIGN", (0, 0), (-1, -1), "TOP"),
+])
+
+# ------------------------------
+# Queries (each worker opens its own read-only connection)
+# ------------------------------
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True, timeout=30)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def ranked_policies(conn: sqlite3.Connection, profile: str, since: Optional[float] = None) -> Iterator[sqlite3.Row]:
+    """Latest analysis per vendor for `profile`, riskiest first."""
+    sql = (
+        "SELECT p.id, p.vendor, p.analyzed_at, p.total_score, p.risk_level, p.confidence, p.tfidf_density, "
+        + ", ".join(
+            f"COALESCE((SELECT SUM(h.count) FROM keyword_hits h WHERE h.policy_id = p.id AND h.level = '{level}'), 0) "
+            f"AS {level}"
+            for level in LEVELS
+        )
+        + " FROM policies p WHERE p.profile = ? AND p.analyzed_at = "
+        "(SELECT MAX(q.analyzed_at) FROM policies q WHERE q.vendor = p.vendor AND q.profile = p.profile)"
+    )
+    params: List = [profile]
+    if since:
+        sql += " AND p.analyzed_at >= ?"
+        params.append(since)
+    sql += " ORDER BY p.total_score DESC, p.vendor"
+    return conn.execute(sql, params)
+
+# ------------------------------
+# Rendering
+# ------------------------------
+def _styles():
+    styles = getSampleStyleSheet()
+    styles["BodyText"].fontSize = 9
+    styles["BodyText"].leading = 12
+    return styles
+
+def _build(path: str, story: List, footer: str) -> int:
+    """Render `story` to `path`; returns the page count."""
+    def on_page(canvas, doc):
+        canvas.saveState()
+        canvas.setFont("Helvetica", 7)
+        canvas.setFillColor(colors.HexColor("#6b7280"))
+        canvas.drawString(doc.leftMargin, 0.5 * 72, footer)
+        canvas.drawRightString(letter[0] - doc.rightMargin, 0.5 * 72, f"{footer.split(' · ')[0]} · p. {doc.page}")
+        canvas.restoreState()
+
+    doc = SimpleDocTemplate(path, pagesize=letter, title=footer)
+    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    return doc.page
+
+def _date(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+def render_ranking(db_path: str, path: str, profile: str, since: Optional[float], title: str) -> Dict:
+    styles = _styles()
+    story = [Paragraph(escape(title), styles["Title"]),
+             Paragraph(f"Profile: {escape(profile)} · generated {_date(time.time())}"
+                       + (f" · analyses since {_date(since)}" if since else ""), styles["BodyText"]),
+             Spacer(1, 12)]
+    header = ["#", "Vendor", "Risk level", "Score", "Conf.", "Density", "V. high", "High", "Mod.", "Low", "Min.", "Analyzed"]
+    widths = [22, 100, 70, 30, 28, 36, 32, 26, 28, 24, 26, 48]
+
+    vendors = []
+    rows = [header]
+    with _connect(db_path) as conn:
+        for rank, r in enumerate(ranked_policies(conn, profile, since), start=1):
+            vendors.append({"rank": rank, "policy_id": r["id"], "vendor": r["vendor"]})
+            rows.append([rank, Paragraph(escape(r["vendor"]), styles["BodyText"]), r["risk_level"], r["total_score"],
+                         r["confidence"], f"{r['tfidf_density']:.3f}", *(r[level] for level in LEVELS),
+                         _date(r["analyzed_at"])])
+            if len(rows) > TABLE_CHUNK_ROWS:
+                story.append(Table(rows, colWidths=widths, repeatRows=1, style=HEADER_STYLE))
+                rows = [header]
+    if len(rows) > 1:
+        story.append(Table(rows, colWidths=widths, repeatRows=1, style=HEADER_STYLE))
+    if not vendors:
+        story.append(Paragraph("No analyzed policies match this selection.", styles["BodyText"]))
+
+    pages = _build(path, story, f"Vendor ranking · {profile}")
+    return {"path": path, "pages": pages, "vendors": vendors}
+
+def render_vendor(db_path: str, policy_id: int, rank: int, out_dir: str, max_clauses: Optional[int] = MAX_CLAUSES) -> Dict:
+    """Breakdown and clause appendix of one vendor, as two PDFs (runs in a worker process)."""
+    styles = _styles()
+    with _connect(db_path) as conn:
+        p = conn.execute("SELECT * FROM policies WHERE id = ?", (policy_id,)).fetchone()
+        by_level = {r["level"]: r for r in conn.execute(
+            "SELECT level, COUNT(*) AS keywords, SUM(count) AS hits, SUM(total_score) AS score "
+            "FROM keyword_hits WHERE policy_id = ? GROUP BY level", (policy_id,))}
+        top = conn.execute(
+            "SELECT keyword, level, count, total_score FROM keyword_hits WHERE policy_id = ? "
+            "ORDER BY total_score DESC, keyword LIMIT ?", (policy_id, TOP_KEYWORDS)).fetchall()
+        vendor = escape(p["vendor"])
+
+        # --- breakdown ---
+        story = [
+            Paragraph(f"{rank}. {vendor}", styles["Heading2"]),
+            Paragraph(f"<font color='{get_risk_color(p['risk_level'].lower().replace(' ', '_'))}'>"
+                      f"<b>{escape(p['risk_level'])}</b></font> · score {p['total_score']} · confidence "
+                      f"{p['confidence']}/100 · TF-IDF density {p['tfidf_density']:.3f} · analyzed "
+                      f"{_date(p['analyzed_at'])}", styles["BodyText"]),
+            Spacer(1, 8),
+        ]
+        level_rows = [["Level", "Keywords", "Hits", "Score"]]
+        for level in LEVELS:
+            r = by_level.get(level)
+            level_rows.append([level.replace("_", " ").title(), r["keywords"] if r else 0,
+                               r["hits"] if r else 0, r["score"] if r else 0])
+        story.append(Table(level_rows, style=HEADER_STYLE, hAlign="LEFT"))
+        if top:
+            story += [Spacer(1, 8), Table(
+                [["Top keywords", "Level", "Hits", "Score"]]
+                + [[Paragraph(escape(r["keyword"]), styles["BodyText"]), r["level"].replace("_", " ").title(),
+                    r["count"], r["total_score"]] for r in top],
+                colWidths=[220, 90, 50, 50], style=HEADER_STYLE, hAlign="LEFT")]
+        breakdown_path = os.path.join(out_dir, f"breakdown-{rank:05d}.pdf")
+        breakdown_pages = _build(breakdown_path, story, f"{p['vendor']} · risk breakdown")
+
+        # --- appendix: one keyword at a time, in level order ---
+        story = [Paragraph(f"Appendix {rank}: {vendor} — matched clauses", styles["Heading2"])]
+        keywords = conn.execute(
+            "SELECT keyword, level, count FROM keyword_hits WHERE policy_id = ? ORDER BY "
+            "CASE level " + " ".join(f"WHEN '{lvl}' THEN {i}" for i, lvl in enumerate(LEVELS)) + " END, "
+            "total_score DESC, keyword", (policy_id,)).fetchall()
+        for kw in keywords:
+            sentences = conn.execute(
+                "SELECT sentence FROM sentence_hits WHERE policy_id = ? AND keyword = ? AND level = ? "
+                "ORDER BY start_offset LIMIT ?", (policy_id, kw["keyword"], kw["level"], max_clauses or -1))
+            story.append(Paragraph(
+                f"<font color='{get_risk_color(kw['level'])}'><b>{escape(kw['keyword'])}</b></font> "
+                f"({kw['level'].replace('_', ' ').title()}, {kw['count']} hits)", styles["BodyText"]))
+            story += [Paragraph(f"- {escape(s['sentence'])}", styles["BodyText"]) for s in sentences]
+            story.append(Spacer(1, 4))
+        if not keywords:
+            story.append(Paragraph("No keyword matches were recorded for this policy.", styles["BodyText"]))
+        appendix_path = os.path.join(out_dir, f"appendix-{rank:05d}.pdf")
+        appendix_pages = _build(appendix_path, story, f"{p['vendor']} · matched clauses")
+
+    return {"breakdown": breakdown_path, "appendix": appendix_path, "pages": breakdown_pages + appendix_pages}
+
+def _divider(path: str, title: str, note: str) -> str:
+    styles = _styles()
+    _build(path, [Spacer(1, 200), Paragraph(escape(title), styles["Title"]),
+                  Paragraph(escape(note), styles["BodyText"]), PageBreak()], title)
+    return path
+
+def concatenate_pdfs(parts: List[str], out_path: str) -> int:
+    """
+    Append `parts` one at a time (each closed right after) into `out_path`;
+    returns the page count. The merged document stays in memory until saved.
+    """
+    import pypdfium2 as pdfium
+
+    merged = pdfium.PdfDocument.new()
+    try:
+        for part in parts:
+            src = pdfium.PdfDocument(part)
+            try:
+                merged.import_pages(src)
+            finally:
+                src.close()
+        pages = len(merged)
+        merged.save(out_path)
+    finally:
+        merged.close()
+    return pages
+
+# ------------------------------
+# Report
+# ------------------------------
+def build_comparison_report(db_path: str, out_path: str, profile: str = "General", since: Optional[float] = None,
+                            workers: Optional[int] = None, max_clauses: Optional[int] = MAX_CLAUSES,
+                            title: str = "TermsBuster - Vendor Comparison Report",
+                            max_pages: Optional[int] = MAX_REPORT_PAGES) -> Dict:
+    """
+    Write the comparison report to `out_path`. Vendor sections render in
+    `workers` processes (default: CPU count). Raises ValueError, before
+    concatenating, when the report would exceed `max_pages` (None = no cap).
+    Returns {"path", "vendors", "pages", "seconds"}.
+    """
+    started = time.perf_counter()
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    os.makedirs(out_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="termsbuster-report-", dir=out_dir) as tmp:
+        ranking = render_ranking(db_path, os.path.join(tmp, "ranking.pdf"), profile, since, title)
+        vendors = ranking["vendors"]
+
+        sections = []
+        if vendors:
+            workers = max(1, min(workers or os.cpu_count() or 1, len(vendors)))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                sections = list(pool.map(
+                    render_vendor,
+                    [db_path] * len(vendors), [v["policy_id"] for v in vendors], [v["rank"] for v in vendors],
+                    [tmp] * len(vendors), [max_clauses] * len(vendors),
+                ))
+
+        parts = [ranking["path"]]
+        if sections:
+            parts.append(_divider(os.path.join(tmp, "divider-breakdowns.pdf"), "Vendor risk breakdowns",
+                                  f"{len(vendors)} vendors, in ranking order."))
+            parts += [s["breakdown"] for s in sections]
+            parts.append(_divider(os.path.join(tmp, "divider-appendix.pdf"), "Appendix: matched clauses",
+                                  f"Up to {max_clauses} sentences per keyword." if max_clauses else
+                                  "Every matched sentence per keyword."))
+            parts += [s["appendix"] for s in sections]
+
+        expected_pages = ranking["pages"] + sum(s["pages"] for s in sections) + (2 if sections else 0)
+        if max_pages is not None and expected_pages > max_pages:
+            raise ValueError(f"the report would have {expected_pages} pages; the limit is {max_pages} "
+                             f"(narrow it with --since-days or --max-clauses, or raise --max-pages)")
+
+        partial = os.path.join(tmp, "report.pdf")
+        pages = concatenate_pdfs(parts, partial)
+        os.replace(partial, out_path)
+
+    return {"path": out_path, "vendors": len(vendors), "pages": pages,
+            "seconds": round(time.perf_counter() - started, 2)}
@@ -0,0 +1,274 @@
+# corpus_idf.py
+"""
+Corpus-level term statistics for the TF-IDF risk density.
+
+Document frequencies of hashed word n-grams (no vocabulary, so nothing is
+ever refitted) over every policy indexed so far. The model is persisted to
+data/corpus_idf.npz and loaded once per process. Density keeps its original
+definition, the share of the policy's vocabulary (unigrams and bigrams, at
+most 500 terms) that are risk keywords; the corpus IDF decides which terms
+make the cut in policies with a larger vocabulary. Scoring never changes the
+model, so the same policy always gets the same density; policies are counted
+in by the explicit `learn_policy` step of the indexing paths (app, watch
+folder, `add` below).
+
+    python -m modules.corpus_idf                     # corpus statistics
+    python -m modules.corpus_idf add policies/*.txt  # seed the corpus from text files
+"""
+import argparse
+import atexit
+import hashlib
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction import FeatureHasher
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from modules.normalizer import NormalizedText
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+CORPUS_PATH = Path(os.environ.get("TERMSBUSTER_CORPUS_IDF_PATH", "data/corpus_idf.npz"))
+N_FEATURES = 2 ** 18
+NGRAM_RANGE = (1, 3)
+MAX_VOCABULARY = 500          # terms per policy, like TfidfVectorizer(max_features=500) before
+VOCABULARY_NGRAMS = 2         # the density vocabulary holds unigrams and bigrams
+SAVE_INTERVAL_S = 30          # updates are written at most this often (and at exit)
+MIN_SENTENCE_CHARS = 10
+
+def policy_sentences(text: str) -> List[str]:
+    sentences = re.split(r'(?<=[\.?!])\s+', text)
+    return [s.strip() for s in sentences if len(s.strip()) > MIN_SENTENCE_CHARS]
+
+def _digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+@contextmanager
+def _file_lock(path: Path):
+    """Exclusive inter-process lock on a sidecar file (blocks until acquired)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:   # LK_LOCK gives up after ~10 s
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class CorpusIDF:
+    """
+    Hashed document frequencies plus the digests of the documents counted
+    (a policy analyzed twice is counted once). Thread-safe; `save()` merges
+    with the file on disk under a lock file, so several processes can share
+    one corpus.
+    """
+
+    def __init__(self, path: Optional[Path] = CORPUS_PATH, n_features: int = N_FEATURES):
+        self.path = Path(path) if path else None
+        self.n_features = n_features
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.seen: Set[bytes] = set()
+        self._pending: Dict[bytes, np.ndarray] = {}   # digest -> buckets, not yet on disk
+        self._last_save = time.monotonic()
+        self._lock = threading.RLock()
+        self._vectorizer = HashingVectorizer(n_features=n_features, ngram_range=NGRAM_RANGE, stop_words="english",
+                                             alternate_sign=False, norm=None)
+        self._analyzer = self._vectorizer.build_analyzer()
+        self._hasher = FeatureHasher(n_features=n_features, input_type="string", alternate_sign=False)
+
+    # ------------------------------
+    # Persistence
+    # ------------------------------
+    @staticmethod
+    def _read(path: Path, n_features: int):
+        with np.load(path) as data:
+            df = data["df"].astype(np.int64)
+            if df.shape != (n_features,):
+                raise ValueError(f"{path} has {df.shape[0]} features, expected {n_features}")
+            return df, int(data["n_docs"]), {bytes(row) for row in data["seen"]}
+
+    @classmethod
+    def load(cls, path: Path = CORPUS_PATH, **kwargs) -> "CorpusIDF":
+        model = cls(path, **kwargs)
+        if model.path and model.path.exists():
+            try:
+                model.df, model.n_docs, model.seen = cls._read(model.path, model.n_features)
+            except (OSError, KeyError, ValueError):
+                pass  # unreadable corpus file: start over, it is rewritten on the next save
+        return model
+
+    def save(self) -> None:
+        """Merge the documents counted since the last save into the file (atomic replace)."""
+        with self._lock:
+            if not self.path or not self._pending:
+                return
+            # read-merge-replace under the lock file, or concurrent savers drop each other's documents
+            with _file_lock(self.path):
+                try:
+                    df, n_docs, seen = self._read(self.path, self.n_features)
+                except (OSError, KeyError, ValueError):
+                    df, n_docs, seen = np.zeros(self.n_features, dtype=np.int64), 0, set()
+                for digest, buckets in self._pending.items():
+                    if digest not in seen:
+                        df[buckets] += 1
+                        n_docs += 1
+                        seen.add(digest)
+
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+                with open(tmp, "wb") as f:
+                    np.savez(f, df=df.astype(np.int32), n_docs=np.int64(n_docs),
+                             seen=np.frombuffer(b"".join(sorted(seen)), dtype=np.uint8).reshape(-1, 16))
+                os.replace(tmp, self.path)
+            # other processes' documents are picked up as well
+            self.df, self.n_docs, self.seen = df, n_docs, seen
+            self._pending.clear()
+            self._last_save = time.monotonic()
+
+    # ------------------------------
+    # Counting and transforming
+    # ------------------------------
+    def counts(self, text: str) -> Optional[csr_matrix]:
+        """Hashed n-gram counts of the document (1 x n_features), None under two sentences."""
+        sentences = policy_sentences(text)
+        if len(sentences) < 2:
+            return None
+        per_sentence = self._vectorizer.transform(sentences)
+        return csr_matrix(np.ones((1, per_sentence.shape[0]))) @ per_sentence
+
+    def observe(self, text: str, counts: csr_matrix) -> None:
+        digest = _digest(text)
+        with self._lock:
+            if digest in self.seen:
+                return
+            self.df[counts.indices] += 1
+            self.n_docs += 1
+            self.seen.add(digest)
+            self._pending[digest] = counts.indices.copy()
+            due = time.monotonic() - self._last_save >= SAVE_INTERVAL_S
+        if due:
+            self.save()
+
+    def idf(self, buckets: np.ndarray) -> np.ndarray:
+        """Smoothed IDF, as TfidfVectorizer computes it, from the corpus counts."""
+        return np.log((1 + self.n_docs) / (1 + self.df[buckets])) + 1
+
+    def learn(self, text: str) -> bool:
+        """Count a policy into the corpus (normalized, once per content); False under two sentences."""
+        text = NormalizedText(text).text
+        counts = self.counts(text)
+        if counts is None:
+            return False
+        self.observe(text, counts)
+        return True
+
+    def vocabulary(self, text: str, max_terms: int = MAX_VOCABULARY) -> Optional[List[str]]:
+        """
+        The policy's unigrams and bigrams (English stop words removed), None
+        under two sentences; read-only. Beyond `max_terms`, the terms with the
+        highest TF-IDF weight against the corpus IDF are kept.
+        """
+        sentences = policy_sentences(text)
+        if len(sentences) < 2:
+            return None
+        tf = Counter(g for s in sentences for g in self._analyzer(s) if g.count(" ") < VOCABULARY_NGRAMS)
+        terms = sorted(tf)
+        if len(terms) <= max_terms:
+            return terms
+        buckets = self._hasher.transform([[t] for t in terms]).indices
+        with self._lock:
+            weights = np.fromiter((tf[t] for t in terms), dtype=np.float64, count=len(terms)) * self.idf(buckets)
+        keep = np.sort(np.argsort(-weights, kind="stable")[:max_terms])
+        return [terms[i] for i in keep]
+
+    @staticmethod
+    def density(vocabulary: Optional[List[str]], keywords: Iterable[str]) -> float:
+        """% of the policy's vocabulary that are risk keywords."""
+        if not vocabulary:
+            return 0.0
+        terms = set(vocabulary)
+        hits = sum(1 for kw in set(keywords) if kw in terms)
+        return min(100.0, hits / len(vocabulary) * 100)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"documents": self.n_docs, "terms": int(np.count_nonzero(self.df)),
+                    "unsaved": len(self._pending), "path": str(self.path) if self.path else None}
+
+# ------------------------------
+# Process-wide model (loaded once)
+# ------------------------------
+_model: Optional[CorpusIDF] = None
+_model_lock = threading.Lock()
+
+def corpus_model() -> CorpusIDF:
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = CorpusIDF.load(CORPUS_PATH)
+            atexit.register(_model.save)
+        return _model
+
+def use_corpus_model(model: CorpusIDF) -> None:
+    """Replace the process-wide model (e.g. a frozen one for reproducible runs)."""
+    global _model
+    with _model_lock:
+        _model = model
+
+@contextmanager
+def scratch_corpus_model():
+    """Run the block against an empty in-memory model (nothing read or written), then restore the previous one."""
+    global _model
+    with _model_lock:
+        previous, _model = _model, CorpusIDF(path=None)
+    try:
+        yield _model
+    finally:
+        with _model_lock:
+            _model = previous
+
+def learn_policy(text: str) -> bool:
+    """Count an indexed policy into the process-wide corpus (the only step that updates it)."""
+    return corpus_model().learn(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="Corpus IDF model for the TF-IDF risk density.")
+    sub = parser.add_subparsers(dest="command")
+    add = sub.add_parser("add", help="count text files into the corpus")
+    add.add_argument("files", nargs="+")
+    args = parser.parse_args()
+
+    model = corpus_model()
+    if args.command == "add":
+        for name in args.files:
+            model.learn(Path(name).read_text(encoding="utf-8", errors="replace"))
+        model.save()
+    for key, value in model.stats().items():
+        print(f"{key}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
 
+from modules.match_table import iter_keyword_matches, keyword_sentences
+
 
 # ---------- Helper functions ----------
 
@@ -123,20 +125,17 @@ def generate_pdf_report(policy_text, matches, summary, risk_level, confidence, t
     if not matches:
         story.append(Paragraph("No keyword matches were detected in this policy.", styles['BodyText']))
     else:
-        for level_key, level_data in matches.items():
-            if not level_data:
+        for entry in iter_keyword_matches(matches):
+            sentences = keyword_sentences(matches, entry)
+            if not sentences:
                 continue
-            for kw, detail in level_data.items():
-                sentences = detail.get("sentences", [])
-                if not sentences:
-                    continue
-                story.append(Paragraph(
-                    f"{kw} ({level_key.replace('_', ' ').title()})",
-                    styles['BodyText'],
-                ))
-                for sent in sentences:
-                    story.append(Paragraph(f"- {sent}", styles['BodyText']))
-                story.append(Spacer(1, 6))
+            story.append(Paragraph(
+                f"{entry['keyword']} ({entry['level'].replace('_', ' ').title()})",
+                styles['BodyText'],
+            ))
+            for sent in sentences:
+                story.append(Paragraph(f"- {' '.join(sent.split())}", styles['BodyText']))
+            story.append(Spacer(1, 6))
 
     doc.build(story)
     buffer.seek(0)
@@ -199,35 +198,30 @@ def generate_image_report(policy_text, matches, summary, risk_level, confidence,
         d.text((margin + 40, y_pos), "No keyword matches detected.", fill="#9ca3af", font=body_font)
         y_pos += line_height
     else:
-        for level_key, level_data in matches.items():
-            if not level_data:
+        for entry in iter_keyword_matches(matches):
+            sentences = keyword_sentences(matches, entry)
+            if not sentences:
                 continue
-            for kw, detail in level_data.items():
-                sentences = detail.get("sentences", [])
-                if not sentences:
-                    continue
-
-                risk_color = get_risk_color(level_key)
-                keyword_text = f"► {kw.upper()}"
-                d.text((margin + 40, y_pos), keyword_text, fill=risk_color, font=subheading_font)
-                y_pos += line_height + 8
-
-                risk_label = level_key.replace('_', ' ').title()
-                d.text((margin + 60, y_pos), f"Risk: {risk_label}", fill=risk_color, font=small_font)
-                y_pos += line_height
-
-                for i, sent in enumerate(sentences[:2]):  # max 2 per keyword
-                    wrapped_sent = wrap_text(sent, small_font, img_width - 2 * margin - 80)
-                    for line in wrapped_sent[:2]:  # max 2 lines per sentence
-                        d.text((margin + 80, y_pos), line, fill="#b0b8c0", font=small_font)
-                        y_pos += line_height - 6
-                    y_pos += 8
-
-                y_pos += 16
-                if y_pos > img_height - 160:
-                    break  # avoid drawing below canvas
+
+            risk_color = get_risk_color(entry["level"])
+            keyword_text = f"► {entry['keyword'].upper()}"
+            d.text((margin + 40, y_pos), keyword_text, fill=risk_color, font=subheading_font)
+            y_pos += line_height + 8
+
+            risk_label = entry["level"].replace('_', ' ').title()
+            d.text((margin + 60, y_pos), f"Risk: {risk_label}", fill=risk_color, font=small_font)
+            y_pos += line_height
+
+            for i, sent in enumerate(sentences[:2]):  # max 2 per keyword
+                wrapped_sent = wrap_text(" ".join(sent.split()), small_font, img_width - 2 * margin - 80)
+                for line in wrapped_sent[:2]:  # max 2 lines per sentence
+                    d.text((margin + 80, y_pos), line, fill="#b0b8c0", font=small_font)
+                    y_pos += line_height - 6
+                y_pos += 8
+
+            y_pos += 16
             if y_pos > img_height - 160:
-                break
+                break  # avoid drawing below canvas
 
     # Dynamic recommendation at bottom if there is space
     if y_pos < img_height - 120:
@@ -0,0 +1,284 @@
+# golden.py
+"""
+Golden-output equivalence harness for the risk analyzer and explainer.
+
+    python -m modules.golden                          # current engines vs data/golden/expected*.json
+    python -m modules.golden --record                 # rewrite the goldens (after an intended change)
+    python -m modules.golden --engine pipeline        # only the run_analysis path
+    python -m modules.golden --baseline-rev <rev>     # engine at a git revision vs current, with speedup
+    python -m modules.golden --baseline-rev <rev> --loose-sentences   # ignore sentence casing/whitespace
+
+Corpus: data/golden/<case>.txt (policy) + <case>.summary.txt (summary input,
+fixed so results do not depend on the model). Two engines are checked:
+"policy" (cached_analyze_policy, expected.json) and "pipeline" (run_analysis
+with every shipped profile, as the app, /analyze, the load test and the
+watch folder use it; expected_pipeline.json). Outputs compared per case:
+Total Score, Risk Level, Confidence, TF-IDF Density, Top Risk Phrases,
+Matches (expanded to the nested form, so storage formats do not matter),
+the explanation and, for the pipeline, the scored sections.
+Exit status is 1 when anything differs.
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+GOLDEN_DIR = Path("data/golden")
+EXPECTED_PATH = GOLDEN_DIR / "expected.json"
+EXPECTED_PATHS = {"policy": EXPECTED_PATH, "pipeline": GOLDEN_DIR / "expected_pipeline.json"}
+REPEATS = 5
+RESULT_KEYS = ["Total Score", "Risk Level", "Confidence", "TF-IDF Density", "Top Risk Phrases"]
+
+# ------------------------------
+# Corpus
+# ------------------------------
+def load_cases(directory: Path = GOLDEN_DIR) -> List[Dict]:
+    cases = []
+    for path in sorted(Path(directory).glob("*.txt")):
+        if path.name.endswith(".summary.txt"):
+            continue
+        summary_path = path.with_name(f"{path.stem}.summary.txt")
+        cases.append({
+            "name": path.stem,
+            "text": path.read_text(encoding="utf-8"),
+            "summary": summary_path.read_text(encoding="utf-8").strip() if summary_path.exists() else "",
+        })
+    return cases
+
+# ------------------------------
+# Running an engine (current tree, or another tree in a subprocess)
+# ------------------------------
+def freeze_corpus_model(cases: List[Dict]) -> None:
+    """TF-IDF densities against IDF from the golden corpus alone, not from whatever was analyzed before."""
+    try:
+        from modules.corpus_idf import CorpusIDF, use_corpus_model
+        from modules.normalizer import NormalizedText
+    except ImportError:
+        return  # engines from before the corpus model fit TF-IDF per document
+    model = CorpusIDF(path=None)
+    for case in cases:
+        model.learn(NormalizedText(case["text"], case["summary"]).text)
+    use_corpus_model(model)
+
+def run_engine(cases: List[Dict], repeats: int = REPEATS) -> Dict[str, Dict]:
+    """
+    Analyze every case with whatever `modules` package is importable.
+    Timings bypass st.cache_data so repeats measure real work.
+    """
+    from modules.ai_explainer import generate_ai_friendly_explanation
+    from modules.risk_analyzer import cached_analyze_policy
+
+    analyze = getattr(cached_analyze_policy, "__wrapped__", cached_analyze_policy)
+    freeze_corpus_model(cases)
+    json_path = "data/risk_analyzer_MASTER_FINAL.json"
+    analyze("warm up", "", json_path)  # dictionary load and regex compilation
+
+    outputs = {}
+    for case in cases:
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            result = analyze(case["text"], case["summary"], json_path)
+            best = min(best, time.perf_counter() - started)
+        outputs[case["name"]] = {
+            "result": result,
+            "explanation": generate_ai_friendly_explanation(case["summary"]),
+            "seconds": best,
+        }
+    return outputs
+
+def run_pipeline_engine(cases: List[Dict], repeats: int = REPEATS) -> Dict[str, Dict]:
+    """
+    Analyze every case with run_analysis over every shipped profile; the
+    summarizer returns the case's fixed summary and nothing is degraded.
+    """
+    from modules.pipeline import run_analysis
+    from modules.risk_analyzer import discover_risk_profiles
+
+    freeze_corpus_model(cases)
+    profile_paths = discover_risk_profiles()
+
+    outputs = {}
+    for case in cases:
+        def summarize(text, summary=case["summary"]):
+            return {"summary": summary, "preset": "golden", "decode_steps": 0}
+
+        best = float("inf")
+        for _ in range(repeats):
+            started = time.perf_counter()
+            analysis = run_analysis(case["text"], profile_paths, summarize_fn=summarize,
+                                    deadline_s=0, degrade_at_inflight=0)
+            best = min(best, time.perf_counter() - started)
+        outputs[case["name"]] = {
+            "profiles": analysis["profiles"],
+            "sections": [{key: section[key] for key in ("title", "level", "start", "end", "profiles")}
+                         for section in analysis["sections"]],
+            "explanation": analysis["explanation"],
+            "seconds": best,
+        }
+    return outputs
+
+ENGINES = {"policy": run_engine, "pipeline": run_pipeline_engine}
+
+def export_tree(rev: str, destination: str) -> Path:
+    """Extract TermsBuster/modules at `rev` into `destination`; returns the package root."""
+    repo_root = subprocess.run(["git", "rev-parse", "--show-toplevel"], capture_output=True, text=True,
+                               check=True).stdout.strip()
+    prefix = subprocess.run(["git", "rev-parse", "--show-prefix"], capture_output=True, text=True,
+                            check=True).stdout.strip()
+    archive = subprocess.run(["git", "archive", "--format=tar", rev, f"{prefix}modules"], cwd=repo_root,
+                             capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(destination)
+    return Path(destination) / prefix
+
+def run_engine_at_rev(rev: str, repeats: int = REPEATS, engine: str = "policy") -> Dict[str, Dict]:
+    """Run the engine of git revision `rev` in a subprocess (data files come from the working tree)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = export_tree(rev, tmp)
+        out = Path(tmp) / "outputs.json"
+        env = dict(os.environ, PYTHONPATH=str(root))
+        subprocess.run([sys.executable, __file__, "--emit", str(out), "--repeats", str(repeats),
+                        "--engine", engine], env=env, check=True)
+        return json.loads(out.read_text(encoding="utf-8"))
+
+# ------------------------------
+# Comparison
+# ------------------------------
+def canonical_result(result: Dict) -> Dict:
+    from modules.match_table import materialize_matches
+
+    canon = {key: result.get(key) for key in RESULT_KEYS}
+    canon["Matches"] = {
+        level: {kw: detail for kw, detail in sorted(keywords.items())}
+        for level, keywords in sorted(materialize_matches(result.get("Matches", {})).items())
+        if keywords
+    }
+    return canon
+
+def canonical(output: Dict, loose_sentences: bool = False) -> Dict:
+    if "profiles" in output:
+        canon = {"Profiles": {name: canonical_result(result) for name, result in sorted(output["profiles"].items())},
+                 "Sections": output["sections"]}
+    else:
+        canon = canonical_result(output["result"])
+    canon["Explanation"] = output["explanation"]
+    # JSON round trip: tuples vs lists, int vs float keys compare like stored goldens
+    canon = json.loads(json.dumps(canon))
+    if loose_sentences:
+        loosen_sentences(canon)
+    return canon
+
+def loosen_sentences(canon: Dict) -> Dict:
+    """Compare matched sentences by content only (casing and whitespace ignored)."""
+    for result in canon["Profiles"].values() if "Profiles" in canon else [canon]:
+        for keywords in result["Matches"].values():
+            for detail in keywords.values():
+                detail["sentences"] = [" ".join(s.lower().split()) for s in detail.get("sentences", [])]
+    return canon
+
+def diff(expected: Dict, actual: Dict, path: str = "") -> List[str]:
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        lines = []
+        for key in sorted(set(expected) | set(actual), key=str):
+            sub = f"{path}/{key}"
+            if key not in actual:
+                lines.append(f"  - {sub}: missing")
+            elif key not in expected:
+                lines.append(f"  + {sub}: unexpected {json.dumps(actual[key])[:120]}")
+            else:
+                lines.extend(diff(expected[key], actual[key], sub))
+        return lines
+    if expected != actual:
+        return [f"  ~ {path}: {json.dumps(expected)[:120]} -> {json.dumps(actual)[:120]}"]
+    return []
+
+def report(reference: Dict[str, Dict], candidate: Dict[str, Dict], ref_times: Optional[Dict[str, float]] = None,
+           loose_sentences: bool = False) -> int:
+    failures = 0
+    total_ref = total_new = 0.0
+    print(f"{'case':<24}{'result':>8}{'old ms':>10}{'new ms':>10}{'speedup':>9}")
+    for name in sorted(set(reference) | set(candidate)):
+        if name not in candidate or name not in reference:
+            failures += 1
+            print(f"{name:<24}{'MISSING':>8}")
+            continue
+        lines = diff(reference[name], canonical(candidate[name], loose_sentences))
+        failures += bool(lines)
+        new_ms = candidate[name]["seconds"] * 1000
+        old_ms = (ref_times or {}).get(name)
+        total_new += new_ms
+        timing = f"{'':>10}{new_ms:>10.2f}{'':>9}"
+        if old_ms is not None:
+            total_ref += old_ms
+            timing = f"{old_ms:>10.2f}{new_ms:>10.2f}{old_ms / new_ms:>8.2f}x"
+        print(f"{name:<24}{'FAIL' if lines else 'ok':>8}{timing}")
+        for line in lines:
+            print(line)
+    if total_ref:
+        print(f"{'total':<24}{'':>8}{total_ref:>10.2f}{total_new:>10.2f}{total_ref / total_new:>8.2f}x")
+    print(f"\n{'❌' if failures else '✅'} {len(reference) - failures}/{len(reference)} cases equivalent")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check analyzer outputs against the golden corpus.")
+    parser.add_argument("--record", action="store_true", help="store the current outputs as the new goldens")
+    parser.add_argument("--baseline-rev", default=None, help="compare against the engine at this git revision")
+    parser.add_argument("--loose-sentences", action="store_true",
+                        help="ignore casing/whitespace of matched sentences (display-only changes)")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="timed runs per case (best is kept)")
+    parser.add_argument("--engine", choices=[*ENGINES, "all"], default="all", help="engine(s) to check")
+    parser.add_argument("--emit", default=None, help=argparse.SUPPRESS)  # subprocess mode for --baseline-rev
+    args = parser.parse_args(argv)
+
+    cases = load_cases()
+    if args.emit:
+        outputs = ENGINES[args.engine](cases, args.repeats)
+        Path(args.emit).write_text(json.dumps(outputs), encoding="utf-8")
+        return 0
+
+    failures = 0
+    for engine in ENGINES if args.engine == "all" else [args.engine]:
+        print(f"\n== {engine} engine ==")
+        failures += check_engine(engine, cases, args)
+    return 1 if failures else 0
+
+def check_engine(engine: str, cases: List[Dict], args) -> int:
+    current = ENGINES[engine](cases, args.repeats)
+    expected_path = EXPECTED_PATHS[engine]
+    if args.record:
+        expected = {
+            "cases": {name: canonical(output) for name, output in current.items()},
+            "seconds": {name: round(output["seconds"], 6) for name, output in current.items()},
+        }
+        expected_path.write_text(json.dumps(expected, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"✅ Recorded {len(current)} golden cases to {expected_path}")
+        return 0
+
+    if args.baseline_rev:
+        baseline = run_engine_at_rev(args.baseline_rev, args.repeats, engine)
+        reference = {name: canonical(output, args.loose_sentences) for name, output in baseline.items()}
+        ref_times = {name: output["seconds"] * 1000 for name, output in baseline.items()}
+    else:
+        expected = json.loads(expected_path.read_text(encoding="utf-8"))
+        reference = expected["cases"]
+        if args.loose_sentences:
+            reference = {name: loosen_sentences(canon) for name, canon in reference.items()}
+        # recorded timings come from another machine/run: indicative only
+        ref_times = {name: s * 1000 for name, s in expected.get("seconds", {}).items()}
+    return report(reference, current, ref_times, args.loose_sentences)
+
+
+if __name__ == "__main__":
+    if "--emit" in sys.argv:
+        # run as a script from another tree: that tree's `modules` must win over ours
+        sys.path.insert(0, os.environ.get("PYTHONPATH", "").split(os.pathsep)[0])
+    sys.exit(main())
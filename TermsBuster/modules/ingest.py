@@ -0,0 +1,154 @@
+# ingest.py
+"""
+Bounded, streaming upload handling.
+
+Uploads are copied in chunks into a spooled temp file (memory up to
+SPOOL_MEMORY_BYTES, disk beyond), size / page / pixel limits are checked
+before any parsing work, and text files are decoded chunk by chunk.
+Limits can be changed with the environment variables below.
+"""
+import codecs
+import io
+import os
+import tempfile
+from typing import BinaryIO, Optional
+
+try:
+    from charset_normalizer import from_bytes as detect_encoding
+except ImportError:
+    detect_encoding = None
+
+MB = 1024 * 1024
+MAX_UPLOAD_BYTES = int(float(os.environ.get("TERMSBUSTER_MAX_UPLOAD_MB", 50)) * MB)
+MAX_PDF_PAGES = int(os.environ.get("TERMSBUSTER_MAX_PDF_PAGES", 300))
+MAX_IMAGE_PIXELS = int(float(os.environ.get("TERMSBUSTER_MAX_IMAGE_MEGAPIXELS", 60)) * 1_000_000)
+SPOOL_MEMORY_BYTES = 2 * MB      # larger uploads spill to a temp file
+CHUNK_BYTES = 256 * 1024
+DETECT_SAMPLE_BYTES = 64 * 1024  # head of the file handed to charset detection (plus the failing chunk)
+FALLBACK_ENCODING = "cp1252"
+
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+class UploadRejected(ValueError):
+    """The upload breaks a size/page/pixel limit; the message is shown to the user."""
+
+class ExtractionFailed(ValueError):
+    """No text could be extracted from the upload; the message is shown to the user."""
+
+# ------------------------------
+# Spooling
+# ------------------------------
+def stream_size(stream) -> Optional[int]:
+    """Remaining bytes of a seekable stream (position unchanged), else None."""
+    try:
+        pos = stream.tell()
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(pos)
+        return end - pos
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def check_size(size: Optional[int], max_bytes: int = MAX_UPLOAD_BYTES) -> None:
+    if size is not None and size > max_bytes:
+        raise UploadRejected(f"File is {size / MB:.1f} MB; the limit is {max_bytes / MB:.0f} MB.")
+
+def spool_stream(stream: BinaryIO, length: Optional[int] = None, max_bytes: int = MAX_UPLOAD_BYTES,
+                 chunk_bytes: int = CHUNK_BYTES) -> BinaryIO:
+    """
+    Copy `stream` (e.g. a socket body of `length` bytes) into a spooled temp
+    file, refusing as soon as more than `max_bytes` arrive. Returned at offset 0.
+    """
+    check_size(length, max_bytes)
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES)
+    remaining = length
+    copied = 0
+    try:
+        while remaining is None or remaining > 0:
+            chunk = stream.read(chunk_bytes if remaining is None else min(chunk_bytes, remaining))
+            if not chunk:
+                break
+            copied += len(chunk)
+            check_size(copied, max_bytes)
+            spool.write(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+def open_upload(file, max_bytes: int = MAX_UPLOAD_BYTES) -> BinaryIO:
+    """
+    Seekable binary stream for an upload, within `max_bytes`. Seekable
+    uploads (Streamlit's in-memory file, BytesIO, files on disk) are used in
+    place; anything else is spooled.
+    """
+    seekable = getattr(file, "seekable", None)
+    if seekable is not None and seekable():
+        file.seek(0)
+        check_size(stream_size(file), max_bytes)
+        return file
+    return spool_stream(file, max_bytes=max_bytes)
+
+# ------------------------------
+# Text decoding
+# ------------------------------
+def sniff_bom(head: bytes) -> Optional[str]:
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    return None
+
+def guess_encoding(sample: bytes) -> str:
+    if detect_encoding is None:
+        return FALLBACK_ENCODING
+    matches = detect_encoding(sample)
+    best = matches.best()
+    if best is None:
+        return FALLBACK_ENCODING
+    # Western code pages often tie exactly; cp1252 is by far the most common of them
+    for match in matches:
+        if match.encoding == FALLBACK_ENCODING and (match.chaos, match.coherence) == (best.chaos, best.coherence):
+            return FALLBACK_ENCODING
+    return best.encoding
+
+def _decode_chunks(stream: BinaryIO, encoding: str, errors: str, chunk_bytes: int) -> str:
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    parts = []
+    while True:
+        chunk = stream.read(chunk_bytes)
+        if not chunk:
+            parts.append(decoder.decode(b"", final=True))
+            return "".join(parts)
+        parts.append(decoder.decode(chunk))
+
+def read_text(stream: BinaryIO, chunk_bytes: int = CHUNK_BYTES) -> str:
+    """
+    Decode a text upload chunk by chunk: BOM if present, else UTF-8; on the
+    first invalid byte the encoding is detected from a sample around it and
+    decoding restarts with that encoding (undecodable bytes replaced).
+    """
+    start = stream.tell()
+    head = stream.read(4)
+    stream.seek(start)
+    encoding = sniff_bom(head)
+    if encoding:
+        return _decode_chunks(stream, encoding, "replace", chunk_bytes)
+
+    try:
+        return _decode_chunks(stream, "utf-8", "strict", chunk_bytes)
+    except UnicodeDecodeError:
+        failed_at = stream.tell()
+
+    # sample the beginning plus the region where UTF-8 failed
+    stream.seek(start)
+    sample = stream.read(DETECT_SAMPLE_BYTES)
+    stream.seek(max(start + len(sample), failed_at - chunk_bytes))
+    sample += stream.read(chunk_bytes)
+    stream.seek(start)
+    return _decode_chunks(stream, guess_encoding(sample), "replace", chunk_bytes)
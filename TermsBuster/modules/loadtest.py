@@ -0,0 +1,306 @@
+# loadtest.py
+"""
+Concurrent-session load generator for the analysis pipeline.
+
+    python -m modules.loadtest --sessions 1,4,8,16 --requests 5
+    python -m modules.loadtest --corpus policies/ --regime warm --json load.json
+    python -m modules.loadtest --stub-summary-ms 800      # without the model
+
+Each simulated session runs what `home_page` runs on "Analyze": near-duplicate
+lookup, the stage graph (`run_analysis`) and indexing, one request after
+another. Sessions are threads, like Streamlit sessions in one server process.
+
+Regimes:
+    cold  every request analyzes a never-seen document, caches cleared first
+    warm  a small document pool is analyzed once, then replayed
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from modules.corpus_idf import learn_policy, scratch_corpus_model
+from modules.near_duplicate import find_near_duplicate, register_document
+from modules.pipeline import run_analysis
+from modules.policy_index import index_analysis, open_index
+from modules.risk_analyzer import (
+    DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_PATH, cached_load_risk_data, discover_risk_profiles,
+    document_sentence_hits, matcher_fingerprint,
+)
+
+# share of requests and target length (characters) per policy size
+SIZE_MIX = [("small", 0.5, 3_000), ("medium", 0.35, 15_000), ("large", 0.15, 60_000)]
+WARM_POOL_SIZE = 6
+SAMPLE_INTERVAL = 0.5  # seconds between CPU / memory samples
+
+FILLER_SENTENCES = [
+    "This Privacy Policy explains how we handle information when you use our services.",
+    "Please read this policy carefully before using the website or the mobile application.",
+    "We review this policy periodically and post any updates on this page.",
+    "You can contact our support team at any time with questions about this policy.",
+    "These terms apply to all visitors, users and others who access the service.",
+    "Our services are provided on an as-is basis without warranties of any kind.",
+    "Capitalized terms not defined here have the meaning given in the Terms of Service.",
+    "Some features may not be available in every country or region.",
+]
+
+# ------------------------------
+# Synthetic policies
+# ------------------------------
+def risk_sentences(json_path: str = DEFAULT_PROFILE_PATH) -> List[str]:
+    """One plain sentence per dictionary keyword, so every size class carries real hits."""
+    sentences = []
+    for entries in cached_load_risk_data(json_path).values():
+        for entry in entries:
+            sentences.append(f"We may {entry['keyword']} as described in this section.")
+    return sentences
+
+def synthetic_policy(rng: random.Random, target_chars: int, risky: List[str], tag: str = "") -> str:
+    parts, length = [], 0
+    if tag:
+        parts.append(f"Policy reference {tag}.")
+    while length < target_chars:
+        sentence = rng.choice(risky) if rng.random() < 0.3 else rng.choice(FILLER_SENTENCES)
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)
+
+def load_corpus(directory: str) -> List[str]:
+    return [p.read_text(encoding="utf-8", errors="ignore") for p in sorted(Path(directory).glob("*.txt"))]
+
+class DocumentSource:
+    """Hands out documents following SIZE_MIX (or from a corpus) for one regime."""
+
+    def __init__(self, regime: str, seed: int = 7, corpus: Optional[List[str]] = None):
+        self.regime = regime
+        self.rng = random.Random(seed)
+        self.corpus = corpus
+        self.risky = risk_sentences()
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.pool = [self._fresh() for _ in range(WARM_POOL_SIZE)] if regime == "warm" else []
+
+    def _fresh(self):
+        self._counter += 1
+        tag = f"{os.getpid()}-{time.time_ns()}-{self._counter}"
+        if self.corpus:
+            # unique header keeps cold-regime corpus documents out of every cache
+            return "size:corpus", f"Policy reference {tag}. " + self.rng.choice(self.corpus)
+        roll, acc = self.rng.random(), 0.0
+        for name, share, target in SIZE_MIX:
+            acc += share
+            if roll <= acc:
+                break
+        return f"size:{name}", synthetic_policy(self.rng, target, self.risky, tag)
+
+    def next(self):
+        with self._lock:
+            if self.regime == "warm":
+                return self.rng.choice(self.pool)
+            return self._fresh()
+
+# ------------------------------
+# Process resource sampling
+# ------------------------------
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        # no procfs: peak RSS (kilobytes on Linux) is the best we have
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+class ResourceSampler(threading.Thread):
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="loadtest-sampler", daemon=True)
+        self.interval = interval
+        self.samples: List[Dict] = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        started, last_cpu, last_t = time.perf_counter(), cpu_seconds(), time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            now, cpu = time.perf_counter(), cpu_seconds()
+            self.samples.append({
+                "t": round(now - started, 2),
+                "cpu_cores": round((cpu - last_cpu) / max(now - last_t, 1e-9), 2),
+                "rss_mb": round(rss_bytes() / (1024 * 1024), 1),
+            })
+            last_cpu, last_t = cpu, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# ------------------------------
+# One simulated session
+# ------------------------------
+def analyze_like_home_page(text: str, profile_paths: Dict[str, str], index_path: Path, summarize_fn=None) -> Dict:
+    timings = {}
+    started = time.perf_counter()
+    conn = open_index(index_path)
+    try:
+        t = time.perf_counter()
+        neighbour = find_near_duplicate(conn, text, fingerprint=matcher_fingerprint(profile_paths))
+        timings["near_duplicate"] = time.perf_counter() - t
+        if neighbour:
+            summarize_fn = lambda _text: {"summary": neighbour["summary"], "preset": "reused", "decode_steps": 0}
+
+        analysis = run_analysis(text, profile_paths, summarize_fn=summarize_fn,
+                                known_sentence_hits=neighbour["sentence_hits"] if neighbour else None)
+        timings.update(analysis["timings"])
+        timings["degraded"] = bool(analysis["degraded"])
+
+        t = time.perf_counter()
+        for name, result in analysis["profiles"].items():
+            index_analysis(conn, "loadtest", text, analysis["summary"], result, profile=name,
+                           timings=analysis["timings"])
+        learn_policy(text)
+        if not analysis["summary_failed"] and not neighbour and "summarize" not in analysis["degraded"]:
+            register_document(conn, text, analysis["summary"], document_sentence_hits(text, profile_paths))
+        timings["index"] = time.perf_counter() - t
+    finally:
+        conn.close()
+    timings["total"] = time.perf_counter() - started
+    return timings
+
+def run_level(sessions: int, requests_per_session: int, source: DocumentSource, profile_paths: Dict[str, str],
+              index_path: Path, summarize_fn=None, think_time: float = 0.0) -> Dict:
+    records: List[Dict] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def session(sid):
+        for _ in range(requests_per_session):
+            size, text = source.next()
+            try:
+                timings = analyze_like_home_page(text, profile_paths, index_path, summarize_fn)
+                with lock:
+                    records.append({"size": size, **timings})
+            except Exception as e:
+                with lock:
+                    errors.append(f"{type(e).__name__}: {e}")
+            if think_time:
+                time.sleep(think_time)
+
+    sampler = ResourceSampler()
+    rss_before = rss_bytes()
+    cpu_before = cpu_seconds()
+    started = time.perf_counter()
+    sampler.start()
+    threads = [threading.Thread(target=session, args=(i,), name=f"session-{i}") for i in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+
+    return {
+        "sessions": sessions,
+        "requests": len(records),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(records) / elapsed, 3) if elapsed else 0.0,
+        "cpu_cores_avg": round((cpu_seconds() - cpu_before) / elapsed, 2) if elapsed else 0.0,
+        "rss_growth_mb": round((rss_bytes() - rss_before) / (1024 * 1024), 1),
+        "degraded": sum(r.pop("degraded") for r in records),
+        "latency_ms": latency_table(records),
+        "timeline": sampler.samples,
+    }
+
+def latency_table(records: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """p50/p95/p99/max in milliseconds for every stage and for each size class' total."""
+    series: Dict[str, List[float]] = {}
+    for record in records:
+        for key, value in record.items():
+            if key != "size":
+                series.setdefault(key, []).append(value)
+        series.setdefault(f"total[{record['size']}]", []).append(record["total"])
+
+    table = {}
+    for key, values in series.items():
+        ms = np.asarray(values) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        table[key] = {"n": len(values), "p50": round(p50, 1), "p95": round(p95, 1),
+                      "p99": round(p99, 1), "max": round(float(ms.max()), 1)}
+    return table
+
+def clear_caches() -> None:
+    import streamlit as st
+    st.cache_data.clear()
+
+def print_level(regime: str, level: Dict) -> None:
+    print(f"\n== {regime} · {level['sessions']} sessions · {level['requests']} requests "
+          f"· {level['throughput_rps']} req/s · {level['cpu_cores_avg']} cores · "
+          f"RSS +{level['rss_growth_mb']} MB · {level['errors']} errors · {level['degraded']} degraded")
+    print(f"{'stage':<24}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for key, row in sorted(level["latency_ms"].items(), key=lambda kv: (kv[0] != "total", kv[0])):
+        print(f"{key:<24}{row['n']:>6}{row['p50']:>10}{row['p95']:>10}{row['p99']:>10}{row['max']:>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the TermsBuster analysis pipeline with concurrent sessions.")
+    parser.add_argument("--sessions", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=5, help="analyses per session and level")
+    parser.add_argument("--regime", choices=["cold", "warm", "both"], default="both")
+    parser.add_argument("--profile", action="append", dest="profiles", help="risk profile name (repeatable)")
+    parser.add_argument("--corpus", default=None, help="directory of .txt policies instead of synthetic ones")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between a session's requests")
+    parser.add_argument("--stub-summary-ms", type=float, default=None,
+                        help="replace the model with a fixed-latency stub (measures everything else)")
+    parser.add_argument("--json", default=None, help="write all results (incl. CPU/RSS timeline) here")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    available = discover_risk_profiles()
+    profile_paths = {n: available[n] for n in (args.profiles or [DEFAULT_PROFILE_NAME])}
+    corpus = load_corpus(args.corpus) if args.corpus else None
+    levels = [int(n) for n in args.sessions.split(",") if n.strip()]
+
+    summarize_fn = None
+    if args.stub_summary_ms is not None:
+        def summarize_fn(text):
+            time.sleep(args.stub_summary_ms / 1000)
+            return {"summary": text[:200], "preset": "stub", "decode_steps": 0}
+
+    results = {"args": vars(args), "runs": []}
+    # synthetic documents are counted into a throwaway corpus, not data/corpus_idf.npz
+    with tempfile.TemporaryDirectory() as tmp, scratch_corpus_model():
+        for regime in (["cold", "warm"] if args.regime == "both" else [args.regime]):
+            for sessions in levels:
+                # fresh index per level: the near-duplicate table must not carry over
+                index_path = Path(tmp) / f"{regime}-{sessions}.db"
+                if regime == "cold":
+                    clear_caches()
+                source = DocumentSource(regime, args.seed, corpus)
+                if regime == "warm":
+                    for _, text in source.pool:
+                        analyze_like_home_page(text, profile_paths, index_path, summarize_fn)
+                level = run_level(sessions, args.requests, source, profile_paths, index_path,
+                                  summarize_fn, args.think_ms / 1000)
+                level["regime"] = regime
+                results["runs"].append(level)
+                print_level(regime, level)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✅ Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
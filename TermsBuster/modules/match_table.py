@@ -0,0 +1,157 @@
+# match_table.py
+"""
+Compact representation of keyword matches.
+
+Instead of copying every matched sentence into every keyword that hits it,
+a result holds one shared sentence table plus parallel integer columns:
+
+    {
+        "levels":       ["very_high_risk", ...],
+        "sentences":    ["...", ...],
+        "keywords":     [[level_id, keyword, score_each, count, total_score, first_hit], ...],
+        "hit_keyword":  [keyword_id, ...],
+        "hit_sentence": [sentence_id, ...],
+        "hit_start":    [char offset, ...],
+        "hit_end":      [char offset, ...],
+    }
+
+Hits of one keyword are contiguous (`first_hit` .. `first_hit + count`).
+Strings are only materialized by the view helpers below, when rendering.
+The view helpers also accept the older nested {level: {keyword: detail}} dict
+(e.g. a `latest_analysis.json` written before this format existed).
+"""
+from typing import Dict, Iterator, List, Optional, Tuple
+
+KW_LEVEL, KW_KEYWORD, KW_SCORE_EACH, KW_COUNT, KW_TOTAL, KW_FIRST_HIT = range(6)
+
+# ------------------------------
+# Builder (used by the analyzer)
+# ------------------------------
+class MatchTableBuilder:
+    def __init__(self, sentences: Optional[List[str]] = None, sentence_ids: Optional[Dict[str, int]] = None):
+        # sentence table may be shared between several tables (one per risk profile)
+        self.sentences = sentences if sentences is not None else []
+        self._sentence_ids = sentence_ids if sentence_ids is not None else {}
+        self.levels: List[str] = []
+        self._level_ids: Dict[str, int] = {}
+        self.keywords: List[list] = []
+        self._keyword_rows: Dict[Tuple[int, str], int] = {}
+        self.hit_keyword: List[int] = []
+        self.hit_sentence: List[int] = []
+        self.hit_start: List[int] = []
+        self.hit_end: List[int] = []
+
+    def sentence_id(self, sentence: str) -> int:
+        sid = self._sentence_ids.get(sentence)
+        if sid is None:
+            sid = self._sentence_ids[sentence] = len(self.sentences)
+            self.sentences.append(sentence)
+        return sid
+
+    def add_level(self, level_key: str) -> int:
+        lid = self._level_ids.get(level_key)
+        if lid is None:
+            lid = self._level_ids[level_key] = len(self.levels)
+            self.levels.append(level_key)
+        return lid
+
+    def add_keyword(self, level_key: str, keyword: str, score_each: int, total_score: int,
+                    hits: List[Tuple[int, int, str]]) -> None:
+        """`hits` are (start, end, sentence) for every valid occurrence."""
+        lid = self.add_level(level_key)
+        row_id = self._keyword_rows.get((lid, keyword))
+        if row_id is not None:
+            # same keyword listed twice under one level: later entry wins, hits are identical
+            row = self.keywords[row_id]
+            row[KW_SCORE_EACH], row[KW_TOTAL] = score_each, total_score
+            return
+
+        kid = len(self.keywords)
+        self._keyword_rows[(lid, keyword)] = kid
+        self.keywords.append([lid, keyword, score_each, len(hits), total_score, len(self.hit_keyword)])
+        for start, end, sentence in hits:
+            self.hit_keyword.append(kid)
+            self.hit_sentence.append(self.sentence_id(sentence))
+            self.hit_start.append(start)
+            self.hit_end.append(end)
+
+    def build(self) -> Dict:
+        return {
+            "levels": self.levels,
+            "sentences": self.sentences,
+            "keywords": self.keywords,
+            "hit_keyword": self.hit_keyword,
+            "hit_sentence": self.hit_sentence,
+            "hit_start": self.hit_start,
+            "hit_end": self.hit_end,
+        }
+
+# ------------------------------
+# View helpers (used when rendering)
+# ------------------------------
+def is_compact(matches) -> bool:
+    return isinstance(matches, dict) and "keywords" in matches and "sentences" in matches
+
+def iter_keyword_matches(matches) -> Iterator[Dict]:
+    """One dict per matched keyword: id, level, keyword, score_each, count, total_score."""
+    if not matches:
+        return
+    if is_compact(matches):
+        levels = matches["levels"]
+        for kid, row in enumerate(matches["keywords"]):
+            yield {
+                "id": kid,
+                "level": levels[row[KW_LEVEL]],
+                "keyword": row[KW_KEYWORD],
+                "score_each": row[KW_SCORE_EACH],
+                "count": row[KW_COUNT],
+                "total_score": row[KW_TOTAL],
+            }
+        return
+    for level_key, level_data in matches.items():
+        for kw, detail in (level_data or {}).items():
+            yield {
+                "id": (level_key, kw),
+                "level": level_key,
+                "keyword": kw,
+                "score_each": detail.get("score_each", 0),
+                "count": detail.get("count", len(detail.get("sentences", []))),
+                "total_score": detail.get("total_score", 0),
+            }
+
+def keyword_hits(matches, entry: Dict, start: int = 0,
+                 stop: Optional[int] = None) -> List[Tuple[str, Optional[int], Optional[int]]]:
+    """
+    (sentence, start, end) per occurrence; offsets are None for the legacy format.
+    `start`/`stop` select a slice of the occurrences without building the rest.
+    """
+    stop = entry["count"] if stop is None else min(stop, entry["count"])
+    if is_compact(matches):
+        first = matches["keywords"][entry["id"]][KW_FIRST_HIT]
+        sentences = matches["sentences"]
+        return [
+            (sentences[matches["hit_sentence"][i]], matches["hit_start"][i], matches["hit_end"][i])
+            for i in range(first + start, first + stop)
+        ]
+    level_key, kw = entry["id"]
+    return [(s, None, None) for s in matches[level_key][kw].get("sentences", [])[start:stop]]
+
+def keyword_sentences(matches, entry: Dict) -> List[str]:
+    return [sentence for sentence, _, _ in keyword_hits(matches, entry)]
+
+def keyword_count(matches) -> int:
+    return sum(1 for _ in iter_keyword_matches(matches))
+
+def materialize_matches(matches) -> Dict[str, Dict]:
+    """Expand to the nested {level: {keyword: {..., "sentences": [...]}}} form."""
+    if not is_compact(matches):
+        return matches or {}
+    out: Dict[str, Dict] = {level_key: {} for level_key in matches["levels"]}
+    for entry in iter_keyword_matches(matches):
+        out[entry["level"]][entry["keyword"]] = {
+            "count": entry["count"],
+            "score_each": entry["score_each"],
+            "total_score": entry["total_score"],
+            "sentences": keyword_sentences(matches, entry),
+        }
+    return out
@@ -0,0 +1,86 @@
+# model_client.py
+"""
+Client side of the shared model server (see `modules.model_server`).
+
+Set TERMSBUSTER_MODEL_SERVER to "host:port" or "unix:/path/to.sock" and every
+Streamlit process / HTTP service sends its summaries there instead of loading
+its own copy of DistilBART.
+"""
+import json
+import socket
+import time
+
+MODEL_SERVER_ENV = "TERMSBUSTER_MODEL_SERVER"
+REQUEST_TIMEOUT = 300  # seconds; a long policy with the quality preset is slow on CPU
+CANCEL_POLL_S = 0.2    # how often a cancellable request checks its event
+
+class RequestCancelled(RuntimeError):
+    """The caller's cancel event was set before the server answered; the connection was closed."""
+
+def parse_address(address: str):
+    """("unix", path) or ("tcp", (host, port)) for an address string."""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ValueError(f"Invalid model server address: {address!r}")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+def connect(address: str, timeout: float = REQUEST_TIMEOUT) -> socket.socket:
+    kind, target = parse_address(address)
+    if kind == "unix":
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(target)
+        return sock
+    return socket.create_connection(target, timeout=timeout)
+
+def _read_line_cancellable(sock: socket.socket, cancel, timeout: float) -> bytes:
+    """Read one line, giving up (RequestCancelled) as soon as `cancel` is set."""
+    deadline = time.monotonic() + timeout
+    chunks = []
+    while True:
+        if cancel.is_set():
+            raise RequestCancelled("model server request cancelled")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise socket.timeout("timed out")
+        sock.settimeout(min(CANCEL_POLL_S, remaining))
+        try:
+            data = sock.recv(65536)
+        except socket.timeout:
+            continue
+        if not data:
+            break
+        chunks.append(data)
+        if b"\n" in data:
+            break
+    return b"".join(chunks).split(b"\n", 1)[0]
+
+def call(address: str, request: dict, timeout: float = REQUEST_TIMEOUT, cancel=None) -> dict:
+    """
+    Send one JSON line, read one JSON line back. Setting the `cancel` event
+    closes the connection, which tells the server to drop the request.
+    """
+    with connect(address, timeout) as sock:
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        if cancel is not None:
+            line = _read_line_cancellable(sock, cancel, timeout)
+        else:
+            with sock.makefile("rb") as reader:
+                line = reader.readline()
+    if not line:
+        raise ConnectionError("model server closed the connection")
+    response = json.loads(line)
+    if "error" in response:
+        raise RuntimeError(f"model server: {response['error']}")
+    return response
+
+def request_summary(address: str, text: str, preset: str, max_length=None, min_length=None, cancel=None) -> dict:
+    return call(address, {
+        "op": "summarize",
+        "text": text,
+        "preset": preset,
+        "max_length": max_length,
+        "min_length": min_length,
+    }, cancel=cancel)
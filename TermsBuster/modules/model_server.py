@@ -0,0 +1,252 @@
+# model_server.py
+"""
+Shared DistilBART server with micro-batching.
+
+    python -m modules.model_server --listen unix:/tmp/termsbuster-model.sock --threads 4
+    TERMSBUSTER_MODEL_SERVER=unix:/tmp/termsbuster-model.sock streamlit run app.py
+
+One process owns the model. Requests arriving within `--window-ms` of each
+other are summarized together in one `generate` call (up to `--max-batch`),
+so concurrent sessions share CPU threads instead of fighting over them.
+Window selection and length budgets are computed on each connection's
+thread; the batcher thread only groups and decodes. A client that hangs up
+cancels its request: it is dropped if still queued, and a batch stops
+decoding once all of its clients are gone.
+
+Wire format: one JSON object per line in each direction.
+    {"op": "summarize", "text": ..., "preset": ..., "max_length": null, "min_length": null}
+    {"op": "stats"}
+"""
+import argparse
+import json
+import os
+import queue
+import select
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from modules.model_client import CANCEL_POLL_S, RequestCancelled, parse_address
+
+DEFAULT_WINDOW_MS = 25
+DEFAULT_MAX_BATCH = 8
+
+# ------------------------------
+# Micro-batcher
+# ------------------------------
+class MicroBatcher:
+    """
+    Collects submitted requests on one worker thread and hands them to
+    `run_batch(key, requests)` in groups that share a `key_fn` value.
+    Requests whose "cancel" event is set before their batch starts are dropped.
+    """
+
+    def __init__(self, run_batch, key_fn, window: float = DEFAULT_WINDOW_MS / 1000,
+                 max_batch: int = DEFAULT_MAX_BATCH):
+        self.run_batch = run_batch
+        self.key_fn = key_fn
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = {"requests": 0, "batches": 0, "largest_batch": 0, "busy_seconds": 0.0}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        threading.Thread(target=self._loop, name="micro-batcher", daemon=True).start()
+
+    def submit(self, request: dict) -> Future:
+        future = Future()
+        self._queue.put((request, future))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            groups = {}
+            for request, future in self._collect():
+                cancel = request.get("cancel")
+                if cancel is not None and cancel.is_set():
+                    future.set_exception(RequestCancelled("request cancelled while queued"))
+                    continue
+                try:
+                    key = self.key_fn(request)
+                except Exception as e:
+                    future.set_exception(e)
+                    continue
+                groups.setdefault(key, []).append((request, future))
+
+            for key, items in groups.items():
+                started = time.perf_counter()
+                try:
+                    results = self.run_batch(key, [request for request, _ in items])
+                    for (_, future), result in zip(items, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                with self._lock:
+                    self.stats["requests"] += len(items)
+                    self.stats["batches"] += 1
+                    self.stats["largest_batch"] = max(self.stats["largest_batch"], len(items))
+                    self.stats["busy_seconds"] += time.perf_counter() - started
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["mean_batch"] = round(stats["requests"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+# ------------------------------
+# Summarization backend
+# ------------------------------
+class _AllCancelled:
+    """Cancel view of a batch: true once every request in it was abandoned."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def is_set(self) -> bool:
+        return all(event.is_set() for event in self.events)
+
+def prepare_summary_request(request: dict) -> dict:
+    """Window selection and length budget of a wire request (run on the connection thread)."""
+    from modules.summarizer import prepare_input
+
+    text, min_length, max_length = prepare_input(request["text"], request["preset"],
+                                                 request.get("max_length"), request.get("min_length"))
+    return {"text": text, "preset": request["preset"], "min_length": min_length, "max_length": max_length,
+            "cancel": threading.Event()}
+
+def summary_batch_key(request: dict):
+    # one generate() call per decoding config and length budget, so an input is
+    # decoded with the same budget whatever it is batched with
+    return request["preset"], request["max_length"], request["min_length"]
+
+def run_summary_batch(key, requests):
+    from modules.summarizer import generate_batch
+
+    preset, max_length, min_length = key
+    return generate_batch([r["text"] for r in requests], preset, max_length, min_length,
+                          cancel=_AllCancelled([r["cancel"] for r in requests]))
+
+# ------------------------------
+# Socket server
+# ------------------------------
+def peer_closed(sock: socket.socket) -> bool:
+    """True once the client has hung up (clients send nothing after their request line)."""
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+    except OSError:
+        return True
+
+class ModelRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+            response = self.server.dispatch(request, self.connection)
+        except RequestCancelled:
+            return  # the client is gone; nobody to answer
+        except Exception as e:
+            response = {"error": f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+class _ModelServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128   # every waiting session holds a connection
+    batcher: MicroBatcher = None
+
+    def dispatch(self, request: dict, connection=None) -> dict:
+        from modules.summarizer import SUMMARY_PRESETS
+
+        op = request.get("op", "summarize")
+        if op == "stats":
+            return self.batcher.snapshot()
+        if op != "summarize":
+            raise ValueError(f"unsupported op: {op!r}")
+        if not isinstance(request.get("text"), str) or not request["text"].strip():
+            raise ValueError("'text' must be a non-empty string")
+        if request.get("preset") not in SUMMARY_PRESETS:
+            raise ValueError(f"Unknown summary preset: {request.get('preset')}")
+        prepared = prepare_summary_request(request)
+        future = self.batcher.submit(prepared)
+        while True:
+            try:
+                return future.result(timeout=CANCEL_POLL_S)
+            except FutureTimeout:
+                if connection is not None and peer_closed(connection):
+                    prepared["cancel"].set()
+                    raise RequestCancelled("client disconnected")
+
+class TCPModelServer(_ModelServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class UnixModelServer(_ModelServerMixin, socketserver.ThreadingUnixStreamServer):
+        pass
+
+def make_server(address: str, batcher: MicroBatcher):
+    kind, target = parse_address(address)
+    if kind == "unix":
+        if os.path.exists(target):
+            os.unlink(target)  # stale socket from a previous run
+        server = UnixModelServer(target, ModelRequestHandler)
+    else:
+        server = TCPModelServer(target, ModelRequestHandler)
+    server.batcher = batcher
+    return server
+
+def configure_torch_threads(intra_op: int = 0, inter_op: int = 0) -> None:
+    """Pin torch's thread pools; must run before the model does any work."""
+    import torch
+
+    if intra_op:
+        torch.set_num_threads(intra_op)
+    if inter_op:
+        torch.set_num_interop_threads(inter_op)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve DistilBART to every TermsBuster process on this machine.")
+    parser.add_argument("--listen", default="127.0.0.1:8503", help='"host:port" or "unix:/path/to.sock"')
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS, help="how long to wait for a batch to fill")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = torch default)")
+    parser.add_argument("--interop-threads", type=int, default=0, help="torch inter-op threads (0 = torch default)")
+    args = parser.parse_args(argv)
+
+    configure_torch_threads(args.threads, args.interop_threads)
+    from modules.summarizer import load_model
+    load_model()
+
+    batcher = MicroBatcher(run_summary_batch, summary_batch_key, args.window_ms / 1000, args.max_batch)
+    server = make_server(args.listen, batcher)
+    print(f"✅ Model server listening on {args.listen} (window {args.window_ms:g} ms, batch ≤ {args.max_batch})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# near_duplicate.py
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# ------------------------------
+# MinHash parameters
+# ------------------------------
+NUM_PERM = 128
+BANDS = 16                      # 16 bands x 8 rows -> candidates from ~0.7 Jaccard
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 5                # words per shingle
+SIMILARITY_THRESHOLD = 0.85
+
+# a, b and the shingle hashes x all stay below 2^32, so a * x < 2^64 never
+# wraps in uint64 and (a * x + b) mod p is computed exactly
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 32) - 1, size=NUM_PERM, dtype=np.uint64)
+assert int(_PERM_A.max()) * int(_MAX_HASH) < 1 << 64
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dedup_documents (
+    id INTEGER PRIMARY KEY,
+    text_hash TEXT NOT NULL UNIQUE,
+    created_at REAL NOT NULL,
+    summary TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    sentence_hashes TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dedup_buckets (
+    band INTEGER NOT NULL,
+    bucket TEXT NOT NULL,
+    doc_id INTEGER NOT NULL REFERENCES dedup_documents (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_dedup_buckets ON dedup_buckets (band, bucket);
+CREATE TABLE IF NOT EXISTS dedup_sentence_hits (
+    doc_id INTEGER NOT NULL REFERENCES dedup_documents (id) ON DELETE CASCADE,
+    matcher TEXT NOT NULL,
+    hits TEXT NOT NULL,
+    PRIMARY KEY (doc_id, matcher)
+);
+"""
+
+# ------------------------------
+# Normalization
+# ------------------------------
+def normalize_for_dedup(text: str) -> str:
+    """Lowercase, fold digits (dates, years) and collapse whitespace."""
+    text = (text or "").lower()
+    text = re.sub(r"\d+", "0", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def split_sentences(text: str) -> List[str]:
+    sentences = re.split(r'(?<=[\.?!])\s+', normalize_for_dedup(text))
+    return [s for s in sentences if s]
+
+def sentence_hash(sentence: str) -> str:
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=8).hexdigest()
+
+# ------------------------------
+# MinHash signature
+# ------------------------------
+def minhash_signature(text: str) -> np.ndarray:
+    words = normalize_for_dedup(text).split()
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)}
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+    hashes &= _MAX_HASH
+    # (a * x + b) mod p, reduced after each step; one row per permutation, minimum per permutation
+    products = np.outer(hashes, _PERM_A) % _MERSENNE_PRIME
+    permuted = np.bitwise_and((products + _PERM_B) % _MERSENNE_PRIME, _MAX_HASH)
+    return permuted.min(axis=0)
+
+def estimate_similarity(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.mean(sig_a == sig_b))
+
+def band_keys(signature: np.ndarray) -> List[str]:
+    return [
+        hashlib.blake2b(signature[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).hexdigest()
+        for b in range(BANDS)
+    ]
+
+# ------------------------------
+# LSH index (stored next to the policy index)
+# ------------------------------
+def ensure_schema(conn: sqlite3.Connection) -> None:
+    conn.executescript(SCHEMA)
+
+def register_document(conn: sqlite3.Connection, text: str, summary: str,
+                      sentence_hits: Optional[Dict[bytes, Dict]] = None) -> int:
+    """
+    Remember an analyzed document so later near-duplicates can reuse its
+    summary, and its per-sentence keyword scan (`sentence_hits`: matcher
+    fingerprint -> risk_analyzer.sentence_hit_table) where given.
+    """
+    ensure_schema(conn)
+    digest = hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+    signature = minhash_signature(text)
+    sentences = sorted({sentence_hash(s) for s in split_sentences(text)})
+
+    with conn:
+        conn.execute("DELETE FROM dedup_documents WHERE text_hash = ?", (digest,))
+        cur = conn.execute(
+            "INSERT INTO dedup_documents (text_hash, created_at, summary, signature, sentence_hashes) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (digest, time.time(), summary, signature.tobytes(), json.dumps(sentences)),
+        )
+        doc_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO dedup_buckets (band, bucket, doc_id) VALUES (?, ?, ?)",
+            [(band, key, doc_id) for band, key in enumerate(band_keys(signature))],
+        )
+        conn.executemany(
+            "INSERT INTO dedup_sentence_hits (doc_id, matcher, hits) VALUES (?, ?, ?)",
+            [(doc_id, fingerprint.hex(), json.dumps(table)) for fingerprint, table in (sentence_hits or {}).items()],
+        )
+    return doc_id
+
+def find_near_duplicate(conn: sqlite3.Connection, text: str, threshold: float = SIMILARITY_THRESHOLD,
+                        fingerprint: Optional[bytes] = None) -> Optional[Dict]:
+    """
+    Closest previously analyzed document above `threshold`, or None.
+    The result carries the neighbour's summary, the estimated similarity,
+    the sentences of `text` that do not occur in the neighbour and, for a
+    matcher `fingerprint`, the neighbour's per-sentence keyword scan
+    ("sentence_hits", None when it was not stored for that matcher).
+    """
+    ensure_schema(conn)
+    signature = minhash_signature(text)
+    keys = band_keys(signature)
+
+    clause = " OR ".join(["(band = ? AND bucket = ?)"] * BANDS)
+    params = [v for band, key in enumerate(keys) for v in (band, key)]
+    candidate_ids = [r[0] for r in conn.execute(f"SELECT DISTINCT doc_id FROM dedup_buckets WHERE {clause}", params)]
+    if not candidate_ids:
+        return None
+
+    best = None
+    placeholders = ",".join("?" * len(candidate_ids))
+    rows = conn.execute(
+        f"SELECT id, summary, signature, sentence_hashes FROM dedup_documents WHERE id IN ({placeholders})",
+        candidate_ids,
+    )
+    for doc_id, summary, sig_blob, sentence_hashes in rows:
+        similarity = estimate_similarity(signature, np.frombuffer(sig_blob, dtype=np.uint64))
+        if similarity >= threshold and (best is None or similarity > best["similarity"]):
+            best = {"id": doc_id, "summary": summary, "similarity": similarity, "sentence_hashes": sentence_hashes}
+
+    if best is None:
+        return None
+
+    known = set(json.loads(best.pop("sentence_hashes")))
+    best["changed_sentences"] = [s for s in split_sentences(text) if sentence_hash(s) not in known]
+    best["sentence_hits"] = None
+    if fingerprint is not None:
+        row = conn.execute("SELECT hits FROM dedup_sentence_hits WHERE doc_id = ? AND matcher = ?",
+                           (best["id"], fingerprint.hex())).fetchone()
+        if row:
+            best["sentence_hits"] = {key: tuple(tuple(hit) for hit in hits) for key, hits in json.loads(row[0]).items()}
+    return best
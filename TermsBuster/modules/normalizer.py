@@ -0,0 +1,103 @@
+# normalizer.py
+import re
+from typing import List, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"\S+")
+OFFSET_DTYPE = np.int32       # 4 bytes per character; uploads are far below 2**31 characters
+
+# ------------------------------
+# Normalized text with an offset map
+# ------------------------------
+class NormalizedText:
+    """
+    Lowercased, whitespace-collapsed view of one or more text parts,
+    equal to `clean_text(" ".join(parts))`, built in a single pass.
+
+    `offsets[i]` is the position in the original (virtually joined) text of
+    normalized character `i`, so any normalized span can be mapped back and
+    shown in its original casing without searching again.
+    """
+
+    def __init__(self, *parts: str, sep: str = " "):
+        self.parts = [str(p) if p is not None else "" for p in parts]
+        self.sep = sep
+
+        # start of every part inside the virtual "sep".join(parts)
+        self.part_starts: List[int] = []
+        pos = 0
+        for part in self.parts:
+            self.part_starts.append(pos)
+            pos += len(part) + len(sep)
+
+        # collect tokens with their positions in the virtual joined text
+        originals: List[str] = []
+        tokens: List[str] = []
+        starts: List[int] = []
+        lengths_equal = True
+        for part, base in zip(self.parts, self.part_starts):
+            for m in TOKEN_RE.finditer(part):
+                lowered = m.group().lower()
+                lengths_equal = lengths_equal and len(lowered) == len(m.group())
+                originals.append(m.group())
+                tokens.append(lowered)
+                starts.append(base + m.start())
+
+        self.text = " ".join(tokens)
+        if lengths_equal:
+            self.offsets = self._offsets_fast(tokens, starts)
+        else:
+            self.offsets = self._offsets_per_char(originals, starts)
+
+    @staticmethod
+    def _offsets_fast(tokens: List[str], starts: List[int]) -> np.ndarray:
+        # every token and every collapsed space is a run whose offsets grow by one per char
+        if not tokens:
+            return np.zeros(1, dtype=OFFSET_DTYPE)
+        tok_len = np.fromiter((len(t) for t in tokens), dtype=OFFSET_DTYPE, count=len(tokens))
+        tok_start = np.asarray(starts, dtype=OFFSET_DTYPE)
+        tok_end = tok_start + tok_len
+
+        n = len(tokens)
+        run_orig = np.empty(2 * n - 1, dtype=OFFSET_DTYPE)
+        run_len = np.empty(2 * n - 1, dtype=OFFSET_DTYPE)
+        run_orig[0::2], run_len[0::2] = tok_start, tok_len
+        # the collapsed space maps to the first whitespace char after the previous token
+        run_orig[1::2], run_len[1::2] = tok_end[:-1], 1
+
+        run_norm = np.concatenate((np.zeros(1, dtype=OFFSET_DTYPE), np.cumsum(run_len, dtype=OFFSET_DTYPE)[:-1]))
+        total = int(run_len.sum())
+        offsets = np.repeat(run_orig - run_norm, run_len) + np.arange(total, dtype=OFFSET_DTYPE)
+        return np.append(offsets, tok_end[-1])
+
+    @staticmethod
+    def _offsets_per_char(originals: List[str], starts: List[int]) -> np.ndarray:
+        # lowercasing changed some token lengths (e.g. "İ"): map char by char
+        offsets: List[int] = []
+        prev_end = 0
+        for k, (original, start) in enumerate(zip(originals, starts)):
+            if k:
+                offsets.append(prev_end)
+            for i, ch in enumerate(original):
+                offsets.extend([start + i] * len(ch.lower()))
+            prev_end = start + len(original)
+        offsets.append(prev_end)
+        return np.asarray(offsets, dtype=OFFSET_DTYPE)
+
+    def original_span(self, start: int, end: int) -> Tuple[int, int]:
+        """Map a normalized [start, end) span to the original text."""
+        if end <= start:
+            pos = int(self.offsets[min(start, len(self.offsets) - 1)])
+            return pos, pos
+        return int(self.offsets[start]), int(self.offsets[end - 1]) + 1
+
+    def original(self, start: int, end: int) -> str:
+        """Original-casing text for a normalized [start, end) span."""
+        orig_start, orig_end = self.original_span(start, end)
+        pieces = []
+        for part, base in zip(self.parts, self.part_starts):
+            lo, hi = max(orig_start, base), min(orig_end, base + len(part))
+            if lo < hi:
+                pieces.append(part[lo - base:hi - base])
+        return self.sep.join(pieces)
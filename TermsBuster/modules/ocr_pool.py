@@ -0,0 +1,185 @@
+# ocr_pool.py
+"""
+Pool of long-lived tesseract engines.
+
+Each worker thread owns one engine, initialized once (language data loaded
+once) and reused for every page; images are handed over in memory. Engines,
+in order of preference:
+
+    tesserocr   Python binding of the tesseract C++ API
+    capi        libtesseract's C API through ctypes (no extra package)
+    subprocess  pytesseract, one tesseract process per image (previous behaviour)
+
+Recognition releases the GIL, so threads run in parallel. Jobs wait in a
+bounded queue: when every worker is busy and the queue is full, callers
+block (backpressure) instead of piling up images in memory.
+
+    TERMSBUSTER_OCR_ENGINE=capi TERMSBUSTER_OCR_WORKERS=4 streamlit run app.py
+"""
+import ctypes
+import ctypes.util
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+OCR_ENGINE = os.environ.get("TERMSBUSTER_OCR_ENGINE", "auto")   # auto | tesserocr | capi | subprocess
+OCR_WORKERS = int(os.environ.get("TERMSBUSTER_OCR_WORKERS", os.cpu_count() or 1))
+OCR_QUEUE_SIZE = int(os.environ.get("TERMSBUSTER_OCR_QUEUE", 2 * OCR_WORKERS))
+OCR_LANG = os.environ.get("TERMSBUSTER_OCR_LANG", "eng")
+SOURCE_DPI = 300              # preprocessing scales glyphs to roughly this resolution
+
+# ----------------------------------------
+# Engines (one per worker thread)
+# ----------------------------------------
+class TesserocrEngine:
+    def __init__(self, lang: str = OCR_LANG):
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def recognize(self, image, psm: int) -> str:
+        self.api.SetPageSegMode(psm)
+        self.api.SetImage(image)
+        self.api.SetSourceResolution(SOURCE_DPI)
+        return self.api.GetUTF8Text()
+
+    def close(self):
+        self.api.End()
+
+_capi = None
+
+def load_capi():
+    """libtesseract with the C API prototypes used below, or None when it is not installed."""
+    global _capi
+    if _capi is None:
+        name = ctypes.util.find_library("tesseract")
+        if not name:
+            return None
+        try:
+            lib = ctypes.CDLL(name)
+        except OSError:
+            return None
+        handle = ctypes.c_void_p
+        lib.TessBaseAPICreate.restype = handle
+        lib.TessBaseAPIInit3.argtypes = [handle, ctypes.c_char_p, ctypes.c_char_p]
+        lib.TessBaseAPIInit3.restype = ctypes.c_int
+        lib.TessBaseAPISetPageSegMode.argtypes = [handle, ctypes.c_int]
+        lib.TessBaseAPISetImage.argtypes = [handle, ctypes.c_char_p] + [ctypes.c_int] * 4
+        lib.TessBaseAPISetSourceResolution.argtypes = [handle, ctypes.c_int]
+        lib.TessBaseAPIGetUTF8Text.argtypes = [handle]
+        lib.TessBaseAPIGetUTF8Text.restype = ctypes.c_void_p   # freed with TessDeleteText
+        lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+        lib.TessBaseAPIEnd.argtypes = [handle]
+        lib.TessBaseAPIDelete.argtypes = [handle]
+        _capi = lib
+    return _capi
+
+class CApiEngine:
+    def __init__(self, lang: str = OCR_LANG):
+        self.lib = load_capi()
+        self.handle = self.lib.TessBaseAPICreate()
+        datapath = os.environ.get("TESSDATA_PREFIX")
+        if self.lib.TessBaseAPIInit3(self.handle, datapath.encode() if datapath else None, lang.encode()) != 0:
+            self.lib.TessBaseAPIDelete(self.handle)
+            raise RuntimeError(f"tesseract could not load language data for '{lang}'")
+
+    def recognize(self, image, psm: int) -> str:
+        gray = image if image.mode == "L" else image.convert("L")
+        width, height = gray.size
+        self.lib.TessBaseAPISetPageSegMode(self.handle, psm)
+        self.lib.TessBaseAPISetImage(self.handle, gray.tobytes(), width, height, 1, width)
+        self.lib.TessBaseAPISetSourceResolution(self.handle, SOURCE_DPI)
+        text = self.lib.TessBaseAPIGetUTF8Text(self.handle)
+        if not text:
+            return ""
+        try:
+            return ctypes.string_at(text).decode("utf-8", errors="replace")
+        finally:
+            self.lib.TessDeleteText(text)
+
+    def close(self):
+        self.lib.TessBaseAPIEnd(self.handle)
+        self.lib.TessBaseAPIDelete(self.handle)
+
+class SubprocessEngine:
+    def recognize(self, image, psm: int) -> str:
+        return pytesseract.image_to_string(image, config=f"--psm {psm}")
+
+    def close(self):
+        pass
+
+ENGINES = {"tesserocr": TesserocrEngine, "capi": CApiEngine, "subprocess": SubprocessEngine}
+
+def engine_name(preference: str = OCR_ENGINE) -> str:
+    if preference != "auto":
+        return preference
+    if tesserocr is not None:
+        return "tesserocr"
+    if load_capi() is not None:
+        return "capi"
+    return "subprocess"
+
+# ----------------------------------------
+# Pool
+# ----------------------------------------
+class OCRPool:
+    """Worker threads, each with its own engine (created on first use), fed from a bounded queue."""
+
+    def __init__(self, engine_factory: Callable, workers: int = OCR_WORKERS, queue_size: int = OCR_QUEUE_SIZE):
+        self.engine_factory = engine_factory
+        self.jobs: "queue.Queue" = queue.Queue(maxsize=max(queue_size, 1))
+        self.threads = [threading.Thread(target=self._work, name=f"ocr-{i}", daemon=True)
+                        for i in range(max(workers, 1))]
+        for thread in self.threads:
+            thread.start()
+
+    def _work(self):
+        engine = None
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            future, image, psm = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if engine is None:
+                    engine = self.engine_factory()
+                future.set_result(engine.recognize(image, psm))
+            except BaseException as e:
+                future.set_exception(e)
+        if engine is not None:
+            engine.close()
+
+    def submit(self, image, psm: int = 3, timeout: Optional[float] = None) -> Future:
+        """Queue one image; blocks while the queue is full (raises queue.Full after `timeout`)."""
+        future: Future = Future()
+        self.jobs.put((future, image, psm), timeout=timeout)
+        return future
+
+    def recognize(self, image, psm: int = 3) -> str:
+        return self.submit(image, psm).result()
+
+    def close(self):
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+
+_pool: Optional[OCRPool] = None
+_pool_lock = threading.Lock()
+
+def ocr_pool() -> OCRPool:
+    """The process-wide pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OCRPool(ENGINES[engine_name()])
+        return _pool
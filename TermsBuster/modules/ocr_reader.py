@@ -1,16 +1,274 @@
 # ocr_reader.py
+import os
+import re
+from difflib import SequenceMatcher
+
+import numpy as np
 import pdfplumber
-from PIL import Image
-import pytesseract
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+from PIL import Image, ImageOps
+
+from modules.ingest import (MAX_IMAGE_PIXELS, MAX_PDF_PAGES, ExtractionFailed, UploadRejected, open_upload,
+                            read_text)
+from modules.ocr_pool import ocr_pool
+from modules.sections import larger_font_lines, page_heading_lines
+
+# ----------------------------------------
+# OCR pipeline settings
+# ----------------------------------------
+TARGET_MIN_WIDTH = 1200       # upscale narrow screenshots so glyphs reach ~300 DPI size
+TARGET_MAX_WIDTH = 2500       # downscale huge scans, recognition time grows with pixels
+TILE_HEIGHT = 1800            # split images taller than 1.5 tiles
+TILE_OVERLAP = 120            # used only when no blank row is found near a cut
+STITCH_LOOKBACK = 8           # lines compared when removing overlap duplicates
+
+# ----------------------------------------
+# PDF text backends
+# ----------------------------------------
+PDF_BACKEND = os.environ.get("TERMSBUSTER_PDF_BACKEND", "pdfium")   # "pdfium" (text only) or "pdfplumber"
+FRAGMENT_CHARS = 2            # pdfium lines this short are usually glyph fragments
+LINE_RE = re.compile(r"[^\r\n]+")
+
+def needs_layout(text):
+    """
+    pdfium keeps content-stream order; rotated or letter-spaced text then
+    comes out as one glyph per line and reads better after pdfplumber's
+    positional reassembly.
+    """
+    lines = [ln.strip() for ln in text.splitlines() if ln.strip()]
+    return len(lines) >= 10 and sum(len(ln) <= FRAGMENT_CHARS for ln in lines) > len(lines) / 2
+
+def _pdfium_page_text(page, headings=None):
+    textpage = page.get_textpage()
+    try:
+        text = textpage.get_text_range()
+        # font-size cue per line (first visible glyph); needs text offsets == char indices
+        if headings is not None and len(text) == textpage.count_chars():
+            lines = []
+            for m in LINE_RE.finditer(text):
+                line = m.group()
+                visible = len(line.strip())
+                first = m.start() + len(line) - len(line.lstrip())
+                size = pdfium_c.FPDFText_GetFontSize(textpage.raw, first) if visible else 0.0
+                lines.append((line.strip(), size, visible))
+            headings.extend(larger_font_lines(lines))
+    finally:
+        textpage.close()
+    return text.replace("\r\n", "\n").replace("\r", "\n").replace("\x02", "-")
+
+def _pdfplumber_page_texts(stream, page_numbers, headings=None):
+    """{page index: text} for the given 0-based pages, released one at a time."""
+    texts = {}
+    with pdfplumber.open(stream, pages=[i + 1 for i in page_numbers]) as pdf:
+        for index, page in zip(page_numbers, pdf.pages):
+            texts[index] = page.extract_text() or ""
+            if headings is not None:
+                headings.extend(page_heading_lines(page))
+            page.close()
+    return texts
+
+def pdf_page_texts(stream, max_pages=MAX_PDF_PAGES, headings=None, backend=PDF_BACKEND):
+    """
+    Text of every page. The pdfium backend reads one page at a time without
+    building layout objects; pages that need layout (see needs_layout) are
+    re-read with pdfplumber afterwards. `backend="pdfplumber"` uses it for all pages.
+    `stream` is a seekable binary file object or a path.
+    """
+    if isinstance(stream, (str, os.PathLike)):
+        with open(stream, "rb") as f:
+            return pdf_page_texts(f, max_pages, headings, backend)
+
+    if backend == "pdfplumber":
+        with pdfplumber.open(stream) as pdf:
+            page_count = len(pdf.pages)
+        if max_pages is not None and page_count > max_pages:
+            raise UploadRejected(f"PDF has {page_count} pages; the limit is {max_pages}.")
+        stream.seek(0)
+        texts = _pdfplumber_page_texts(stream, range(page_count), headings)
+        return [texts[i] for i in range(page_count)]
+
+    pages, layout_pages = [], []
+    pdf = pdfium.PdfDocument(stream)
+    try:
+        if max_pages is not None and len(pdf) > max_pages:
+            raise UploadRejected(f"PDF has {len(pdf)} pages; the limit is {max_pages}.")
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                page_headings = [] if headings is not None else None
+                text = _pdfium_page_text(page, page_headings)
+            finally:
+                page.close()
+            if needs_layout(text):
+                layout_pages.append(index)
+            elif headings is not None:
+                headings.extend(page_headings)
+            pages.append(text)
+    finally:
+        pdf.close()
+
+    if layout_pages:
+        stream.seek(0)
+        for index, text in _pdfplumber_page_texts(stream, layout_pages, headings).items():
+            pages[index] = text
+    return pages
 
 def extract_text_from_pdf(file):
-    text = ""
-    with pdfplumber.open(file) as pdf:
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
+    return "".join(text + "\n" for text in pdf_page_texts(file, max_pages=None) if text)
+
+def preprocess_image(pil_image):
+    """Normalize resolution, convert to grayscale and binarize (Otsu)."""
+    img = ImageOps.exif_transpose(pil_image)
+    img = img.convert("L")
+
+    width, height = img.size
+    if width < TARGET_MIN_WIDTH:
+        scale = TARGET_MIN_WIDTH / width
+    elif width > TARGET_MAX_WIDTH:
+        scale = TARGET_MAX_WIDTH / width
+    else:
+        scale = 1.0
+    if scale != 1.0:
+        img = img.resize((int(width * scale), int(height * scale)), Image.LANCZOS)
+
+    img = ImageOps.autocontrast(img)
+    pixels = np.asarray(img)
+    if pixels.mean() < 128:
+        # dark-mode screenshot: light text on dark background
+        pixels = 255 - pixels
+
+    threshold = otsu_threshold(pixels)
+    return Image.fromarray(np.where(pixels > threshold, 255, 0).astype(np.uint8))
+
+def otsu_threshold(pixels):
+    hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = hist.sum()
+    if total == 0:
+        return 127
+    levels = np.arange(256)
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    mass_bg = np.cumsum(hist * levels)
+    mean_bg = np.divide(mass_bg, weight_bg, out=np.zeros(256), where=weight_bg > 0)
+    mean_fg = np.divide(mass_bg[-1] - mass_bg, weight_fg, out=np.zeros(256), where=weight_fg > 0)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+def choose_psm(img):
+    """Tall single-column captures read best as one column of variable-size text."""
+    width, height = img.size
+    return 4 if height > 1.5 * width else 3
+
+def split_into_tiles(img, tile_height=TILE_HEIGHT, overlap=TILE_OVERLAP):
+    """
+    Horizontal strips as (tile, overlaps_previous) pairs. Cuts are moved to a
+    blank row when one is near; otherwise consecutive strips overlap.
+    """
+    width, height = img.size
+    if height <= tile_height * 1.5:
+        return [(img, False)]
+
+    pixels = np.asarray(img)
+    blank_rows = pixels.min(axis=1) == 255
+    tiles = []
+    top = 0
+    overlapped = False
+    while top < height:
+        bottom = min(top + tile_height, height)
+        if bottom < height:
+            window = blank_rows[bottom - overlap:bottom]
+            blanks = np.flatnonzero(window)
+            if blanks.size:
+                cut = bottom - overlap + int(blanks[-1])
+                tiles.append((img.crop((0, top, width, cut)), overlapped))
+                top, overlapped = cut, False
+                continue
+            tiles.append((img.crop((0, top, width, bottom)), overlapped))
+            top, overlapped = bottom - overlap, True
+        else:
+            tiles.append((img.crop((0, top, width, bottom)), overlapped))
+            break
+    return tiles
+
+def _same_line(a, b):
+    a, b = re.sub(r"\s+", " ", a).strip().lower(), re.sub(r"\s+", " ", b).strip().lower()
+    return bool(a) and SequenceMatcher(None, a, b).ratio() >= 0.8
+
+def stitch_tile_texts(texts, overlaps):
+    """Join tile outputs, dropping lines repeated by the overlap between tiles."""
+    lines = []
+    for text, overlapped in zip(texts, overlaps):
+        tile_lines = text.splitlines()
+        if not overlapped:
+            lines.extend(tile_lines)
+            continue
+        tail = [ln for ln in lines[-STITCH_LOOKBACK:] if ln.strip()]
+        skip = 0
+        for i, ln in enumerate(tile_lines[:STITCH_LOOKBACK]):
+            if any(_same_line(ln, prev) for prev in tail):
+                skip = i + 1
+        lines.extend(tile_lines[skip:])
+    return "\n".join(lines)
 
 def extract_text_from_image(pil_image):
-    return pytesseract.image_to_string(pil_image)
+    img = preprocess_image(pil_image)
+    psm = choose_psm(img)
+    tiles = split_into_tiles(img)
+    pool = ocr_pool()
+    if len(tiles) == 1:
+        return pool.recognize(img, psm)
+
+    # tiles are recognized in parallel by the pool's long-lived engines
+    images, overlaps = zip(*tiles)
+    futures = [pool.submit(tile, psm) for tile in images]
+    return stitch_tile_texts([f.result() for f in futures], overlaps)
+
+def extract_text_from_pdf_stream(stream, max_pages=MAX_PDF_PAGES, headings=None):
+    """
+    Page by page, releasing each page before the next (see pdf_page_texts).
+    If a `headings` list is given, lines set in a larger font are appended to it.
+    """
+    return "\n".join(pdf_page_texts(stream, max_pages, headings))
+
+def open_image_checked(stream, max_pixels=MAX_IMAGE_PIXELS):
+    """Open lazily and check the pixel count from the header, before decoding."""
+    img = Image.open(stream)
+    width, height = img.size
+    if width * height > max_pixels:
+        raise UploadRejected(f"Image is {width}x{height}; the limit is {max_pixels / 1e6:.0f} megapixels.")
+    return img
+
+def extract_text_from_upload(file, mime_type, headings=None):
+    """
+    Extract text from an uploaded PDF/image/TXT file object. Raises UploadRejected
+    when a limit is exceeded and ExtractionFailed when the file cannot be read;
+    both carry a user-facing message.
+    For PDFs, heading lines found by font size are appended to `headings` (a list) when given.
+    """
+    if not file:
+        return ""
+    stream = open_upload(file)
+    if mime_type == "application/pdf":
+        try:
+            return extract_text_from_pdf_stream(stream, headings=headings)
+        except UploadRejected:
+            raise
+        except Exception as e:
+            raise ExtractionFailed("PDF extraction failed.") from e
+    if mime_type.startswith("image/"):
+        try:
+            text = extract_text_from_image(open_image_checked(stream))
+        except UploadRejected:
+            raise
+        except Exception as e:
+            raise ExtractionFailed("Image extraction failed.") from e
+        if not text.strip():
+            raise ExtractionFailed("No text detected in the image.")
+        return text
+    if mime_type == "text/plain":
+        try:
+            return read_text(stream)
+        except Exception as e:
+            raise ExtractionFailed("TXT extraction failed.") from e
+    return ""
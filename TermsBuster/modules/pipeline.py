@@ -0,0 +1,299 @@
+# pipeline.py
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from modules.ai_explainer import generate_ai_friendly_explanation
+from modules.normalizer import NormalizedText
+from modules.risk_analyzer import (
+    cached_load_risk_profiles, cached_profile_matcher, collect_valid_hits,
+    extract_textrank_phrases, merge_summary_hits, safe_tfidf_vocabulary, score_profiles, sentence_spans,
+)
+from modules.sections import detect_sections, score_sections
+from modules.summarizer import DEFAULT_PRESET, extractive_summary, summarize_with_details
+
+SUMMARY_FALLBACK = "⚠️ Could not generate summary. Using placeholder."
+SUMMARY_DETAILS_FALLBACK = {"summary": SUMMARY_FALLBACK, "preset": None, "decode_steps": 0}
+EXPLANATION_FALLBACK = "- Could not generate explanation. Using placeholder."
+RISK_FALLBACK = {"Total Score": 5, "Risk Level": "Moderate Risk", "Confidence": 80, "Matches": {}}
+
+# ----------------------------------------
+# Time budgets and load shedding (0 disables)
+# ----------------------------------------
+DEADLINE_S = float(os.environ.get("TERMSBUSTER_DEADLINE_S", 60))                # whole analysis
+TEXTRANK_BUDGET_S = float(os.environ.get("TERMSBUSTER_TEXTRANK_BUDGET_S", 10))  # TextRank alone
+# analyses running at once (this one included) above which optional stages start cheap
+DEGRADE_AT_INFLIGHT = int(os.environ.get("TERMSBUSTER_DEGRADE_AT_INFLIGHT", os.cpu_count() or 2))
+DEGRADED_MAX_SENTENCES = 400  # TF-IDF over the first N sentences when degraded
+
+_RAISE = object()
+
+# ----------------------------------------
+# Generic stage graph executor
+# ----------------------------------------
+class Stage:
+    """
+    One node of the analysis graph. `fn` receives a dict holding the run inputs
+    and the results of every finished stage; it runs once all `deps` are done.
+    If `fallback` is given, a failing stage yields it instead of aborting the run.
+
+    Optional stages have a cheap form, `degrade(ctx)`. It runs instead of `fn`
+    when the run sheds load or is already past its deadline, and replaces `fn`
+    when `fn` overruns `budget` seconds or the deadline. The overrunning `fn` is
+    abandoned and its `ctx["cancel"]` event set, so it can stop early.
+    """
+
+    def __init__(self, name: str, fn: Callable[[Dict], object], deps: Iterable[str] = (), fallback=_RAISE,
+                 degrade: Optional[Callable[[Dict], object]] = None, budget: Optional[float] = None):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.fallback = fallback
+        self.degrade = degrade
+        self.budget = budget or None
+
+def _run_timed(fn: Callable[[Dict], object], ctx: Dict):
+    started = time.perf_counter()
+    try:
+        return fn(ctx), None, time.perf_counter() - started
+    except Exception as e:
+        return None, e, time.perf_counter() - started
+
+def _wake_at(running: Dict, deadline: Optional[float]) -> Optional[float]:
+    """Earliest moment a running, degradable stage overruns (monotonic clock)."""
+    times = []
+    for stage, started, _, cheap in running.values():
+        if cheap or stage.degrade is None:
+            continue
+        if stage.budget is not None:
+            times.append(started + stage.budget)
+        if deadline is not None:
+            times.append(deadline)
+    return min(times) if times else None
+
+def run_stages(stages: List[Stage], inputs: Optional[Dict] = None, max_workers: Optional[int] = None,
+               initializer: Optional[Callable] = None, deadline: Optional[float] = None,
+               shed_load: bool = False):
+    """
+    Run `stages` on a thread pool, each as soon as its dependencies finish.
+    `deadline` is a time.monotonic() value; with `shed_load` every stage that
+    has a cheap form runs it from the start.
+    Returns (results, timings, degraded) keyed by stage name; timings are
+    seconds, degraded maps a stage to why it ran cheap ("load", "deadline", "budget").
+    """
+    results = dict(inputs or {})
+    timings: Dict[str, float] = {}
+    degraded: Dict[str, str] = {}
+    spent: Dict[str, float] = {}   # time an abandoned stage ran before its cheap form
+    pending = list(stages)
+    running = {}                   # future -> (stage, started, cancel event, cheap?)
+    abandoned = False
+
+    pool = ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1, initializer=initializer)
+
+    def submit(stage, reason=None):
+        ctx = dict(results)
+        ctx["cancel"] = threading.Event()
+        if reason:
+            degraded[stage.name] = reason
+        future = pool.submit(_run_timed, stage.degrade if reason else stage.fn, ctx)
+        running[future] = (stage, time.monotonic(), ctx["cancel"], bool(reason))
+
+    try:
+        while pending or running:
+            late = deadline is not None and time.monotonic() >= deadline
+            ready = [s for s in pending if all(d in results for d in s.deps)]
+            for stage in ready:
+                pending.remove(stage)
+                cheap = stage.degrade is not None and (shed_load or late)
+                submit(stage, ("load" if shed_load else "deadline") if cheap else None)
+            if not running:
+                raise ValueError(f"Unsatisfiable stage dependencies: {[s.name for s in pending]}")
+
+            wake = _wake_at(running, deadline)
+            timeout = None if wake is None else max(0.0, wake - time.monotonic())
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)[0]
+                value, error, elapsed = future.result()
+                timings[stage.name] = spent.pop(stage.name, 0.0) + elapsed
+                if error is not None:
+                    if stage.fallback is _RAISE:
+                        # stop the other stages (the summarizer checks its event per decoding
+                        # step) and do not wait for them below
+                        for other, (_, _, cancel, _) in running.items():
+                            cancel.set()
+                            other.cancel()
+                        abandoned = True
+                        raise error
+                    value = stage.fallback
+                results[stage.name] = value
+
+            # overrunning stages: stop waiting for them and run their cheap form
+            now = time.monotonic()
+            for future, (stage, started, cancel, cheap) in list(running.items()):
+                if cheap or stage.degrade is None:
+                    continue
+                if stage.budget is not None and now - started >= stage.budget:
+                    reason = "budget"
+                elif deadline is not None and now >= deadline:
+                    reason = "deadline"
+                else:
+                    continue
+                cancel.set()
+                future.cancel()
+                del running[future]
+                abandoned = True
+                spent[stage.name] = now - started
+                submit(stage, reason)
+    finally:
+        # abandoned stages (overrun, or a fatal error elsewhere) may still be running; their results are ignored
+        pool.shutdown(wait=not abandoned, cancel_futures=True)
+
+    return results, timings, degraded
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+
+@contextmanager
+def _in_flight():
+    """Count concurrent analyses in this process; yields the count including this one."""
+    global _inflight
+    with _inflight_lock:
+        _inflight += 1
+        depth = _inflight
+    try:
+        yield depth
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+
+def streamlit_thread_initializer():
+    """Attach the current Streamlit script context to pool threads (no-op outside Streamlit)."""
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    except ImportError:
+        return None
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(ctx=ctx)
+
+# ----------------------------------------
+# Policy analysis graph
+# ----------------------------------------
+#   text ─┬─ summarize ─┬─ explanation
+#         │             └─ summary_hits ──────┐
+#         └─ normalize ─┬─ text_hits ─────────┤
+#                       │       └─ sections   │
+#                       ├─ tfidf ─────────────┼─ risk
+#                       └─ textrank ──────────┘
+#
+# Keyword scoring, TF-IDF and TextRank of the extracted text start right
+# away; only the summary's own keyword hits wait for the model.
+
+def _stage_text_hits(ctx):
+    matcher = cached_profile_matcher(tuple(ctx["profile_paths"].items()))
+    # a near-duplicate's per-sentence scan: only the changed sentences are scanned
+    return collect_valid_hits(ctx["normalize"], matcher, known=ctx.get("known_sentence_hits"))
+
+def _stage_summary_hits(ctx):
+    matcher = cached_profile_matcher(tuple(ctx["profile_paths"].items()))
+    return collect_valid_hits(NormalizedText(ctx["summarize"]["summary"]), matcher)
+
+def _stage_tfidf(ctx):
+    return safe_tfidf_vocabulary(ctx["normalize"].text)
+
+def _stage_textrank(ctx):
+    return extract_textrank_phrases(ctx["normalize"].text)
+
+def _stage_sections(ctx):
+    sections = detect_sections(ctx["text"], ctx.get("heading_hints") or ())
+    profiles = cached_load_risk_profiles(ctx["profile_paths"])
+    return score_sections(sections, ctx["normalize"], ctx["text_hits"], profiles)
+
+def _stage_summarize_extractive(ctx):
+    return extractive_summary(ctx["text"])
+
+def _stage_tfidf_capped(ctx):
+    text = ctx["normalize"].text
+    spans = sentence_spans(text)
+    if len(spans) > DEGRADED_MAX_SENTENCES:
+        text = text[:spans[DEGRADED_MAX_SENTENCES - 1][1]]
+    return safe_tfidf_vocabulary(text)
+
+def _stage_risk(ctx):
+    text = ctx["normalize"].text
+    valid_hits = merge_summary_hits(ctx["text_hits"], ctx["summary_hits"], text)
+    profiles = cached_load_risk_profiles(ctx["profile_paths"])
+    return score_profiles(profiles, valid_hits, text, ctx["tfidf"], ctx["textrank"])
+
+def analysis_stages(summarize_fn: Optional[Callable[[str], Dict]] = None,
+                    explain_fn: Callable[[str], str] = generate_ai_friendly_explanation,
+                    preset: str = DEFAULT_PRESET) -> List[Stage]:
+    """
+    `summarize_fn(text)` returns a dict with at least "summary" (see
+    `summarize_with_details`); by default DistilBART runs with `preset`, and
+    under load or past the deadline an extractive summary replaces it.
+    TextRank is skipped and TF-IDF sees fewer sentences when degraded.
+    """
+    if summarize_fn is None:
+        summarize = Stage("summarize", lambda ctx: summarize_with_details(ctx["text"], preset, _cancel=ctx["cancel"]),
+                          fallback=SUMMARY_DETAILS_FALLBACK, degrade=_stage_summarize_extractive)
+    else:
+        # caller-supplied summaries (reused, stubbed) are taken as they are
+        summarize = Stage("summarize", lambda ctx: summarize_fn(ctx["text"]), fallback=SUMMARY_DETAILS_FALLBACK)
+    return [
+        summarize,
+        Stage("explanation", lambda ctx: explain_fn(ctx["summarize"]["summary"]), deps=["summarize"],
+              fallback=EXPLANATION_FALLBACK),
+        Stage("normalize", lambda ctx: NormalizedText(ctx["text"])),
+        Stage("text_hits", _stage_text_hits, deps=["normalize"]),
+        Stage("sections", _stage_sections, deps=["normalize", "text_hits"], fallback=[]),
+        Stage("tfidf", _stage_tfidf, deps=["normalize"], fallback=None, degrade=_stage_tfidf_capped),
+        Stage("textrank", _stage_textrank, deps=["normalize"], fallback=[], degrade=lambda ctx: [],
+              budget=TEXTRANK_BUDGET_S),
+        Stage("summary_hits", _stage_summary_hits, deps=["summarize"]),
+        Stage("risk", _stage_risk, deps=["normalize", "text_hits", "summary_hits", "tfidf", "textrank"], fallback=None),
+    ]
+
+def run_analysis(text: str, profile_paths: Dict[str, str], summarize_fn: Optional[Callable[[str], Dict]] = None,
+                 explain_fn: Callable[[str], str] = generate_ai_friendly_explanation,
+                 preset: str = DEFAULT_PRESET, max_workers: int = 4, initializer: Optional[Callable] = None,
+                 deadline_s: Optional[float] = DEADLINE_S, degrade_at_inflight: int = DEGRADE_AT_INFLIGHT,
+                 heading_hints: Iterable[str] = (), known_sentence_hits: Optional[Dict] = None) -> Dict:
+    """
+    Run the full analysis graph for one document.
+    Returns summary (+ summary_info: preset, decode steps, ...), explanation,
+    per-profile results, keyword-scored `sections` (see modules.sections),
+    per-stage timings and `degraded`: {stage: reason} for stages that ran
+    their cheap form (empty for a full analysis). `heading_hints` are heading
+    lines known from the source layout (PDF font sizes). `known_sentence_hits`
+    is a near-duplicate's per-sentence keyword scan (find_near_duplicate).
+    """
+    with _in_flight() as depth:
+        results, timings, degraded = run_stages(
+            analysis_stages(summarize_fn, explain_fn, preset),
+            inputs={"text": text, "profile_paths": profile_paths, "heading_hints": tuple(heading_hints),
+                    "known_sentence_hits": known_sentence_hits},
+            max_workers=max_workers,
+            initializer=initializer,
+            deadline=time.monotonic() + deadline_s if deadline_s else None,
+            shed_load=bool(degrade_at_inflight) and depth > degrade_at_inflight,
+        )
+    profiles = results.get("risk") or {name: dict(RISK_FALLBACK) for name in profile_paths}
+    summary_info = dict(results["summarize"])
+    summary = summary_info.pop("summary")
+    return {
+        "summary": summary,
+        "summary_info": summary_info,
+        "summary_failed": summary == SUMMARY_FALLBACK,
+        "explanation": results["explanation"],
+        "profiles": profiles,
+        "sections": results["sections"],
+        "timings": timings,
+        "degraded": degraded,
+    }
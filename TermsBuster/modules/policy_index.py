@@ -0,0 +1,265 @@
+# policy_index.py
+import argparse
+import hashlib
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from modules.match_table import iter_keyword_matches, keyword_hits
+from modules.risk_analyzer import DEFAULT_PROFILE_NAME, clean_text
+
+INDEX_PATH = Path("data/policy_index.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS policies (
+    id INTEGER PRIMARY KEY,
+    vendor TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    analyzed_at REAL NOT NULL,
+    total_score INTEGER NOT NULL,
+    risk_level TEXT NOT NULL,
+    confidence INTEGER NOT NULL,
+    tfidf_density REAL NOT NULL,
+    UNIQUE (vendor, profile, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_policies_analyzed_at ON policies (analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_policies_score ON policies (total_score);
+
+CREATE TABLE IF NOT EXISTS keyword_hits (
+    policy_id INTEGER NOT NULL REFERENCES policies (id) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    level TEXT NOT NULL,
+    score_each INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    total_score INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_keyword_hits_keyword ON keyword_hits (keyword, level);
+CREATE INDEX IF NOT EXISTS idx_keyword_hits_policy ON keyword_hits (policy_id);
+
+CREATE TABLE IF NOT EXISTS sentence_hits (
+    id INTEGER PRIMARY KEY,
+    policy_id INTEGER NOT NULL REFERENCES policies (id) ON DELETE CASCADE,
+    keyword TEXT NOT NULL,
+    level TEXT NOT NULL,
+    start_offset INTEGER NOT NULL,
+    sentence TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_sentence_hits_policy ON sentence_hits (policy_id);
+
+CREATE TABLE IF NOT EXISTS policy_timings (
+    policy_id INTEGER NOT NULL REFERENCES policies (id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_policy_timings_policy ON policy_timings (policy_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS sentence_fts USING fts5 (
+    sentence, content='sentence_hits', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS sentence_hits_ai AFTER INSERT ON sentence_hits BEGIN
+    INSERT INTO sentence_fts (rowid, sentence) VALUES (new.id, new.sentence);
+END;
+CREATE TRIGGER IF NOT EXISTS sentence_hits_ad AFTER DELETE ON sentence_hits BEGIN
+    INSERT INTO sentence_fts (sentence_fts, rowid, sentence) VALUES ('delete', old.id, old.sentence);
+END;
+"""
+
+# ------------------------------
+# Connection
+# ------------------------------
+def open_index(path: Path = INDEX_PATH) -> sqlite3.Connection:
+    """Open (and create if needed) the cross-policy index."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+# ------------------------------
+# Write path
+# ------------------------------
+def index_analysis(conn: sqlite3.Connection, vendor: str, policy_text: str, summary: str,
+                   result: Dict, profile: str = "General", analyzed_at: Optional[float] = None,
+                   timings: Optional[Dict[str, float]] = None) -> int:
+    """
+    Store one analysis result (and optionally its per-stage timings in
+    seconds). Re-analysing the same text for the same vendor and profile
+    replaces the previous entry. Returns the policy id.
+    """
+    vendor = (vendor or "").strip() or "Unknown"
+    analyzed_at = analyzed_at or time.time()
+    digest = text_hash(policy_text)
+    combined_text = None
+
+    with conn:
+        # the DELETE opens the write transaction, so concurrent sessions
+        # re-indexing the same policy serialize here instead of racing
+        conn.execute(
+            "DELETE FROM policies WHERE vendor = ? AND profile = ? AND text_hash = ?",
+            (vendor, profile, digest),
+        )
+
+        cur = conn.execute(
+            "INSERT INTO policies (vendor, profile, text_hash, analyzed_at, total_score, risk_level, "
+            "confidence, tfidf_density) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                vendor, profile, digest, analyzed_at,
+                int(result.get("Total Score", 0)),
+                result.get("Risk Level", "Unknown"),
+                int(result.get("Confidence", 0)),
+                float(result.get("TF-IDF Density", 0.0)),
+            ),
+        )
+        policy_id = cur.lastrowid
+
+        keyword_rows = []
+        sentence_rows = []
+        matches = result.get("Matches") or {}
+        for entry in iter_keyword_matches(matches):
+            keyword_rows.append((
+                policy_id, entry["keyword"], entry["level"], int(entry["score_each"]),
+                int(entry["count"]), int(entry["total_score"]),
+            ))
+            for sent, start, _ in keyword_hits(matches, entry):
+                if start is None:
+                    # legacy results carry no offsets: locate the sentence in the normalized text
+                    if combined_text is None:
+                        combined_text = clean_text(f"{policy_text or ''} {summary or ''}")
+                    start = combined_text.find(sent)
+                sentence_rows.append((policy_id, entry["keyword"], entry["level"], start, sent))
+
+        conn.executemany(
+            "INSERT INTO keyword_hits (policy_id, keyword, level, score_each, count, total_score) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            keyword_rows,
+        )
+        conn.executemany(
+            "INSERT INTO sentence_hits (policy_id, keyword, level, start_offset, sentence) VALUES (?, ?, ?, ?, ?)",
+            sentence_rows,
+        )
+        if timings:
+            conn.executemany(
+                "INSERT INTO policy_timings (policy_id, stage, seconds) VALUES (?, ?, ?)",
+                [(policy_id, stage, float(seconds)) for stage, seconds in timings.items()],
+            )
+    return policy_id
+
+# ------------------------------
+# Queries
+# ------------------------------
+def find_policies_by_keyword(conn: sqlite3.Connection, keyword: str, level: Optional[str] = None,
+                             since: Optional[float] = None, limit: int = 100) -> List[Dict]:
+    """Policies whose matches include `keyword`, e.g. ("sell", level="very_high_risk")."""
+    sql = (
+        "SELECT p.id, p.vendor, p.profile, p.analyzed_at, p.total_score, p.risk_level, "
+        "h.level, h.count, h.total_score AS keyword_score "
+        "FROM keyword_hits h JOIN policies p ON p.id = h.policy_id WHERE h.keyword = ?"
+    )
+    params: List = [clean_text(keyword)]
+    if level:
+        sql += " AND h.level = ?"
+        params.append(level)
+    if since:
+        sql += " AND p.analyzed_at >= ?"
+        params.append(since)
+    sql += " ORDER BY p.total_score DESC LIMIT ?"
+    params.append(limit)
+    return [dict(r) for r in conn.execute(sql, params)]
+
+def top_riskiest(conn: sqlite3.Connection, limit: int = 20, since: Optional[float] = None,
+                 profile: Optional[str] = None) -> List[Dict]:
+    """Highest scoring policies, optionally restricted to a time window and profile."""
+    sql = "SELECT id, vendor, profile, analyzed_at, total_score, risk_level, confidence FROM policies WHERE 1 = 1"
+    params: List = []
+    if since:
+        sql += " AND analyzed_at >= ?"
+        params.append(since)
+    if profile:
+        sql += " AND profile = ?"
+        params.append(profile)
+    sql += " ORDER BY total_score DESC LIMIT ?"
+    params.append(limit)
+    return [dict(r) for r in conn.execute(sql, params)]
+
+def search_sentences(conn: sqlite3.Connection, query: str, limit: int = 50) -> List[Dict]:
+    """Full-text search over matched sentences (FTS5 query syntax)."""
+    sql = (
+        "SELECT s.sentence, s.keyword, s.level, s.start_offset, p.id AS policy_id, p.vendor, p.total_score "
+        "FROM sentence_fts JOIN sentence_hits s ON s.id = sentence_fts.rowid "
+        "JOIN policies p ON p.id = s.policy_id "
+        "WHERE sentence_fts MATCH ? ORDER BY sentence_fts.rank LIMIT ?"
+    )
+    return [dict(r) for r in conn.execute(sql, (query, limit))]
+
+# ------------------------------
+# Command line
+# ------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the TermsBuster policy index.")
+    parser.add_argument("--db", default=str(INDEX_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    kw = sub.add_parser("keyword", help="policies matching a risk keyword")
+    kw.add_argument("keyword")
+    kw.add_argument("--level", help="e.g. very_high_risk")
+    kw.add_argument("--since-days", type=float)
+    kw.add_argument("--limit", type=int, default=100)
+
+    top = sub.add_parser("top", help="riskiest policies")
+    top.add_argument("--limit", type=int, default=20)
+    top.add_argument("--since-days", type=float)
+    top.add_argument("--profile")
+
+    text = sub.add_parser("text", help="full-text search over matched sentences")
+    text.add_argument("query")
+    text.add_argument("--limit", type=int, default=50)
+
+    export = sub.add_parser("export", help="bulk export to Parquet (or gzipped CSV) for dataframes")
+    export.add_argument("--out", default="exports")
+    export.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto")
+    export.add_argument("--since-days", type=float)
+
+    report = sub.add_parser("report", help="multi-vendor comparison report (PDF)")
+    report.add_argument("--out", default="reports/comparison.pdf")
+    report.add_argument("--profile", default=DEFAULT_PROFILE_NAME)
+    report.add_argument("--since-days", type=float)
+    report.add_argument("--workers", type=int, default=None, help="processes rendering vendor sections")
+    report.add_argument("--max-clauses", type=int, default=20, help="sentences per keyword in the appendix (0 = all)")
+    report.add_argument("--max-pages", type=int, default=None,
+                        help="refuse reports longer than this (default TERMSBUSTER_REPORT_MAX_PAGES or 20000; 0 = no cap)")
+
+    args = parser.parse_args(argv)
+    since = time.time() - args.since_days * 86400 if getattr(args, "since_days", None) else None
+
+    with closing(open_index(Path(args.db))) as conn:
+        if args.command == "report":
+            from modules.comparison_report import MAX_REPORT_PAGES, build_comparison_report
+            max_pages = MAX_REPORT_PAGES if args.max_pages is None else (args.max_pages or None)
+            rows = [build_comparison_report(args.db, args.out, args.profile, since, args.workers,
+                                            args.max_clauses or None, max_pages=max_pages)]
+        elif args.command == "export":
+            from modules.columnar_export import export_index
+            rows = export_index(conn, args.out, args.format, since).values()
+        elif args.command == "keyword":
+            rows = find_policies_by_keyword(conn, args.keyword, args.level, since, args.limit)
+        elif args.command == "top":
+            rows = top_riskiest(conn, args.limit, since, args.profile)
+        else:
+            rows = search_sentences(conn, args.query, args.limit)
+
+    for row in rows:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+# profiler.py
+"""
+Opt-in profiling of one analysis run.
+
+    with ProfileCapture("analysis") as capture:
+        run_analysis(text, paths, initializer=capture.wrap_initializer(None))
+    capture.pstats_bytes()      # load with pstats / snakeviz
+    capture.speedscope_json()   # open at https://www.speedscope.app
+
+Nothing here is imported unless profiling was requested (`?profile=1` in the
+app, `--profile-dir` for service.py, or `python -m modules.profiler FILE`).
+"""
+import argparse
+import cProfile
+import json
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+MAX_STACK_DEPTH = 64
+MIN_SAMPLE_FRACTION = 1e-4  # drop slivers (< 0.01% of the run) when splitting time across callers
+
+# tracemalloc (and, from Python 3.12, the profiler) is process-global: one capture at a time
+_CAPTURE_LOCK = threading.Lock()
+
+class ProfileCapture:
+    """
+    Deterministic profile (cProfile) plus peak traced memory for one block.
+    Worker threads join in through `wrap_initializer` (thread pool initializer).
+    Captures are serialized process-wide (concurrent ones wait for each other);
+    the peak still counts allocations of unprofiled threads running meanwhile.
+    """
+
+    def __init__(self, name: str = "analysis"):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.peak_bytes = 0
+        self._main = cProfile.Profile()
+        self._workers: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._stats: Optional[Dict] = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        _CAPTURE_LOCK.acquire()
+        try:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            self._started = time.perf_counter()
+            # raises ValueError on 3.12+ while another profiler (e.g. an IDE's) is active
+            self._main.enable()
+        except BaseException:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            _CAPTURE_LOCK.release()
+            raise
+        return self
+
+    def __exit__(self, *exc):
+        self._main.disable()
+        self.wall_seconds = time.perf_counter() - self._started
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+        _CAPTURE_LOCK.release()
+        return False
+
+    def wrap_initializer(self, initializer: Optional[Callable] = None) -> Callable:
+        """Thread pool initializer that also profiles the worker thread."""
+        def init():
+            if initializer is not None:
+                initializer()
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+: one profiler at a time, and it already sees every thread
+                return
+            with self._lock:
+                self._workers.append(profile)
+        return init
+
+    # -- results --
+    def stats(self) -> Dict:
+        """Raw cProfile stats of all threads, merged (the pstats file format)."""
+        if self._stats is None:
+            merged = pstats.Stats(self._main)
+            for profile in self._workers:
+                profile.create_stats()
+                if profile.stats:
+                    merged.add(profile)
+            self._stats = merged.stats
+        return self._stats
+
+    def pstats_bytes(self) -> bytes:
+        return marshal.dumps(self.stats())
+
+    def top_functions(self, limit: int = 15) -> List[Dict]:
+        rows = []
+        for (filename, line, func), (_, calls, tottime, cumtime, _) in self.stats().items():
+            rows.append({
+                "function": func,
+                "location": f"{os.path.basename(filename)}:{line}",
+                "calls": calls,
+                "self_s": round(tottime, 4),
+                "cumulative_s": round(cumtime, 4),
+            })
+        rows.sort(key=lambda r: r["cumulative_s"], reverse=True)
+        return rows[:limit]
+
+    def speedscope_json(self) -> str:
+        """
+        Sampled speedscope profile. cProfile keeps only caller -> callee edges,
+        so each function's own time is split over its call stacks in
+        proportion to the time spent under each caller.
+        """
+        stats = self.stats()
+        frames, frame_ids = [], {}
+
+        def frame_id(func):
+            if func not in frame_ids:
+                filename, line, name = func
+                frame_ids[func] = len(frames)
+                frames.append({"name": name, "file": filename, "line": line})
+            return frame_ids[func]
+
+        samples, weights = [], []
+        min_weight = sum(v[2] for v in stats.values()) * MIN_SAMPLE_FRACTION
+
+        def expand(func, weight, stack):
+            callers = {c: v for c, v in stats[func][4].items() if c in stats and c not in stack}
+            if not callers or len(stack) >= MAX_STACK_DEPTH:
+                samples.append([frame_id(f) for f in reversed(stack + [func])])
+                weights.append(weight)
+                return
+            total = sum(v[3] for v in callers.values()) or float(len(callers))
+            for caller, v in callers.items():
+                share = weight * ((v[3] / total) if total else 1.0 / len(callers))
+                if share >= min_weight:
+                    expand(caller, share, stack + [func])
+
+        for func, (_, _, tottime, _, _) in stats.items():
+            if tottime >= min_weight:
+                expand(func, tottime, [])
+
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": self.name,
+            "exporter": "TermsBuster",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        })
+
+    def summary(self) -> Dict:
+        return {
+            "name": self.name,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "peak_memory_mb": round(self.peak_bytes / (1024 * 1024), 2),
+        }
+
+    def write(self, directory: str, stem: Optional[str] = None) -> Dict[str, str]:
+        """Write <stem>.prof and <stem>.speedscope.json into `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        stem = stem or f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+        paths = {
+            "pstats": os.path.join(directory, f"{stem}.prof"),
+            "speedscope": os.path.join(directory, f"{stem}.speedscope.json"),
+        }
+        with open(paths["pstats"], "wb") as f:
+            f.write(self.pstats_bytes())
+        with open(paths["speedscope"], "w", encoding="utf-8") as f:
+            f.write(self.speedscope_json())
+        return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile one TermsBuster analysis of a policy file.")
+    parser.add_argument("file", help="policy as .txt, .pdf or image")
+    parser.add_argument("--profile", action="append", dest="profiles", help="risk profile name (repeatable)")
+    parser.add_argument("--preset", default=None, help="summary preset")
+    parser.add_argument("--out", default="profiles", help="directory for the .prof / .speedscope.json files")
+    args = parser.parse_args(argv)
+
+    import mimetypes
+    from modules.ocr_reader import extract_text_from_upload
+    from modules.pipeline import run_analysis
+    from modules.risk_analyzer import DEFAULT_PROFILE_NAME, discover_risk_profiles
+    from modules.summarizer import DEFAULT_PRESET
+
+    available = discover_risk_profiles()
+    names = args.profiles or [DEFAULT_PROFILE_NAME]
+    mime_type = mimetypes.guess_type(args.file)[0] or "text/plain"
+
+    with ProfileCapture(os.path.splitext(os.path.basename(args.file))[0]) as capture:
+        with open(args.file, "rb") as f:
+            text = extract_text_from_upload(f, mime_type)
+        run_analysis(text, {n: available[n] for n in names}, preset=args.preset or DEFAULT_PRESET,
+                     initializer=capture.wrap_initializer())
+
+    paths = capture.write(args.out)
+    print(json.dumps(capture.summary()))
+    for row in capture.top_functions(10):
+        print(f"{row['cumulative_s']:>9.3f}s {row['self_s']:>9.3f}s  {row['function']} ({row['location']})")
+    print(f"✅ Wrote {paths['pstats']} and {paths['speedscope']}")
+
+
+if __name__ == "__main__":
+    main()
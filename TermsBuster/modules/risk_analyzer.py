@@ -1,12 +1,17 @@
 import json
 import re
 import streamlit as st
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
 import networkx as nx
 from collections import Counter
+from bisect import bisect_left
+
+from modules.corpus_idf import corpus_model
+from modules.match_table import MatchTableBuilder
+from modules.normalizer import NormalizedText
+from modules.sentence_cache import SENTENCE_CACHE, sentence_key
 
 # ------------------------------
 # Negation Words
@@ -45,8 +50,14 @@ def is_safe_sentence(sentence: str) -> bool:
 # ------------------------------
 # TF-IDF Risk Density
 # ------------------------------
-def get_tfidf_density(text: str, risk_data: Dict) -> float:
-    """% of policy vocabulary containing risky terms (density score)."""
+def get_tfidf_vocabulary(text: str):
+    """Policy vocabulary, capped by TF-IDF weight against the corpus model; None when there is too little text.
+    Scoring never updates the corpus (see corpus_idf.learn_policy)."""
+    return corpus_model().vocabulary(text)
+
+def get_tfidf_density(text: str, risk_data: Dict, vocabulary=None) -> float:
+    """% of policy vocabulary containing risky terms (density score).
+    Pass `vocabulary` from `get_tfidf_vocabulary` to reuse it across dictionaries."""
     try:
         # Extract top risky keywords
         risk_keywords = []
@@ -55,22 +66,10 @@ def get_tfidf_density(text: str, risk_data: Dict) -> float:
                 kw = item.get("keyword", "").lower().strip()
                 if kw and len(kw.split()) <= 3:
                     risk_keywords.append(kw)
-        
-        sentences = re.split(r'(?<=[\.?!])\s+', text)
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 10]
-        
-        if len(sentences) < 2:
-            return 0.0
-        
-        vectorizer = TfidfVectorizer(max_features=500, stop_words='english', ngram_range=(1,2))
-        tfidf_matrix = vectorizer.fit_transform(sentences)
-        feature_names = vectorizer.get_feature_names_out()
-        
-        risk_hits = sum(1 for kw in set(risk_keywords) if kw in feature_names)
-        total_terms = len(feature_names)
-        
-        density = (risk_hits / total_terms * 100) if total_terms > 0 else 0
-        return min(100, density)
+
+        if vocabulary is None:
+            vocabulary = get_tfidf_vocabulary(text)
+        return corpus_model().density(vocabulary, risk_keywords)
     except:
         return 0.0
 
@@ -130,20 +129,51 @@ def clean_text(text: str) -> str:
 # ------------------------------
 # Extract Sentence
 # ------------------------------
-def sentence_for_index(text: str, start: int, end: int) -> str:
-    sentences = re.split(r'(?<=[\.?!])\s+', text)
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) of every sentence in normalized text (single-space separated)."""
+    spans = []
     pos = 0
-    for s in sentences:
+    for s in re.split(r'(?<=[\.?!])\s+', text):
         next_pos = pos + len(s)
-        if start >= pos and start <= next_pos:
-            return s.strip()
+        spans.append((pos, next_pos))
         pos = next_pos + 1
-    return text[max(0, start - 80): end + 80].strip()
+    return spans
+
+class SentenceLocator:
+    """
+    Finds the sentence around a match in the normalized buffer and returns it
+    both normalized (for safe-phrase checks) and in the original casing and
+    spacing (for display), via the buffer's offset map.
+    """
+
+    def __init__(self, norm: NormalizedText):
+        self.norm = norm
+        self.spans = sentence_spans(norm.text)
+        self.ends = [end for _, end in self.spans]
+        self._original: Dict[Tuple[int, int], str] = {}
+
+    def span_at(self, start: int, end: int) -> Tuple[int, int]:
+        idx = bisect_left(self.ends, start)
+        if idx < len(self.spans) and start >= self.spans[idx][0]:
+            return self.spans[idx]
+        # no sentence boundary found: fall back to a window around the match
+        return max(0, start - 80), min(len(self.norm.text), end + 80)
+
+    def normalized(self, span: Tuple[int, int]) -> str:
+        return self.norm.text[span[0]:span[1]].strip()
+
+    def original(self, span: Tuple[int, int]) -> str:
+        sentence = self._original.get(span)
+        if sentence is None:
+            sentence = self._original[span] = self.norm.original(*span).strip()
+        return sentence
 
 # ------------------------------
 # Negation Check
 # ------------------------------
-def has_negation_around(text: str, match_start: int, window_chars: int = 50) -> bool:
+NEGATION_WINDOW = 50
+
+def has_negation_around(text: str, match_start: int, window_chars: int = NEGATION_WINDOW) -> bool:
     window_start = max(0, match_start - window_chars)
     context = text[window_start:match_start]
     return bool(NEGATION_RE.search(context))
@@ -151,15 +181,10 @@ def has_negation_around(text: str, match_start: int, window_chars: int = 50) ->
 # ------------------------------
 # Keyword Match
 # ------------------------------
-def detect_matches(combined_text: str, keyword: str) -> List[Tuple[int, int, str]]:
+def detect_matches(combined_text: str, keyword: str) -> List[Tuple[int, int]]:
     pattern = r"\b" + re.escape(keyword) + r"\b"
     regex = re.compile(pattern, flags=re.IGNORECASE)
-    matches = []
-    for m in regex.finditer(combined_text):
-        start, end = m.start(), m.end()
-        sent = sentence_for_index(combined_text, start, end)
-        matches.append((start, end, sent))
-    return matches
+    return [(m.start(), m.end()) for m in regex.finditer(combined_text)]
 
 # ------------------------------
 # Severity Mapping
@@ -178,24 +203,42 @@ def map_level_severity(level_key: str) -> str:
         return "minimal_risk"
     return "moderate_risk"
 
+# ------------------------------
+# Risk Level determination
+# ------------------------------
+def determine_risk_level(severity_counters: Dict[str, int], total_score: int) -> str:
+    if severity_counters["very_high_risk"] > 0 and total_score >= 200:
+        return "Very High Risk"
+    if total_score >= 160:
+        return "High Risk"
+    if total_score >= 100:
+        return "Moderate Risk"
+    if total_score >= 50:
+        return "Low Risk"
+    if 0 < total_score <= 20:
+        return "Minimal Risk"
+    return "No Risk Detected"
+
 # ------------------------------
 # Cache Analyze Policy result
 # ------------------------------
 @st.cache_data(show_spinner=True)
 def cached_analyze_policy(extracted_text: str, summarized_text: str, json_path: str) -> Dict:
     risk_data = cached_load_risk_data(json_path)
-    combined_text = clean_text(f"{extracted_text or ''} {summarized_text or ''}")
+    norm = NormalizedText(extracted_text, summarized_text)
+    combined_text = norm.text
+    locator = SentenceLocator(norm)
 
     total_score = 0
     severity_counters = {
         "very_high_risk": 0, "high_risk": 0, "moderate_risk": 0,
         "low_risk": 0, "minimal_risk": 0
     }
-    matched: Dict[str, Dict] = {}
+    matched = MatchTableBuilder()
 
     # 1. Keyword matching with safe phrase filtering
     for level_key, items in risk_data.items():
-        matched.setdefault(level_key, {})
+        matched.add_level(level_key)
         for item in items:
             keyword = clean_text(item.get("keyword", ""))
             if not keyword:
@@ -205,26 +248,22 @@ def cached_analyze_policy(extracted_text: str, summarized_text: str, json_path:
             occurrences = detect_matches(combined_text, keyword)
 
             valid_count = 0
-            sentences: List[str] = []
-            for (start, end, sentence) in occurrences:
+            hits: List[Tuple[int, int, str]] = []
+            for (start, end) in occurrences:
+                span = locator.span_at(start, end)
                 # Skip safe sentences
-                if is_safe_sentence(sentence):
+                if is_safe_sentence(locator.normalized(span)):
                     continue
                 # Skip negated matches
                 if has_negation_around(combined_text, start):
                     continue
                 
                 valid_count += 1
-                sentences.append(sentence)
+                hits.append((start, end, locator.original(span)))
 
             if valid_count > 0:
                 effective_count = min(valid_count, 3)
-                matched[level_key][keyword] = {
-                    "count": valid_count,
-                    "score_each": score,
-                    "total_score": score * effective_count,
-                    "sentences": sentences
-                }
+                matched.add_keyword(level_key, keyword, score, score * effective_count, hits)
                 total_score += score * effective_count
                 sev = map_level_severity(level_key)
                 severity_counters[sev] += 1
@@ -236,19 +275,7 @@ def cached_analyze_policy(extracted_text: str, summarized_text: str, json_path:
     top_risk_phrases = extract_textrank_phrases(combined_text)
 
     # Risk Level determination
-    if severity_counters["very_high_risk"] > 0 and total_score >= 200:
-        final_level = "Very High Risk"
-    elif total_score >= 160:
-        final_level = "High Risk"
-    elif total_score >= 100:
-        final_level = "Moderate Risk"
-    elif total_score >= 50:
-        final_level = "Low Risk"
-    elif 0 < total_score <= 20:
-        final_level = "Minimal Risk"
-    else:
-        final_level = "No Risk Detected"
-
+    final_level = determine_risk_level(severity_counters, total_score)
     confidence = min(95, 50 + int(total_score * 0.2 + tfidf_density * 0.3))
 
     return {
@@ -257,5 +284,267 @@ def cached_analyze_policy(extracted_text: str, summarized_text: str, json_path:
         "Confidence": confidence,
         "TF-IDF Density": round(tfidf_density, 1),
         "Top Risk Phrases": top_risk_phrases,
-        "Matches": matched,
+        "Matches": matched.build(),
+    }
+
+# ------------------------------
+# Risk Profiles (GDPR, CCPA, children's privacy, ...)
+# ------------------------------
+DEFAULT_PROFILE_NAME = "General"
+DEFAULT_PROFILE_PATH = "data/risk_analyzer_MASTER_FINAL.json"
+RISK_PROFILES_DIR = Path("data/profiles")
+
+def discover_risk_profiles() -> Dict[str, str]:
+    """Default dictionary plus every `data/profiles/*.json`, keyed by profile name."""
+    profiles = {DEFAULT_PROFILE_NAME: DEFAULT_PROFILE_PATH}
+    if RISK_PROFILES_DIR.exists():
+        for path in sorted(RISK_PROFILES_DIR.glob("*.json")):
+            profiles[path.stem] = path.as_posix()
+    return profiles
+
+# ------------------------------
+# Shared multi-profile matcher
+# ------------------------------
+WORD_CHAR_RE = re.compile(r"\w")
+TOKEN_RE = re.compile(r"\w+")
+SENTENCE_BREAK_RE = re.compile(r"[\.?!]\s")   # same break as sentence_spans()
+
+def build_profile_matcher(profiles: Dict[str, Dict]) -> Dict:
+    """
+    Compile every keyword of every profile into one lookup table.
+    Keywords are indexed by their first word so a single token scan of the
+    document finds all of them; each keyword maps to its (profile, level, score) entries.
+    """
+    by_first_token: Dict[str, List[str]] = {}
+    fallback: List[Tuple[str, "re.Pattern"]] = []
+    entries: Dict[str, List[Tuple[str, str, int]]] = {}
+
+    for profile_name, risk_data in profiles.items():
+        for level_key, items in risk_data.items():
+            for item in items:
+                keyword = clean_text(item.get("keyword", ""))
+                if not keyword:
+                    continue
+                if keyword not in entries:
+                    entries[keyword] = []
+                    first = TOKEN_RE.match(keyword)
+                    if first:
+                        by_first_token.setdefault(first.group(), []).append(keyword)
+                    else:
+                        # keyword starts with punctuation: keep the plain regex path
+                        pattern = r"\b" + re.escape(keyword) + r"\b"
+                        fallback.append((keyword, re.compile(pattern, flags=re.IGNORECASE)))
+                entries[keyword].append((profile_name, level_key, int(item.get("score", 0))))
+
+    # keywords spanning a sentence break can never match inside one sentence
+    spanning = [kw for kw in entries if SENTENCE_BREAK_RE.search(kw)]
+    cross_sentence = {
+        "by_first_token": {tok: [kw for kw in kws if kw in spanning] for tok, kws in by_first_token.items()},
+        "fallback": [(kw, regex) for kw, regex in fallback if kw in spanning],
     }
+    return {
+        "by_first_token": by_first_token, "fallback": fallback, "entries": entries,
+        "cross_sentence": cross_sentence if spanning else None,
+        "fingerprint": sentence_key("\n".join(sorted(entries))),
+    }
+
+def _ends_on_boundary(text: str, keyword: str, end: int) -> bool:
+    """Same rule as a trailing `\\b` in the per-keyword regex."""
+    keyword_ends_word = bool(WORD_CHAR_RE.match(keyword[-1]))
+    next_is_word = end < len(text) and bool(WORD_CHAR_RE.match(text[end]))
+    return keyword_ends_word != next_is_word
+
+def scan_keywords(combined_text: str, matcher: Dict) -> Dict[str, List[Tuple[int, int]]]:
+    """One pass over the text; returns keyword -> [(start, end), ...]."""
+    hits: Dict[str, List[Tuple[int, int]]] = {}
+    last_end: Dict[str, int] = {}
+    by_first_token = matcher["by_first_token"]
+
+    for tok in TOKEN_RE.finditer(combined_text):
+        candidates = by_first_token.get(tok.group())
+        if not candidates:
+            continue
+        start = tok.start()
+        for keyword in candidates:
+            end = start + len(keyword)
+            if start < last_end.get(keyword, 0):
+                continue  # regex finditer never reports overlapping hits
+            if combined_text.startswith(keyword, start) and _ends_on_boundary(combined_text, keyword, end):
+                hits.setdefault(keyword, []).append((start, end))
+                last_end[keyword] = end
+
+    for keyword, regex in matcher["fallback"]:
+        found = [(m.start(), m.end()) for m in regex.finditer(combined_text)]
+        if found:
+            hits[keyword] = found
+    return hits
+
+@st.cache_data(show_spinner=False)
+def cached_load_risk_profiles(profile_paths: Dict[str, str]) -> Dict[str, Dict]:
+    return {name: cached_load_risk_data(path) for name, path in profile_paths.items()}
+
+@st.cache_resource(show_spinner=False)
+def cached_profile_matcher(profile_paths: Tuple[Tuple[str, str], ...]) -> Dict:
+    return build_profile_matcher(cached_load_risk_profiles(dict(profile_paths)))
+
+# ------------------------------
+# Building blocks shared by the one-pass and staged analyzers
+# ------------------------------
+def _sentence_hits(sentence: str, matcher: Dict) -> Tuple[Tuple[str, int, int, object], ...]:
+    """
+    Hits inside one normalized sentence that survive the safe-phrase check:
+    (keyword, start, end, negated) relative to the sentence. `negated` is None
+    when the negation window reaches into the previous sentence.
+    """
+    if is_safe_sentence(sentence.strip()):
+        return ()
+    hits = []
+    for keyword, occurrences in scan_keywords(sentence, matcher).items():
+        for (start, end) in occurrences:
+            negated = has_negation_around(sentence, start) if start >= NEGATION_WINDOW else None
+            hits.append((keyword, start, end, negated))
+    return tuple(hits)
+
+def collect_valid_hits(norm: NormalizedText, matcher: Dict, offset: int = 0,
+                       known: Optional[Dict[str, tuple]] = None) -> Dict[str, List[Tuple[int, int, str]]]:
+    """
+    Scan `norm` and keep the hits that survive safe-phrase and negation
+    filtering (these do not depend on the profile). Returns
+    keyword -> [(start, end, original sentence)], offsets shifted by `offset`.
+    Sentences are scanned one at a time through SENTENCE_CACHE, so boilerplate
+    already seen in another document is not scanned again. `known` (see
+    `sentence_hit_table`, e.g. a near-duplicate's) supplies the scan of
+    sentences seen before; only the other sentences are scanned.
+    """
+    text = norm.text
+    locator = SentenceLocator(norm)
+    namespace = ("hits", matcher["fingerprint"])
+    found: List[Tuple[int, str, int, int, Tuple[int, int]]] = []
+    for span in locator.spans:
+        sentence = text[span[0]:span[1]]
+        cached = known.get(sentence_key(sentence).hex()) if known else None
+        if cached is None:
+            cached = SENTENCE_CACHE.get_or_compute(namespace, sentence, lambda: _sentence_hits(sentence, matcher))
+        for keyword, start, end, negated in cached:
+            start += span[0]
+            if negated is None:
+                negated = has_negation_around(text, start)
+            if not negated:
+                found.append((start, keyword, start, end + span[0], span))
+
+    if matcher.get("cross_sentence"):
+        for keyword, occurrences in scan_keywords(text, matcher["cross_sentence"]).items():
+            for (start, end) in occurrences:
+                span = locator.span_at(start, end)
+                if not is_safe_sentence(locator.normalized(span)) and not has_negation_around(text, start):
+                    found.append((start, keyword, start, end, span))
+        found.sort(key=lambda hit: hit[0])
+
+    valid_hits: Dict[str, List[Tuple[int, int, str]]] = {}
+    for _, keyword, start, end, span in found:
+        valid_hits.setdefault(keyword, []).append((start + offset, end + offset, locator.original(span)))
+    return valid_hits
+
+def sentence_hit_table(norm: NormalizedText, matcher: Dict) -> Dict[str, tuple]:
+    """
+    Per-sentence scan of a document (hex sentence key -> hits as
+    `_sentence_hits` returns them), stored with near-duplicate records so a
+    later near-duplicate only scans the sentences that changed.
+    """
+    text = norm.text
+    namespace = ("hits", matcher["fingerprint"])
+    table = {}
+    for start, end in SentenceLocator(norm).spans:
+        sentence = text[start:end]
+        table[sentence_key(sentence).hex()] = SENTENCE_CACHE.get_or_compute(
+            namespace, sentence, lambda: _sentence_hits(sentence, matcher))
+    return table
+
+def matcher_fingerprint(profile_paths: Dict[str, str]) -> bytes:
+    """Identity of the keyword set scanned for `profile_paths` (keys stored sentence scans)."""
+    return cached_profile_matcher(tuple(profile_paths.items()))["fingerprint"]
+
+def document_sentence_hits(text: str, profile_paths: Dict[str, str]) -> Dict[bytes, Dict[str, tuple]]:
+    """{matcher fingerprint: sentence_hit_table} of a document, as near_duplicate.register_document stores it."""
+    matcher = cached_profile_matcher(tuple(profile_paths.items()))
+    return {matcher["fingerprint"]: sentence_hit_table(NormalizedText(text), matcher)}
+
+def merge_summary_hits(text_hits: Dict[str, List[Tuple[int, int, str]]], summary_hits: Dict[str, List[Tuple[int, int, str]]],
+                       text: str) -> Dict[str, List[Tuple[int, int, str]]]:
+    """Hits of the extracted text and of its summary (scanned separately) as one table."""
+    # summary offsets continue after the extracted text and the joining space
+    shift = len(text) + 1 if text else 0
+    valid_hits = {kw: list(hits) for kw, hits in text_hits.items()}
+    for kw, hits in summary_hits.items():
+        valid_hits.setdefault(kw, []).extend((s + shift, e + shift, sent) for s, e, sent in hits)
+    return valid_hits
+
+def score_profiles(profiles: Dict[str, Dict], valid_hits: Dict[str, List[Tuple[int, int, str]]],
+                   density_text: str, tfidf_vocabulary, top_risk_phrases: List[str]) -> Dict[str, Dict]:
+    """Aggregate filtered hits into one result per profile, shaped like `cached_analyze_policy`."""
+    # one sentence table shared by every profile's match table
+    shared_sentences: List[str] = []
+    shared_sentence_ids: Dict[str, int] = {}
+
+    results: Dict[str, Dict] = {}
+    for profile_name, risk_data in profiles.items():
+        total_score = 0
+        severity_counters = {
+            "very_high_risk": 0, "high_risk": 0, "moderate_risk": 0,
+            "low_risk": 0, "minimal_risk": 0
+        }
+        matched = MatchTableBuilder(shared_sentences, shared_sentence_ids)
+
+        for level_key, items in risk_data.items():
+            matched.add_level(level_key)
+            for item in items:
+                keyword = clean_text(item.get("keyword", ""))
+                kept = valid_hits.get(keyword)
+                if not kept:
+                    continue
+                score = int(item.get("score", 0))
+                effective_count = min(len(kept), 3)
+                matched.add_keyword(level_key, keyword, score, score * effective_count, kept)
+                total_score += score * effective_count
+                severity_counters[map_level_severity(level_key)] += 1
+
+        tfidf_density = (get_tfidf_density(density_text, risk_data, tfidf_vocabulary)
+                         if tfidf_vocabulary is not None else 0.0)
+        confidence = min(95, 50 + int(total_score * 0.2 + tfidf_density * 0.3))
+
+        results[profile_name] = {
+            "Total Score": total_score,
+            "Risk Level": determine_risk_level(severity_counters, total_score),
+            "Confidence": confidence,
+            "TF-IDF Density": round(tfidf_density, 1),
+            "Top Risk Phrases": top_risk_phrases,
+            "Matches": matched.build(),
+        }
+    return results
+
+def safe_tfidf_vocabulary(text: str):
+    try:
+        return get_tfidf_vocabulary(text)
+    except Exception:
+        return None
+
+# ------------------------------
+# Analyze several profiles in one scan
+# ------------------------------
+@st.cache_data(show_spinner=True)
+def cached_analyze_profiles(extracted_text: str, summarized_text: str, profile_paths: Dict[str, str]) -> Dict[str, Dict]:
+    """
+    Score the document against every profile with one keyword scan.
+    Returns {profile name: result}, each result shaped like `cached_analyze_policy`.
+    Same definition as the analysis pipeline: keyword hits from the text and
+    the summary, TF-IDF density and TextRank phrases from the text alone.
+    """
+    profiles = cached_load_risk_profiles(profile_paths)
+    matcher = cached_profile_matcher(tuple(profile_paths.items()))
+    norm = NormalizedText(extracted_text)
+
+    valid_hits = merge_summary_hits(collect_valid_hits(norm, matcher),
+                                    collect_valid_hits(NormalizedText(summarized_text), matcher), norm.text)
+    top_risk_phrases = extract_textrank_phrases(norm.text)
+    tfidf_vocabulary = safe_tfidf_vocabulary(norm.text)
+    return score_profiles(profiles, valid_hits, norm.text, tfidf_vocabulary, top_risk_phrases)
@@ -0,0 +1,176 @@
+# sections.py
+"""
+Heading / section detection and per-section risk scores.
+
+Headings are recognized from the text layout (numbered clauses such as
+"3.2 Sharing", "Section 4 - ...", all-caps lines, Markdown "#" lines) and,
+for PDFs, from font-size cues collected during extraction (`page_heading_lines`).
+Section scores reuse the keyword hits of the whole document, so they cost
+one bisect per hit; summaries of sections are left to the caller (lazily).
+"""
+import re
+from bisect import bisect_right
+from statistics import median
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from modules.match_table import iter_keyword_matches
+from modules.risk_analyzer import map_level_severity, score_profiles
+
+HEADING_MAX_CHARS = 100
+HEADING_MAX_WORDS = 12
+FONT_HEADING_RATIO = 1.15     # line size vs. the page's body text size
+SECTION_KEYWORDS = 5          # keywords listed per section and profile
+LEVEL_LABELS = {
+    "very_high_risk": "Very High Risk", "high_risk": "High Risk", "moderate_risk": "Moderate Risk",
+    "low_risk": "Low Risk", "minimal_risk": "Minimal Risk",
+}
+NO_RISK_LABEL = "No Risk Detected"
+
+NUMBERED_RE = re.compile(
+    r"^((?:section|article|clause|part)\s+)?(\d{1,2}(?:\.\d{1,2})*[.):]?|(?-i:[IVX]{1,5})[.)])\s*[-–—:]?\s+(\S.*)$",
+    re.IGNORECASE,
+)
+KEYWORD_HEADING_RE = re.compile(r"^(?:section|article|clause|part)\s+\w+$", re.IGNORECASE)
+MARKDOWN_RE = re.compile(r"^(#{1,6})\s+(\S.*)$")
+LINE_RE = re.compile(r"[^\n]*\n?")
+
+def heading_key(line: str) -> str:
+    """Comparison key for heading lines from different extractors (spacing/case/punctuation ignored)."""
+    return re.sub(r"\W+", "", line).lower()
+
+# ------------------------------
+# Heading detection
+# ------------------------------
+def _is_title(words: str) -> bool:
+    """Short, starts with a capital, does not read like a sentence."""
+    return (
+        bool(words) and words[0].isupper() and len(words.split()) <= HEADING_MAX_WORDS
+        and not words.rstrip().endswith((".", ",", ";"))
+    )
+
+def heading_level(line: str, hints: Iterable[str] = ()) -> Optional[int]:
+    """Nesting level (1 = top) if `line` is a heading, else None. `hints` are heading_key()s."""
+    s = line.strip()
+    if not s or len(s) > HEADING_MAX_CHARS:
+        return None
+
+    m = MARKDOWN_RE.match(s)
+    if m:
+        return len(m.group(1))
+    m = NUMBERED_RE.match(s)
+    # "2.3 Sharing", "4) Cookies", "Section 4 Cookies" -- but not "10 Years"
+    if m and _is_title(m.group(3)) and (m.group(1) or not m.group(2).isdigit()):
+        number = m.group(2).rstrip(".):")
+        return number.count(".") + 1 if number[0].isdigit() else 1
+    if KEYWORD_HEADING_RE.match(s):
+        return 1
+
+    letters = [c for c in s if c.isalpha()]
+    if len(letters) >= 4 and sum(c.isupper() for c in letters) >= 0.9 * len(letters) \
+            and len(s.split()) <= HEADING_MAX_WORDS:
+        return 1
+    if hints and heading_key(s) in hints and _is_title(s):
+        return 1
+    return None
+
+def detect_sections(text: str, hints: Iterable[str] = ()) -> List[Dict]:
+    """
+    Split `text` at heading lines. Each section: title, level, start (of the
+    heading), body_start, end, as offsets into `text`. Text before the first
+    heading becomes "Introduction"; without headings the whole text is one section.
+    `hints` are heading lines known from the source layout (e.g. PDF font size).
+    """
+    hints = {heading_key(h) for h in hints}
+    headings: List[Tuple[int, int, int, str]] = []   # (start, body_start, level, title)
+    for m in LINE_RE.finditer(text):
+        line = m.group()
+        if not line:
+            break
+        level = heading_level(line, hints)
+        if level is not None:
+            headings.append((m.start(), m.end(), level, MARKDOWN_RE.sub(r"\2", line.strip())))
+
+    sections = []
+    if not headings or text[:headings[0][0]].strip():
+        first_end = headings[0][0] if headings else len(text)
+        sections.append({"title": "Introduction" if headings else "Full policy", "level": 1,
+                         "start": 0, "body_start": 0, "end": first_end})
+    for i, (start, body_start, level, title) in enumerate(headings):
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(text)
+        sections.append({"title": title, "level": level, "start": start, "body_start": body_start, "end": end})
+
+    # a heading directly followed by another heading (document title, parent clause) has no body
+    return [s for s in sections if text[s["body_start"]:s["end"]].strip()] or sections[:1]
+
+def page_heading_lines(page) -> List[str]:
+    """
+    Lines of a pdfplumber page set noticeably larger than its body text
+    (font-size cue). Uses the characters extract_text() already parsed.
+    """
+    lines: Dict[int, List] = {}
+    for ch in page.chars:
+        lines.setdefault(round(ch["top"]), []).append(ch)
+    if not lines:
+        return []
+
+    body_size = median(ch["size"] for chars in lines.values() for ch in chars if ch["text"].strip())
+    headings = []
+    for _, chars in sorted(lines.items()):
+        visible = [ch for ch in chars if ch["text"].strip()]
+        if not visible:
+            continue
+        if sum(ch["size"] for ch in visible) / len(visible) >= body_size * FONT_HEADING_RATIO:
+            headings.append("".join(ch["text"] for ch in sorted(chars, key=lambda ch: ch["x0"])))
+    return headings
+
+def larger_font_lines(lines: List[Tuple[str, float, int]]) -> List[str]:
+    """
+    Font-size cue for text backends without per-character objects: `lines`
+    are (text, font size, visible characters); the body size is the median
+    over characters, as in page_heading_lines().
+    """
+    sizes = sorted((size, count) for _, size, count in lines if count)
+    if not sizes:
+        return []
+    half, seen = sum(count for _, count in sizes) / 2, 0
+    for body_size, count in sizes:
+        seen += count
+        if seen >= half:
+            break
+    return [text for text, size, count in lines if count and size >= body_size * FONT_HEADING_RATIO]
+
+# ------------------------------
+# Per-section risk
+# ------------------------------
+def score_sections(sections: List[Dict], norm, valid_hits: Dict[str, List[Tuple[int, int, str]]],
+                   profiles: Dict[str, Dict]) -> List[Dict]:
+    """
+    Attach per-profile risk to every section: Total Score (same keyword
+    scoring as the document), Worst Keyword Level (the most severe level
+    matched; the document's Risk Level thresholds are calibrated for whole
+    policies and would rate nearly every section low) and top Keywords.
+    `valid_hits` are the document's hits in `norm` (normalized offsets).
+    """
+    starts = [s["start"] for s in sections]
+    per_section: List[Dict[str, list]] = [{} for _ in sections]
+    for keyword, hits in valid_hits.items():
+        for hit in hits:
+            idx = max(bisect_right(starts, norm.original_span(hit[0], hit[1])[0]) - 1, 0)
+            per_section[idx].setdefault(keyword, []).append(hit)
+
+    scored = []
+    for section, hits in zip(sections, per_section):
+        results = score_profiles(profiles, hits, "", None, []) if hits else {}
+        risk = {}
+        for name in profiles:
+            entries = [e for e in iter_keyword_matches(results.get(name, {}).get("Matches")) if e["count"]]
+            severities = {map_level_severity(e["level"]) for e in entries}
+            worst = next((lvl for lvl in LEVEL_LABELS if lvl in severities), None)
+            entries.sort(key=lambda e: e["total_score"], reverse=True)
+            risk[name] = {
+                "Total Score": results[name]["Total Score"] if entries else 0,
+                "Worst Keyword Level": LEVEL_LABELS[worst] if worst else NO_RISK_LABEL,
+                "Keywords": [e["keyword"] for e in entries[:SECTION_KEYWORDS]],
+            }
+        scored.append({**section, "profiles": risk})
+    return scored
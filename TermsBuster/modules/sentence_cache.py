@@ -0,0 +1,73 @@
+# sentence_cache.py
+"""
+Process-wide LRU cache of per-sentence analysis results.
+
+Policies repeat the same boilerplate sentences across vendors, so keyword
+hits, safe-phrase verdicts and plain-language rewrites are memoized per
+sentence (keyed by a hash of the sentence within a namespace such as a
+keyword set). A new document only pays for its novel sentences.
+
+    SENTENCE_CACHE.stats()   # hits, misses, evictions, entries, hit_rate
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+MAX_ENTRIES = int(os.environ.get("TERMSBUSTER_SENTENCE_CACHE_SIZE", 100_000))
+
+def sentence_key(sentence: str) -> bytes:
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=16).digest()
+
+class SentenceCache:
+    """Thread-safe LRU map of (namespace, sentence hash) -> value, with hit/miss counters."""
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_or_compute(self, namespace: Hashable, sentence: str, compute: Callable[[], object]):
+        key = (namespace, sentence_key(sentence))
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+
+        # computed outside the lock; two threads may compute the same sentence once each
+        value = compute()
+        if self.max_entries <= 0:
+            return value
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+SENTENCE_CACHE = SentenceCache()
@@ -1,12 +1,26 @@
+import os
+import re
+import math
 import streamlit as st
-from transformers import BartTokenizer, BartForConditionalGeneration
+from bisect import bisect_left
+from collections import Counter
+from transformers import BartTokenizer, BartForConditionalGeneration, StoppingCriteria, StoppingCriteriaList
 import torch
 import textwrap
 
+from modules.model_client import MODEL_SERVER_ENV, RequestCancelled, request_summary
+from modules.normalizer import NormalizedText
+from modules.risk_analyzer import (
+    DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_PATH, cached_profile_matcher, scan_keywords, sentence_spans,
+)
+
 # ----------------------------------------
 # Load DistilBART model (optimized for CPU) with caching
 # ----------------------------------------
 MODEL_PATH = "sshleifer/distilbart-cnn-12-6"
+MODEL_MAX_TOKENS = 1024
+EXTRACTIVE_SENTENCES = 5  # sentences in the model-free fallback summary
+RISK_WEIGHT = 0.6       # share of the ranking from risk keywords; the rest is centrality
 
 @st.cache_resource
 def load_model():
@@ -17,28 +31,229 @@ def load_model():
     return tokenizer, model, device
 
 # ----------------------------------------
-# Summarization with caching
+# Extractive pre-selection (fit the riskiest, most central sentences into the window)
 # ----------------------------------------
-@st.cache_data
-def summarize_text(text, max_length=250, min_length=80):
-    """Generate a concise, readable summary using DistilBART (optimized for CPU)."""
-    if not text or len(text.strip()) == 0:
-        return "No valid text provided for summarization."
+def rank_sentences(norm):
+    """Score every sentence of a NormalizedText by risk keyword weight and centrality."""
+    spans = sentence_spans(norm.text)
+    ends = [end for _, end in spans]
+
+    # risk: sum of keyword scores whose hits fall inside the sentence
+    matcher = cached_profile_matcher(((DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_PATH),))
+    risk = [0.0] * len(spans)
+    for keyword, hits in scan_keywords(norm.text, matcher).items():
+        weight = max(score for _, _, score in matcher["entries"][keyword])
+        for start, _ in hits:
+            idx = bisect_left(ends, start)
+            if idx < len(spans):
+                risk[idx] += weight
+
+    # centrality: cosine between the sentence's word bag and the whole document's
+    words = [re.findall(r"[a-z]{3,}", norm.text[s:e]) for s, e in spans]
+    doc_tf = Counter(w for ws in words for w in ws)
+    doc_norm = math.sqrt(sum(v * v for v in doc_tf.values())) or 1.0
+    centrality = []
+    for ws in words:
+        tf = Counter(ws)
+        dot = sum(doc_tf[w] * c for w, c in tf.items())
+        sent_norm = math.sqrt(sum(c * c for c in tf.values())) or 1.0
+        centrality.append(dot / (doc_norm * sent_norm))
+
+    max_risk = max(risk) or 1.0
+    max_central = max(centrality) or 1.0
+    scores = [RISK_WEIGHT * r / max_risk + (1 - RISK_WEIGHT) * c / max_central for r, c in zip(risk, centrality)]
+    return spans, scores
+
+def select_for_window(text, tokenizer, max_tokens=MODEL_MAX_TOKENS):
+    """
+    Return `text` unchanged if it fits the model window, otherwise the
+    highest-ranked sentences that fit, in their original order. When no
+    sentence fits on its own (no sentence breaks, or only oversized
+    sentences), `text` is returned and left to the tokenizer's truncation.
+    """
+    budget = max_tokens - 2  # <s> and </s>
+    if len(tokenizer(text, add_special_tokens=False)["input_ids"]) <= budget:
+        return text
+
+    norm = NormalizedText(text)
+    spans, scores = rank_sentences(norm)
+    sentences = [norm.original(s, e).strip() for s, e in spans]
+    lengths = [len(ids) + 1 for ids in tokenizer(sentences, add_special_tokens=False)["input_ids"]]
 
+    chosen = []
+    seen = set()
+    for idx in sorted(range(len(spans)), key=lambda i: scores[i], reverse=True):
+        key = norm.text[spans[idx][0]:spans[idx][1]]
+        if key in seen:
+            continue  # repeated boilerplate sentence
+        if lengths[idx] <= budget:
+            chosen.append(idx)
+            seen.add(key)
+            budget -= lengths[idx]
+        if budget <= 0:
+            break
+    if not chosen:
+        return text
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+def extractive_summary(text, max_sentences=EXTRACTIVE_SENTENCES):
+    """Model-free summary: the top-ranked sentences, in document order."""
+    norm = NormalizedText(text)
+    spans, scores = rank_sentences(norm) if norm.text else ([], [])
+    top = sorted(sorted(range(len(spans)), key=lambda i: scores[i], reverse=True)[:max_sentences])
+    summary = " ".join(norm.original(*spans[i]).strip() for i in top)
+    return {
+        "summary": "\n".join(textwrap.wrap(summary, width=100)),
+        "preset": "extractive",
+        "input_tokens": 0,
+        "min_length": 0,
+        "max_length": 0,
+        "decode_steps": 0,
+    }
+
+# ----------------------------------------
+# Speed / quality presets
+# ----------------------------------------
+# max_length scales with the input (max_ratio of input tokens, within
+# [floor, cap]); min_length is a smaller share so short inputs are not
+# forced through needless decoding steps.
+SUMMARY_PRESETS = {
+    "fast":     {"num_beams": 1, "length_penalty": 1.0, "max_ratio": 0.20, "min_ratio": 0.05, "floor": 30, "cap": 150},
+    "balanced": {"num_beams": 2, "length_penalty": 1.5, "max_ratio": 0.30, "min_ratio": 0.08, "floor": 40, "cap": 250},
+    "quality":  {"num_beams": 4, "length_penalty": 2.0, "max_ratio": 0.35, "min_ratio": 0.10, "floor": 60, "cap": 300},
+}
+DEFAULT_PRESET = "balanced"
+
+def length_budget(input_tokens, preset=DEFAULT_PRESET):
+    """(min_length, max_length) for an input of `input_tokens` tokens."""
+    cfg = SUMMARY_PRESETS[preset]
+    max_length = max(cfg["floor"], min(cfg["cap"], int(input_tokens * cfg["max_ratio"])))
+    min_length = min(80, int(input_tokens * cfg["min_ratio"]), max_length // 2)
+    return max(min_length, 10), max_length
+
+# ----------------------------------------
+# Batched generation (shared by the in-process path and the model server)
+# ----------------------------------------
+class GenerationCancelled(RuntimeError):
+    """`cancel` was set while the model was decoding."""
+
+class _StopOnEvent(StoppingCriteria):
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
+def input_length_budget(text, tokenizer, preset=DEFAULT_PRESET, max_length=None, min_length=None):
+    """
+    (min_length, max_length) for one input as the model sees it (window
+    selection, special tokens, truncation); explicit lengths take precedence.
+    """
+    n_tokens = min(len(tokenizer(text)["input_ids"]), MODEL_MAX_TOKENS)
+    lo, hi = length_budget(n_tokens, preset)
+    hi = max_length or hi
+    return min(min_length or lo, hi), hi
+
+def prepare_input(text, preset=DEFAULT_PRESET, max_length=None, min_length=None):
+    """
+    (model input, min_length, max_length) for one request: the window
+    selection and its length budget, computed once per request.
+    """
+    tokenizer, _, _ = load_model()
+    # long policies: summarize the risky/central clauses instead of only the opening
+    text = select_for_window(text, tokenizer)
+    lo, hi = input_length_budget(text, tokenizer, preset, max_length, min_length)
+    return text, lo, hi
+
+def generate_summaries(texts, preset=DEFAULT_PRESET, max_length=None, min_length=None, cancel=None):
+    """
+    Summarize several texts, one `model.generate` call per length budget:
+    every text is decoded with its own budget, whatever else is in the batch.
+    Setting the `cancel` event stops decoding after the current step.
+    """
+    groups = {}
+    for i, text in enumerate(texts):
+        text, lo, hi = prepare_input(text, preset, max_length, min_length)
+        groups.setdefault((lo, hi), []).append((i, text))
+
+    results = [None] * len(texts)
+    for (group_min, group_max), items in groups.items():
+        rows = generate_batch([text for _, text in items], preset, group_max, group_min, cancel)
+        for (i, _), row in zip(items, rows):
+            results[i] = row
+    return results
+
+def generate_batch(texts, preset, max_length, min_length, cancel=None):
+    """
+    One `model.generate` call over inputs already prepared with
+    `prepare_input` and sharing one length budget. `cancel` is anything with
+    `is_set()`; decoding stops after the step where it turns true.
+    """
+    cfg = SUMMARY_PRESETS[preset]
     tokenizer, model, device = load_model()
     with torch.no_grad():  # disable gradient tracking for speed
-        inputs = tokenizer([text], max_length=1024, truncation=True, return_tensors="pt").to(device)
+        inputs = tokenizer(texts, max_length=MODEL_MAX_TOKENS, truncation=True, padding=True,
+                           return_tensors="pt").to(device)
+        input_tokens = [int(n) for n in inputs["attention_mask"].sum(dim=1)]
         summary_ids = model.generate(
             inputs["input_ids"],
-            num_beams=2,               # reduced from 4 to 2 for faster run
-            length_penalty=1.5,
+            attention_mask=inputs["attention_mask"],
+            num_beams=cfg["num_beams"],
+            length_penalty=cfg["length_penalty"],
             max_length=max_length,
             min_length=min_length,
-            early_stopping=True,
-            no_repeat_ngram_size=3     # avoid repetitive output
+            early_stopping=cfg["num_beams"] > 1,
+            no_repeat_ngram_size=3,    # avoid repetitive output
+            stopping_criteria=StoppingCriteriaList([_StopOnEvent(cancel)]) if cancel is not None else None,
         )
-    summary = tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-    return "\n".join(textwrap.wrap(summary, width=100))
+    if cancel is not None and cancel.is_set():
+        raise GenerationCancelled("summary generation cancelled")
+
+    results = []
+    for row, n_tokens in zip(summary_ids, input_tokens):
+        summary = tokenizer.decode(row, skip_special_tokens=True)
+        results.append({
+            "summary": "\n".join(textwrap.wrap(summary, width=100)),
+            "preset": preset,
+            "input_tokens": n_tokens,
+            "min_length": min_length,
+            "max_length": max_length,
+            # minus the decoder start token; shorter rows are right-padded
+            "decode_steps": int((row != tokenizer.pad_token_id).sum()) - 1,
+        })
+    return results
+
+# ----------------------------------------
+# Summarization with caching
+# ----------------------------------------
+@st.cache_data
+def summarize_with_details(text, preset=DEFAULT_PRESET, max_length=None, min_length=None, _cancel=None):
+    """
+    Summarize with a named preset. Returns the summary plus what it cost:
+    preset, input tokens, length budget and decode steps.
+    Uses the shared model server when TERMSBUSTER_MODEL_SERVER is set.
+    `_cancel` (not part of the cache key) aborts decoding: in-process, or on
+    the server by hanging up, which frees the request's decode slot.
+    """
+    if preset not in SUMMARY_PRESETS:
+        raise ValueError(f"Unknown summary preset: {preset}")
+    if not text or len(text.strip()) == 0:
+        return {"summary": "No valid text provided for summarization.", "preset": preset,
+                "input_tokens": 0, "min_length": 0, "max_length": 0, "decode_steps": 0}
+
+    address = os.environ.get(MODEL_SERVER_ENV)
+    if address:
+        try:
+            return request_summary(address, text, preset, max_length, min_length, cancel=_cancel)
+        except RequestCancelled as e:
+            raise GenerationCancelled("summary generation cancelled") from e
+        except OSError as e:
+            print(f"⚠️ Model server at {address} unavailable ({e}); summarizing in-process.")
+    return generate_summaries([text], preset, max_length, min_length, cancel=_cancel)[0]
+
+def summarize_text(text, max_length=None, min_length=None, preset=DEFAULT_PRESET):
+    """Generate a concise, readable summary using DistilBART (optimized for CPU)."""
+    return summarize_with_details(text, preset, max_length, min_length)["summary"]
 
 # ----------------------------------------
 # Chunk Summarization (for long documents)
@@ -0,0 +1,372 @@
+# watch_folder.py
+"""
+Watch-folder ingestion daemon.
+
+    python -m modules.watch_folder /shared/policies --workers 2 [--profile GDPR] [--poll]
+    python -m modules.watch_folder /shared/policies --once     # catch up and exit
+
+Every policy file (PDF, image, TXT) dropped into the folder or changed in it
+goes through extraction, summarization and risk scoring, and lands in the
+policy index (vendor = file name without extension). File system events come
+from watchdog (inotify on Linux), or from a periodic scan when watchdog is
+unavailable or `--poll` is given. A file is picked up once it has had no
+events for `--debounce` seconds and its size and mtime stay put, so
+half-copied files are not read.
+
+Files are identified by content hash: the state database remembers what was
+processed, so unchanged files are skipped after a restart, and only new or
+changed content is queued. Files that failed are retried when they change
+or at the next start. The queue is bounded; at most `--workers` files are
+analyzed at once.
+"""
+import argparse
+import hashlib
+import mimetypes
+import os
+import queue
+import signal
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+STATE_PATH = Path("data/watch_state.db")
+SUPPORTED_EXTENSIONS = {".pdf", ".png", ".jpg", ".jpeg", ".txt"}
+PARTIAL_SUFFIXES = (".part", ".tmp", ".crdownload", ".download", ".partial")
+DEBOUNCE_S = 2.0          # quiet time before a file is considered fully written
+POLL_INTERVAL_S = 5.0     # rescan period without watchdog (and safety net with it)
+QUEUE_SIZE = 64
+WRITE_EVENTS = {"created", "modified", "moved", "closed"}
+HASH_CHUNK = 1024 * 1024
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watched_files (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    status TEXT NOT NULL,
+    detail TEXT,
+    processed_at REAL NOT NULL
+);
+"""
+
+# ------------------------------
+# Persistent state
+# ------------------------------
+def open_state(path: Path = STATE_PATH) -> sqlite3.Connection:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(STATE_SCHEMA)
+    return conn
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def is_candidate(path: str) -> bool:
+    name = os.path.basename(path)
+    if name.startswith((".", "~$")) or name.lower().endswith(PARTIAL_SUFFIXES):
+        return False
+    return os.path.splitext(name)[1].lower() in SUPPORTED_EXTENSIONS
+
+# ------------------------------
+# Analysis of one file
+# ------------------------------
+def analyze_file(path: str, profile_paths: Dict[str, str], index_path: Optional[Path] = None) -> str:
+    """Extract, analyze and index one policy file; returns a short status detail."""
+    from modules.corpus_idf import learn_policy
+    from modules.near_duplicate import find_near_duplicate, register_document
+    from modules.ocr_reader import extract_text_from_upload
+    from modules.pipeline import run_analysis
+    from modules.policy_index import INDEX_PATH, index_analysis, open_index
+    from modules.risk_analyzer import document_sentence_hits, matcher_fingerprint
+
+    mime_type = mimetypes.guess_type(path)[0] or "text/plain"
+    with open(path, "rb") as f:
+        text = extract_text_from_upload(f, mime_type)
+    if not text.strip():
+        raise ValueError("no text found")
+
+    vendor = Path(path).stem
+    with closing(open_index(index_path or INDEX_PATH)) as conn:
+        neighbour = find_near_duplicate(conn, text, fingerprint=matcher_fingerprint(profile_paths))
+        summarize_fn = None
+        if neighbour:
+            summarize_fn = lambda _text: {"summary": neighbour["summary"], "preset": "reused", "decode_steps": 0}
+        # batch ingestion has no user waiting: no deadline, no load shedding
+        analysis = run_analysis(text, profile_paths, summarize_fn=summarize_fn, deadline_s=0, degrade_at_inflight=0,
+                                known_sentence_hits=neighbour["sentence_hits"] if neighbour else None)
+        for name, result in analysis["profiles"].items():
+            index_analysis(conn, vendor, text, analysis["summary"], result, profile=name,
+                           timings=analysis["timings"])
+        learn_policy(text)
+        if not analysis["summary_failed"] and not neighbour:
+            register_document(conn, text, analysis["summary"], document_sentence_hits(text, profile_paths))
+
+    scores = ", ".join(f"{name}: {r.get('Risk Level')} ({r.get('Total Score')})"
+                       for name, r in analysis["profiles"].items())
+    return f"{vendor} · {scores}"
+
+# ------------------------------
+# Daemon
+# ------------------------------
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "FolderWatcher"):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        # opened / closed_no_write also fire when we read the file ourselves
+        if event.is_directory or event.event_type not in WRITE_EVENTS:
+            return
+        for path in (getattr(event, "src_path", None), getattr(event, "dest_path", None)):
+            if path:
+                self.watcher.touch(os.fsdecode(path))
+
+class FolderWatcher:
+    """
+    Debounces file events, skips content already processed and feeds a
+    bounded queue drained by `workers` analysis threads.
+    """
+
+    def __init__(self, directory: str, profile_paths: Dict[str, str], workers: int = 2,
+                 state_path: Path = STATE_PATH, index_path: Optional[Path] = None,
+                 debounce: float = DEBOUNCE_S, poll_interval: float = POLL_INTERVAL_S,
+                 use_watchdog: bool = True, recursive: bool = False, analyze=analyze_file):
+        self.directory = os.path.abspath(directory)
+        self.profile_paths = profile_paths
+        self.workers = max(1, workers)
+        self.index_path = index_path
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.recursive = recursive
+        self.analyze = analyze
+
+        self.state = open_state(state_path)
+        self._state_lock = threading.Lock()
+        self._pending: Dict[str, float] = {}        # path -> last event (monotonic)
+        self._last_stat: Dict[str, tuple] = {}      # path -> (size, mtime) seen when it was due
+        self._in_progress = set()
+        self._retry = set()                         # failed earlier; retried once at start-up
+        self._lock = threading.Lock()
+        self.queue: "queue.Queue" = queue.Queue(maxsize=QUEUE_SIZE)
+        self.stop_event = threading.Event()
+        self.stats = {"queued": 0, "processed": 0, "skipped": 0, "failed": 0}
+
+    # -- discovery --
+    def touch(self, path: str, event: bool = True) -> None:
+        """Note activity on `path`; scans (event=False) do not postpone an already pending file."""
+        if is_candidate(path):
+            with self._lock:
+                if event or path not in self._pending:
+                    self._pending[path] = time.monotonic()
+
+    def scan(self, retry_failed: bool = False) -> None:
+        """Mark every candidate file whose size/mtime differs from the state (or that failed) as pending."""
+        for root, dirs, files in os.walk(self.directory):
+            if not self.recursive:
+                dirs.clear()
+            for name in files:
+                path = os.path.join(root, name)
+                if not is_candidate(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                row = self._state_row(path)
+                if retry_failed and row is not None and row["status"] != "ok":
+                    self._retry.add(path)
+                    self.touch(path, event=False)
+                elif row is None or (row["size"], row["mtime"]) != (st.st_size, st.st_mtime):
+                    self.touch(path, event=False)
+
+    def _state_row(self, path: str):
+        with self._state_lock:
+            return self.state.execute("SELECT * FROM watched_files WHERE path = ?", (path,)).fetchone()
+
+    def _record(self, path: str, sha256: str, size: int, mtime: float, status: str, detail: str = "") -> None:
+        with self._state_lock, self.state:
+            self.state.execute(
+                "INSERT OR REPLACE INTO watched_files (path, sha256, size, mtime, status, detail, processed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (path, sha256, size, mtime, status, detail, time.time()))
+
+    def _due(self) -> list:
+        """Pending files quiet for `debounce` seconds whose size/mtime held still since the last check."""
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for path, last_event in list(self._pending.items()):
+                if now - last_event < self.debounce or path in self._in_progress:
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    del self._pending[path]          # deleted or renamed away
+                    self._last_stat.pop(path, None)
+                    continue
+                stat = (st.st_size, st.st_mtime)
+                if self._last_stat.get(path) != stat:
+                    # still being written (or first look): check again after another quiet period
+                    self._last_stat[path] = stat
+                    self._pending[path] = now
+                    continue
+                del self._pending[path]
+                self._last_stat.pop(path, None)
+                due.append((path, stat))
+        return due
+
+    def _dispatch(self) -> None:
+        for path, (size, mtime) in self._due():
+            try:
+                digest = file_sha256(path)
+            except OSError:
+                continue
+            row = self._state_row(path)
+            if row is not None and row["sha256"] == digest and (row["status"] == "ok" or path not in self._retry):
+                # touched or copied over with identical content
+                self._record(path, digest, size, mtime, row["status"], row["detail"])
+                self._count("skipped")
+                continue
+            self._retry.discard(path)
+            with self._lock:
+                self._in_progress.add(path)
+            # blocks when the workers are behind: back-pressure instead of an unbounded backlog
+            while not self.stop_event.is_set():
+                try:
+                    self.queue.put((path, digest, size, mtime), timeout=0.5)
+                    self._count("queued")
+                    break
+                except queue.Full:
+                    continue
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    # -- workers --
+    def _worker(self) -> None:
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, digest, size, mtime = item
+            try:
+                detail = self.analyze(path, self.profile_paths, self.index_path)
+                self._record(path, digest, size, mtime, "ok", detail)
+                self._count("processed")
+                print(f"✅ {path}: {detail}", flush=True)
+            except Exception as e:
+                self._record(path, digest, size, mtime, "error", f"{type(e).__name__}: {e}")
+                self._count("failed")
+                print(f"❌ {path}: {type(e).__name__}: {e}", flush=True)
+            finally:
+                with self._lock:
+                    self._in_progress.discard(path)
+
+    # -- main loop --
+    def run(self, once: bool = False) -> Dict[str, int]:
+        """Watch until `stop()` (or, with `once`, until the current backlog is processed)."""
+        threads = [threading.Thread(target=self._worker, name=f"watch-worker-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+
+        observer = None
+        if self.use_watchdog and not once:
+            observer = Observer()
+            observer.schedule(_EventHandler(self), self.directory, recursive=self.recursive)
+            observer.start()
+        mode = "watchdog" if observer else ("one pass" if once else "polling")
+        print(f"👀 Watching {self.directory} ({mode}, "
+              f"{self.workers} workers)", flush=True)
+
+        self.scan(retry_failed=True)
+        last_scan = time.monotonic()
+        try:
+            while not self.stop_event.is_set():
+                self._dispatch()
+                with self._lock:
+                    idle = not self._pending and not self._in_progress
+                if once and idle and self.queue.empty():
+                    break
+                if time.monotonic() - last_scan >= self.poll_interval and not once:
+                    # polling mode; with watchdog a cheap safety net for missed events
+                    self.scan()
+                    last_scan = time.monotonic()
+                self.stop_event.wait(min(0.5, self.debounce / 2 or 0.5))
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+            # drop the backlog (not recorded, so it is picked up at the next start);
+            # workers only finish the file they are on
+            while True:
+                try:
+                    path = self.queue.get_nowait()[0]
+                except queue.Empty:
+                    break
+                with self._lock:
+                    self._in_progress.discard(path)
+            for _ in threads:
+                self.queue.put(None)
+            for t in threads:
+                t.join()
+            self.state.close()
+        return dict(self.stats)
+
+    def stop(self, *_):
+        self.stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze policy files dropped into a folder.")
+    parser.add_argument("directory")
+    parser.add_argument("--profile", action="append", dest="profiles", help="risk profile name (repeatable)")
+    parser.add_argument("--workers", type=int, default=2, help="files analyzed at once")
+    parser.add_argument("--state", default=str(STATE_PATH), help="processed-file database")
+    parser.add_argument("--index", default=None, help="policy index database (default data/policy_index.db)")
+    parser.add_argument("--debounce", type=float, default=DEBOUNCE_S, help="quiet seconds before reading a file")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL_S, help="rescan period in seconds")
+    parser.add_argument("--poll", action="store_true", help="scan periodically instead of using file system events")
+    parser.add_argument("--recursive", action="store_true", help="include subdirectories")
+    parser.add_argument("--once", action="store_true", help="process what is there now, then exit")
+    args = parser.parse_args(argv)
+
+    from modules.risk_analyzer import DEFAULT_PROFILE_NAME, discover_risk_profiles
+
+    available = discover_risk_profiles()
+    unknown = [n for n in (args.profiles or []) if n not in available]
+    if unknown:
+        parser.error(f"unknown risk profile(s): {', '.join(unknown)}")
+    profile_paths = {n: available[n] for n in (args.profiles or [DEFAULT_PROFILE_NAME])}
+
+    watcher = FolderWatcher(
+        args.directory, profile_paths, workers=args.workers, state_path=Path(args.state),
+        index_path=Path(args.index) if args.index else None, debounce=args.debounce,
+        poll_interval=args.interval, use_watchdog=not args.poll, recursive=args.recursive,
+    )
+    signal.signal(signal.SIGINT, watcher.stop)
+    signal.signal(signal.SIGTERM, watcher.stop)
+    stats = watcher.run(once=args.once)
+    print(f"Done: {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# service.py
+"""
+Local HTTP API for TermsBuster.
+
+    python service.py --port 8502
+
+POST /extract          raw file body, Content-Type = file mime type
+POST /summarize        {"text": ..., "preset": "fast" | "balanced" | "quality"}
+POST /score            {"text": ..., "summary": ..., "profiles": ["GDPR", ...]}
+POST /analyze          {"text": ..., "preset": ..., "profiles": [...], "deadline_s": 30}
+                       -> summary + explanation + score + scored sections (+ "degraded" stages when cut short)
+POST /export/pdf       {"policy_text": ..., "summary": ..., "result": {...}}
+POST /export/png       same payload as /export/pdf
+POST /batch            {"items": [{"op": "score", ...}, ...]} -> streamed NDJSON
+GET  /health            status + sentence cache hit rate
+"""
+import argparse
+import base64
+import itertools
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from modules.corpus_idf import corpus_model, scratch_corpus_model
+from modules.exporter import generate_image_report, generate_pdf_report
+from modules.ingest import ExtractionFailed, UploadRejected, spool_stream
+from modules.ocr_reader import extract_text_from_upload
+from modules.risk_analyzer import (
+    DEFAULT_PROFILE_NAME, DEFAULT_PROFILE_PATH,
+    cached_analyze_profiles, cached_profile_matcher, discover_risk_profiles,
+)
+from modules.pipeline import DEADLINE_S, run_analysis
+from modules.sentence_cache import SENTENCE_CACHE
+from modules.summarizer import DEFAULT_PRESET, SUMMARY_PRESETS, load_model, summarize_with_details
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+MAX_BATCH_ITEMS = 64
+
+class RequestError(Exception):
+    """Client error reported back as a 4xx JSON response."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+# ------------------------------
+# Operations (shared by single and batch endpoints)
+# ------------------------------
+def op_extract(payload):
+    stream = payload.get("file")
+    if stream is None:
+        stream = BytesIO(base64.b64decode(payload.get("data_base64", "")))
+    mime_type = payload.get("mime_type", "text/plain")
+    try:
+        return {"text": extract_text_from_upload(stream, mime_type)}
+    except UploadRejected as e:
+        raise RequestError(f"Upload rejected: {e}", status=413)
+    except ExtractionFailed as e:
+        raise RequestError(str(e), status=422)
+
+def op_summarize(payload):
+    text = _require_text(payload, "text")
+    return summarize_with_details(text, _preset(payload))
+
+def op_score(payload):
+    text = _require_text(payload, "text")
+    summary = payload.get("summary", "")
+    return {"profiles": cached_analyze_profiles(text, summary, _profile_paths(payload))}
+
+def op_analyze(payload, initializer=None):
+    text = _require_text(payload, "text")
+    analysis = run_analysis(text, _profile_paths(payload), preset=_preset(payload), initializer=initializer,
+                            deadline_s=_deadline(payload))
+    return {
+        "summary": analysis["summary"],
+        "summary_info": analysis["summary_info"],
+        "explanation": analysis["explanation"],
+        "profiles": analysis["profiles"],
+        "sections": analysis["sections"],
+        "timings": analysis["timings"],
+        "degraded": analysis["degraded"],
+    }
+
+def _export_args(payload):
+    result = payload.get("result") or {}
+    return (
+        payload.get("policy_text", ""),
+        result.get("Matches", {}),
+        payload.get("summary", ""),
+        result.get("Risk Level", "Unknown"),
+        result.get("Confidence", 0),
+        result.get("Total Score", 0),
+    )
+
+def op_export_pdf(payload):
+    return generate_pdf_report(*_export_args(payload))
+
+def op_export_png(payload):
+    return generate_image_report(*_export_args(payload))
+
+def _preset(payload):
+    preset = payload.get("preset") or DEFAULT_PRESET
+    if preset not in SUMMARY_PRESETS:
+        raise RequestError(f"Unknown summary preset: {preset}")
+    return preset
+
+def _deadline(payload):
+    deadline = payload.get("deadline_s", DEADLINE_S)
+    if deadline is not None and (not isinstance(deadline, (int, float)) or deadline < 0):
+        raise RequestError("'deadline_s' must be a non-negative number of seconds (0 = no deadline)")
+    return deadline
+
+def _profile_paths(payload):
+    names = payload.get("profiles") or [DEFAULT_PROFILE_NAME]
+    available = discover_risk_profiles()
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        raise RequestError(f"Unknown risk profile(s): {', '.join(unknown)}")
+    return {n: available[n] for n in names}
+
+def _require_text(payload, key):
+    text = payload.get(key)
+    if not isinstance(text, str) or not text.strip():
+        raise RequestError(f"'{key}' must be a non-empty string")
+    return text
+
+JSON_OPS = {
+    "extract": op_extract,
+    "summarize": op_summarize,
+    "score": op_score,
+    "analyze": op_analyze,
+}
+BINARY_OPS = {
+    "export/pdf": (op_export_pdf, "application/pdf"),
+    "export/png": (op_export_png, "image/png"),
+}
+
+def warm_up():
+    """Load the model, the corpus IDF and compile the risk dictionaries once, before serving."""
+    load_model()
+    cached_profile_matcher(tuple(discover_risk_profiles().items()))
+    with scratch_corpus_model():
+        cached_analyze_profiles("warm up", "", {DEFAULT_PROFILE_NAME: DEFAULT_PROFILE_PATH})
+    corpus_model()
+
+# ------------------------------
+# HTTP handler
+# ------------------------------
+class TermsBusterHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "TermsBuster"
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json({"status": "ok", "sentence_cache": SENTENCE_CACHE.stats()})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        op = self.path.strip("/").split("?", 1)[0]
+        started = time.perf_counter()
+        try:
+            if op == "extract":
+                # raw uploads go to a spooled temp file, never fully into memory
+                mime_type = self.headers.get("Content-Type", "text/plain").split(";")[0].strip()
+                with self._spool_body() as stream:
+                    self._send_json(self._run_op(op, op_extract, {"file": stream, "mime_type": mime_type}))
+                return
+            body = self._read_body()
+            if op == "batch":
+                self._stream_batch(self._parse_json(body))
+            elif op in JSON_OPS:
+                self._send_json(self._run_op(op, JSON_OPS[op], self._parse_json(body)))
+            elif op in BINARY_OPS:
+                fn, mime = BINARY_OPS[op]
+                self._send_bytes(self._run_op(op, fn, self._parse_json(body)).getvalue(), mime)
+            else:
+                self._send_json({"error": "not found"}, status=404)
+        except RequestError as e:
+            self._send_json({"error": str(e)}, status=e.status)
+        except Exception as e:
+            self._send_json({"error": f"{type(e).__name__}: {e}"}, status=500)
+        finally:
+            self.log_message('"%s" %.1f ms', self.requestline, (time.perf_counter() - started) * 1000)
+
+    def _run_op(self, op, fn, payload):
+        if not getattr(self.server, "profile_dir", None) or next(self.server.profile_counter) % self.server.profile_every:
+            return fn(payload)
+        # --profile-dir: profile every --profile-every'th request and keep the files;
+        # profiled requests wait for each other, the rest run as usual
+        from modules.profiler import ProfileCapture
+        with ProfileCapture(op.replace("/", "-")) as capture:
+            if fn is op_analyze:
+                result = fn(payload, initializer=capture.wrap_initializer())
+            else:
+                result = fn(payload)
+        paths = capture.write(self.server.profile_dir, f"{capture.name}-{time.strftime('%Y%m%d-%H%M%S')}-{id(capture):x}")
+        self.log_message("profile %s (%.1f MB peak) -> %s", op, capture.peak_bytes / (1024 * 1024), paths["pstats"])
+        return result
+
+    # -- request helpers --
+    def _content_length(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            raise RequestError("invalid Content-Length")
+        if length > self.server.max_body_bytes:
+            # refuse before reading anything from the socket
+            self.close_connection = True
+            raise RequestError(f"request body exceeds {self.server.max_body_bytes} bytes", status=413)
+        return length
+
+    def _read_body(self):
+        length = self._content_length()
+        return self.rfile.read(length) if length else b""
+
+    def _spool_body(self):
+        length = self._content_length()
+        try:
+            return spool_stream(self.rfile, length, max_bytes=self.server.max_body_bytes)
+        except UploadRejected as e:
+            self.close_connection = True
+            raise RequestError(str(e), status=413)
+
+    def _parse_json(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise RequestError("body must be valid JSON")
+        if not isinstance(payload, dict):
+            raise RequestError("body must be a JSON object")
+        return payload
+
+    # -- response helpers --
+    def _send_bytes(self, data, content_type, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, obj, status=200):
+        self._send_bytes(json.dumps(obj).encode("utf-8"), "application/json", status)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_batch(self, payload):
+        items = payload.get("items")
+        if not isinstance(items, list) or not items:
+            raise RequestError("'items' must be a non-empty list")
+        if len(items) > self.server.max_batch_items:
+            raise RequestError(f"batch exceeds {self.server.max_batch_items} items", status=413)
+
+        # One NDJSON line per item, flushed as soon as it is ready
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, item in enumerate(items):
+            try:
+                op = item.get("op")
+                if op not in JSON_OPS:
+                    raise RequestError(f"unsupported batch op: {op!r}")
+                line = {"index": index, "result": JSON_OPS[op](item)}
+            except Exception as e:
+                line = {"index": index, "error": str(e)}
+            self._write_chunk(json.dumps(line).encode("utf-8") + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the TermsBuster HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--max-body-mb", type=float, default=MAX_BODY_BYTES / (1024 * 1024))
+    parser.add_argument("--max-batch-items", type=int, default=MAX_BATCH_ITEMS)
+    parser.add_argument("--no-warm-up", action="store_true", help="load the model on first request instead")
+    parser.add_argument("--profile-dir", default=None,
+                        help="profile requests and write .prof/.speedscope.json here "
+                             "(profiled requests run one at a time)")
+    parser.add_argument("--profile-every", type=int, default=1,
+                        help="with --profile-dir, profile one request in N (default: every request)")
+    args = parser.parse_args(argv)
+
+    if not args.no_warm_up:
+        warm_up()
+
+    server = ThreadingHTTPServer((args.host, args.port), TermsBusterHandler)
+    server.daemon_threads = True
+    server.max_body_bytes = int(args.max_body_mb * 1024 * 1024)
+    server.max_batch_items = args.max_batch_items
+    server.profile_dir = args.profile_dir
+    server.profile_every = max(1, args.profile_every)
+    server.profile_counter = itertools.count()
+    print(f"✅ TermsBuster service listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# test_corpus_idf.py
+"""
+CorpusIDF persistence: save() merges with the file on disk under the lock
+file, so processes sharing one corpus never drop each other's documents.
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+import multiprocessing
+
+import numpy as np
+
+from modules.corpus_idf import CorpusIDF, corpus_model, learn_policy, scratch_corpus_model
+
+WORKERS = 4
+DOCS_PER_WORKER = 5
+
+def policy(worker, doc):
+    return (f"Vendor {worker} shares account data with partner {doc}. "
+            f"Records from region {worker}-{doc} are kept for seven years.")
+
+def learn_and_save(path, worker):
+    # a fresh load and save per document maximizes interleaving between processes
+    for doc in range(DOCS_PER_WORKER):
+        model = CorpusIDF.load(path)
+        assert model.learn(policy(worker, doc))
+        assert model.learn(policy("shared", 0))   # counted once across all processes
+        model.save()
+
+def test_two_models_on_one_file_merge(tmp_path):
+    path = tmp_path / "corpus.npz"
+    a, b = CorpusIDF.load(path), CorpusIDF.load(path)
+    a.learn(policy(1, 0))
+    b.learn(policy(2, 0))
+    b.learn(policy(1, 0))
+    a.save()
+    b.save()
+    assert b.n_docs == 2   # b picked up a's document and did not count the shared one twice
+    merged = CorpusIDF.load(path)
+    assert merged.n_docs == 2
+    assert np.array_equal(merged.df, b.df)
+
+def test_concurrent_processes_keep_every_document(tmp_path):
+    path = tmp_path / "corpus.npz"
+    workers = [multiprocessing.Process(target=learn_and_save, args=(path, w)) for w in range(WORKERS)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join(timeout=120)
+    assert [w.exitcode for w in workers] == [0] * WORKERS
+
+    merged = CorpusIDF.load(path)
+    assert merged.n_docs == WORKERS * DOCS_PER_WORKER + 1
+
+    expected = CorpusIDF(path=None)
+    for worker in range(WORKERS):
+        for doc in range(DOCS_PER_WORKER):
+            expected.learn(policy(worker, doc))
+    expected.learn(policy("shared", 0))
+    assert np.array_equal(merged.df, expected.df)
+
+def test_learning_is_idempotent_and_scoring_is_read_only(tmp_path):
+    model = CorpusIDF.load(tmp_path / "corpus.npz")
+    assert model.learn(policy(1, 0))
+    assert model.learn("  " + policy(1, 0).upper())   # same policy once normalized
+    assert model.n_docs == 1
+    df = model.df.copy()
+    model.vocabulary(policy(2, 0))
+    assert np.array_equal(model.df, df)
+
+def test_scratch_model_is_discarded():
+    previous = corpus_model()
+    with scratch_corpus_model() as scratch:
+        learn_policy(policy(1, 0))
+        assert scratch.n_docs == 1 and scratch.path is None
+    assert corpus_model() is previous
@@ -0,0 +1,77 @@
+# test_near_duplicate.py
+"""
+MinHash/LSH near-duplicate lookup: what counts as a near-duplicate and what
+is reported about it.
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+from pathlib import Path
+
+import pytest
+
+from modules.near_duplicate import (
+    SHINGLE_SIZE, SIMILARITY_THRESHOLD, estimate_similarity, find_near_duplicate, minhash_signature,
+    normalize_for_dedup, register_document,
+)
+from modules.policy_index import open_index
+
+POLICY = (Path(__file__).resolve().parents[1] / "data" / "golden" / "nightwatch_sentinel.txt").read_text(encoding="utf-8")
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = open_index(tmp_path / "index.db")
+    register_document(conn, POLICY, "Stored summary.")
+    yield conn
+    conn.close()
+
+def shingles(text):
+    words = normalize_for_dedup(text).split()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def jaccard(a, b):
+    a, b = shingles(a), shingles(b)
+    return len(a & b) / len(a | b)
+
+def test_same_policy_is_found_with_its_summary(conn):
+    found = find_near_duplicate(conn, POLICY)
+    assert found["similarity"] == 1.0
+    assert found["summary"] == "Stored summary."
+    assert found["changed_sentences"] == []
+
+def test_dates_and_whitespace_do_not_count_as_changes(conn):
+    variant = POLICY.replace("2025", "2026").replace(" ", "  ")
+    assert find_near_duplicate(conn, variant)["similarity"] == 1.0
+
+def test_one_added_sentence_is_a_near_duplicate(conn):
+    variant = POLICY.replace(".", ". We may sell your personal data without notice.", 1)
+    found = find_near_duplicate(conn, variant)
+    assert found is not None and found["similarity"] >= SIMILARITY_THRESHOLD
+    assert found["changed_sentences"] == ["we may sell your personal data without notice."]
+
+def test_threshold_is_respected(conn):
+    variant = POLICY.replace(".", ". We may sell your personal data without notice.", 1)
+    similarity = find_near_duplicate(conn, variant)["similarity"]
+    assert similarity < 1.0
+    assert find_near_duplicate(conn, variant, threshold=similarity + 1e-9) is None
+
+def test_half_rewritten_policy_is_not_a_near_duplicate(conn):
+    sentences = POLICY.split(". ")
+    rewritten = ". ".join(s if i % 2 else f"Clause {i} was replaced by entirely different wording here"
+                          for i, s in enumerate(sentences))
+    assert jaccard(POLICY, rewritten) < 0.6
+    assert find_near_duplicate(conn, rewritten) is None
+
+def test_unrelated_text_is_not_a_near_duplicate(conn):
+    assert find_near_duplicate(conn, "Our bakery opens at nine and sells bread, cakes and coffee every day.") is None
+
+def test_signature_similarity_estimates_jaccard():
+    variant = POLICY.replace(".", ". We may sell your personal data without notice.", 3)
+    estimate = estimate_similarity(minhash_signature(POLICY), minhash_signature(variant))
+    assert estimate == pytest.approx(jaccard(POLICY, variant), abs=0.1)
+
+def test_sentence_hits_are_returned_for_the_same_matcher_only(conn):
+    table = {"ab12": (("sell", 7, 11, False),)}
+    register_document(conn, POLICY, "Stored summary.", {b"\x01": table})
+    assert find_near_duplicate(conn, POLICY, fingerprint=b"\x01")["sentence_hits"] == table
+    assert find_near_duplicate(conn, POLICY, fingerprint=b"\x02")["sentence_hits"] is None
+    assert find_near_duplicate(conn, POLICY)["sentence_hits"] is None
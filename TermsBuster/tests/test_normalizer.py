@@ -0,0 +1,59 @@
+# test_normalizer.py
+"""
+NormalizedText: same text as clean_text(), and offsets that map every
+normalized span back to the original.
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+import pytest
+
+from modules.normalizer import NormalizedText
+from modules.risk_analyzer import clean_text
+
+CASES = [
+    ("We  SHARE your\n\tdata with Partners.",),
+    ("  leading and trailing  ",),
+    ("Privacy Policy", "We sell your data.", "  Contact us  "),
+    ("İstanbul Ltd. stores Straße data.",),   # lowercasing changes the length of "İ"
+    ("",),
+    ("", "only the second part"),
+]
+
+def joined(parts, sep=" "):
+    return sep.join(parts)
+
+@pytest.mark.parametrize("parts", CASES)
+def test_text_equals_clean_text(parts):
+    assert NormalizedText(*parts).text == clean_text(joined(parts))
+
+@pytest.mark.parametrize("parts", CASES)
+def test_every_token_maps_back_to_its_original(parts):
+    norm = NormalizedText(*parts)
+    original = joined(parts)
+    pos = 0
+    for token in norm.text.split():
+        start = norm.text.index(token, pos)
+        pos = start + len(token)
+        orig_start, orig_end = norm.original_span(start, pos)
+        assert original[orig_start:orig_end].lower() == token
+
+def test_offsets_cover_every_character():
+    norm = NormalizedText("We  SHARE\n\tyour data.")
+    assert len(norm.offsets) == len(norm.text) + 1
+    assert list(norm.offsets) == sorted(norm.offsets)
+
+def test_original_keeps_casing_and_inner_spacing():
+    norm = NormalizedText("Terms.  We  SELL\nyour data to Partners.")
+    start = norm.text.index("we sell")
+    end = norm.text.index("partners.") + len("partners.")
+    assert norm.original(start, end) == "We  SELL\nyour data to Partners."
+
+def test_span_across_parts_skips_the_separator():
+    norm = NormalizedText("Heading", "Body text", sep="\n")
+    assert norm.text == "heading body text"
+    assert norm.original(0, len(norm.text)) == "Heading\nBody text"
+
+def test_empty_span_maps_to_a_position():
+    norm = NormalizedText("We share data.")
+    assert norm.original_span(3, 3) == (3, 3)
+    assert norm.original(3, 3) == ""
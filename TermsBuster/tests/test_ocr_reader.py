@@ -0,0 +1,68 @@
+# test_ocr_reader.py
+"""
+PDF text extraction from file objects and paths, on both backends, and the
+stitching of OCR tile outputs.
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+from io import BytesIO
+
+import pytest
+from reportlab.pdfgen import canvas
+
+from modules import ocr_reader
+from modules.ocr_reader import STITCH_LOOKBACK, extract_text_from_pdf, pdf_page_texts, stitch_tile_texts
+
+def make_pdf(path=None, pages=("We share your data with partners.", "You may opt out at any time.")):
+    target = path if path is not None else BytesIO()
+    pdf = canvas.Canvas(str(target) if path is not None else target)
+    for text in pages:
+        pdf.drawString(72, 720, text)
+        pdf.showPage()
+    pdf.save()
+    return target
+
+@pytest.mark.parametrize("backend", ["pdfium", "pdfplumber"])
+def test_path_and_stream_give_the_same_pages(tmp_path, backend):
+    path = make_pdf(tmp_path / "policy.pdf")
+    from_path = pdf_page_texts(str(path), backend=backend)
+    from_pathlike = pdf_page_texts(path, backend=backend)
+    with open(path, "rb") as f:
+        from_stream = pdf_page_texts(f, backend=backend)
+    assert from_path == from_pathlike == from_stream
+    assert "share your data" in from_path[0]
+    assert "opt out" in from_path[1]
+
+def test_extract_text_from_pdf_accepts_a_path(tmp_path):
+    path = make_pdf(tmp_path / "policy.pdf")
+    text = extract_text_from_pdf(str(path))
+    assert "We share your data with partners." in text
+    assert "You may opt out at any time." in text
+
+def test_layout_fallback_rereads_a_path(tmp_path, monkeypatch):
+    # pages that need layout are read a second time with pdfplumber
+    monkeypatch.setattr(ocr_reader, "needs_layout", lambda text: True)
+    path = make_pdf(tmp_path / "policy.pdf")
+    assert pdf_page_texts(str(path), backend="pdfium") == pdf_page_texts(str(path), backend="pdfplumber")
+
+def test_tiles_without_overlap_are_joined_unchanged():
+    texts = ["We share your data.\nWith partners.", "With partners.\nYou may opt out."]
+    assert stitch_tile_texts(texts, [False, False]) == "\n".join(texts)
+
+def test_overlap_lines_are_dropped_once():
+    first = "Privacy Policy\nWe share your data\nwith selected partners."
+    second = "with selected partners.\nYou may opt out at any time."
+    assert stitch_tile_texts([first, second], [False, True]) == (
+        "Privacy Policy\nWe share your data\nwith selected partners.\nYou may opt out at any time."
+    )
+
+def test_overlap_tolerates_ocr_noise():
+    first = "We share your data\nwith selected partners."
+    second = "with se1ected partners,\nYou may opt out."
+    assert stitch_tile_texts([first, second], [False, True]) == "We share your data\nwith selected partners.\nYou may opt out."
+
+def test_only_the_top_of_an_overlapping_tile_is_compared():
+    repeated = "See section 4."
+    first = f"Intro\n{repeated}"
+    second = "\n".join(["Fresh line"] + [f"Clause {i}" for i in range(STITCH_LOOKBACK)] + [repeated])
+    assert stitch_tile_texts([first, second], [False, True]).endswith(f"Clause {STITCH_LOOKBACK - 1}\n{repeated}")
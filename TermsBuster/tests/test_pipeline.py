@@ -0,0 +1,91 @@
+# test_pipeline.py
+"""
+run_stages(): dependency order, fallbacks, and the degrade paths (load
+shedding, per-stage budget, whole-run deadline).
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+import threading
+import time
+
+import pytest
+
+from modules.pipeline import Stage, run_stages
+
+SLOW_S = 5.0   # a stage that would take this long is always cut short below
+
+def slow(cancelled):
+    def fn(ctx):
+        if ctx["cancel"].wait(SLOW_S):
+            cancelled.set()
+        return "full"
+    return fn
+
+def cheap(ctx):
+    return "cheap"
+
+def test_stages_see_their_dependencies():
+    stages = [
+        Stage("total", lambda ctx: ctx["a"] + ctx["b"], deps=("a", "b")),
+        Stage("a", lambda ctx: ctx["x"] * 2),
+        Stage("b", lambda ctx: ctx["x"] + 1),
+    ]
+    results, timings, degraded = run_stages(stages, inputs={"x": 3})
+    assert results["total"] == 10
+    assert set(timings) == {"a", "b", "total"}
+    assert degraded == {}
+
+def test_failing_stage_uses_its_fallback():
+    def boom(ctx):
+        raise RuntimeError("boom")
+    results, _, _ = run_stages([Stage("opt", boom, fallback="fallback"), Stage("after", lambda ctx: ctx["opt"], deps=("opt",))])
+    assert results["after"] == "fallback"
+
+def test_failing_stage_without_fallback_aborts():
+    def boom(ctx):
+        raise RuntimeError("boom")
+    with pytest.raises(RuntimeError, match="boom"):
+        run_stages([Stage("required", boom), Stage("other", lambda ctx: 1)])
+
+def test_unsatisfiable_dependencies_are_reported():
+    with pytest.raises(ValueError, match="missing"):
+        run_stages([Stage("missing", lambda ctx: 1, deps=("nowhere",))])
+
+def test_shed_load_runs_the_cheap_form_from_the_start():
+    cancelled = threading.Event()
+    results, _, degraded = run_stages([Stage("opt", slow(cancelled), degrade=cheap), Stage("req", lambda ctx: 1)],
+                                      shed_load=True)
+    assert results["opt"] == "cheap" and results["req"] == 1
+    assert degraded == {"opt": "load"}
+
+def test_past_deadline_runs_the_cheap_form_from_the_start():
+    cancelled = threading.Event()
+    results, _, degraded = run_stages([Stage("opt", slow(cancelled), degrade=cheap)], deadline=time.monotonic() - 1)
+    assert results["opt"] == "cheap"
+    assert degraded == {"opt": "deadline"}
+
+def test_stage_over_its_budget_is_cancelled_and_degraded():
+    cancelled = threading.Event()
+    started = time.monotonic()
+    results, timings, degraded = run_stages([Stage("opt", slow(cancelled), degrade=cheap, budget=0.05)])
+    assert time.monotonic() - started < SLOW_S
+    assert results["opt"] == "cheap"
+    assert degraded == {"opt": "budget"}
+    assert timings["opt"] >= 0.05   # the abandoned full run counts towards the stage time
+    assert cancelled.wait(1)
+
+def test_deadline_during_the_run_degrades_the_running_stage():
+    cancelled = threading.Event()
+    started = time.monotonic()
+    results, _, degraded = run_stages([Stage("opt", slow(cancelled), degrade=cheap), Stage("req", lambda ctx: 1)],
+                                      deadline=started + 0.05)
+    assert time.monotonic() - started < SLOW_S
+    assert results == {"opt": "cheap", "req": 1}
+    assert degraded == {"opt": "deadline"}
+    assert cancelled.wait(1)
+
+def test_stage_without_a_cheap_form_is_waited_for():
+    results, _, degraded = run_stages([Stage("req", lambda ctx: time.sleep(0.1) or "done")],
+                                      deadline=time.monotonic() + 0.01)
+    assert results["req"] == "done"
+    assert degraded == {}
@@ -0,0 +1,65 @@
+# test_risk_analyzer.py
+"""
+The first-token keyword matcher finds exactly what the per-keyword regex
+(detect_matches) found before it, and the stored per-sentence scan of a
+near-duplicate reproduces a full scan.
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+from pathlib import Path
+
+import pytest
+
+from modules.normalizer import NormalizedText
+from modules.risk_analyzer import (
+    build_profile_matcher, cached_load_risk_data, clean_text, collect_valid_hits, detect_matches,
+    scan_keywords, sentence_hit_table,
+)
+
+APP_DIR = Path(__file__).resolve().parents[1]
+GOLDEN_DIR = APP_DIR / "data" / "golden"
+PROFILE_PATHS = [APP_DIR / "data" / "risk_analyzer_MASTER_FINAL.json", *sorted((APP_DIR / "data" / "profiles").glob("*.json"))]
+
+EDGE_PROFILE = {
+    "high_risk": [
+        {"keyword": "sell", "score": 9},
+        {"keyword": "third party", "score": 8},
+        {"keyword": "third party data", "score": 8},
+        {"keyword": "data data", "score": 1},        # overlapping occurrences
+        {"keyword": "opt-out", "score": 3},
+        {"keyword": "u.s.", "score": 2},             # ends on punctuation
+        {"keyword": "#tracking", "score": 5},        # starts on punctuation: regex fallback
+        {"keyword": "Third Party", "score": 8},      # same keyword after clean_text
+    ],
+}
+EDGE_TEXT = clean_text(
+    "We sell, resell and sellers. Third party data data data shared with a third partying firm. "
+    "Opt-out or opt-outs; U.S. and u.s.a. residents. #tracking and x#tracking. third party"
+)
+
+@pytest.fixture(autouse=True)
+def app_dir(monkeypatch):
+    monkeypatch.chdir(APP_DIR)   # safe phrases are loaded from data/
+
+def regex_hits(text, matcher):
+    hits = {kw: detect_matches(text, kw) for kw in matcher["entries"]}
+    return {kw: found for kw, found in hits.items() if found}
+
+def test_edge_cases_match_the_regex_path():
+    matcher = build_profile_matcher({"edge": EDGE_PROFILE})
+    assert scan_keywords(EDGE_TEXT, matcher) == regex_hits(EDGE_TEXT, matcher)
+
+@pytest.mark.parametrize("case", sorted(p.name[:-len(".txt")] for p in GOLDEN_DIR.glob("*.txt")
+                                         if not p.name.endswith(".summary.txt")))
+def test_golden_policies_match_the_regex_path(case):
+    matcher = build_profile_matcher({p.stem: cached_load_risk_data(str(p)) for p in PROFILE_PATHS})
+    text = clean_text((GOLDEN_DIR / f"{case}.txt").read_text(encoding="utf-8"))
+    assert scan_keywords(text, matcher) == regex_hits(text, matcher)
+
+def test_known_sentence_hits_reproduce_a_full_scan():
+    matcher = build_profile_matcher({"general": cached_load_risk_data(str(PROFILE_PATHS[0]))})
+    original = (GOLDEN_DIR / "nightwatch_sentinel.txt").read_text(encoding="utf-8")
+    edited = original.replace(".", ". We may sell your personal data without notice.", 1)
+    known = sentence_hit_table(NormalizedText(original), matcher)
+    norm = NormalizedText(edited)
+    assert collect_valid_hits(norm, matcher, known=known) == collect_valid_hits(norm, matcher)
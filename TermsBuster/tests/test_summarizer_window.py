@@ -0,0 +1,46 @@
+# test_summarizer_window.py
+"""
+select_for_window() on texts longer than the model window. Runs without
+transformers/torch (see conftest.py): the window logic only needs a tokenizer.
+
+    cd TermsBuster && python -m pytest -q tests
+"""
+from pathlib import Path
+
+import pytest
+
+from modules.summarizer import select_for_window
+
+APP_DIR = Path(__file__).resolve().parents[1]
+
+class WordTokenizer:
+    """One token per whitespace-separated word."""
+
+    def __call__(self, text, add_special_tokens=False):
+        if isinstance(text, str):
+            return {"input_ids": list(range(len(text.split())))}
+        return {"input_ids": [list(range(len(t.split()))) for t in text]}
+
+@pytest.fixture(autouse=True)
+def app_dir(monkeypatch):
+    monkeypatch.chdir(APP_DIR)   # risk dictionaries are loaded from data/
+
+def test_text_within_window_is_unchanged():
+    text = "We share your data with partners."
+    assert select_for_window(text, WordTokenizer(), max_tokens=64) == text
+
+def test_no_sentence_breaks_falls_back_to_text():
+    text = " ".join(["we share your data with partners"] * 400)
+    assert select_for_window(text, WordTokenizer(), max_tokens=64) == text
+
+def test_only_oversized_sentences_falls_back_to_text():
+    sentence = " ".join(["we share your data with partners"] * 20) + "."
+    text = " ".join([sentence] * 3)
+    assert select_for_window(text, WordTokenizer(), max_tokens=64) == text
+
+def test_sentences_that_fit_are_selected():
+    long_sentence = " ".join(["cookies"] * 100) + "."
+    text = f"We sell your personal data to advertisers. {long_sentence} You can opt out at any time."
+    selected = select_for_window(text, WordTokenizer(), max_tokens=64)
+    assert selected and "cookies cookies" not in selected
+    assert len(selected.split()) <= 62